@@ -0,0 +1,364 @@
+"""
+Asyncio pipeline that overlaps OCR and chatbot structuring across documents.
+
+Documents move through two stages:
+
+    submit() -> pending -> OCR workers (executor) -> bounded text queue -> LLM workers (ollama.AsyncClient)
+
+OCR is CPU-bound and runs in an executor, so later documents are extracted
+while earlier ones are waiting on the model server. The text queue between
+the stages is bounded: when the model falls behind, OCR workers block on it
+instead of piling up extracted text in memory. The number of OCR workers and
+of in-flight Ollama requests are configured separately.
+
+With timings=True every result carries per-stage timings (see
+instrumentation); stage CPU times on the event loop thread include the
+other documents' work, wall times are per document.
+
+Usage:
+    python asyncPipeline.py a.pdf b.png c.docx [--ocr-workers 2] [--llm-concurrency 2]
+"""
+import os
+import sys
+import json
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import processMedicalRecord as pmr
+from handleMedicalHistory import extract_text_cached
+from instrumentation import Trace, active as tracing_active, bind, record_llm, stage, use_trace
+
+# Documents extracted at the same time
+DEFAULT_OCR_WORKERS = int(os.environ.get("PIPELINE_OCR_WORKERS") or 2)
+
+# Requests in flight on the model server (set OLLAMA_NUM_PARALLEL on the server to match)
+DEFAULT_LLM_CONCURRENCY = int(os.environ.get("PIPELINE_LLM_CONCURRENCY") or 2)
+
+# Extracted texts waiting for the model (default: twice the LLM concurrency)
+DEFAULT_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE") or 0)
+
+async def _read_json_stream_async(stream):
+    """
+    Async version of processMedicalRecord._read_json_stream
+
+    Returns:
+        Tuple of (reply text, number of streamed chunks, final response part or None)
+    """
+    tracker = pmr.JsonObjectTracker()
+    parts = []
+    final = None
+    trailing = None
+    try:
+        async for part in stream:
+            content = part["message"]["content"]
+            parts.append(content)
+            if part.get("done"):
+                final = part
+                break
+            if trailing is not None:
+                trailing -= 1
+                if trailing <= 0:
+                    break
+            elif tracker.feed(content):
+                if not tracing_active():
+                    break
+                trailing = pmr.STATS_WAIT_CHUNKS
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose:
+            await aclose()
+    return "".join(parts), len(parts), final
+
+class AsyncPipeline:
+    """
+    Two-stage OCR / chatbot pipeline for many medical records
+
+    Use as an async context manager, or call start() and close() yourself:
+
+        async with AsyncPipeline(ocr_workers=2, llm_concurrency=4) as pipeline:
+            results = await pipeline.run(paths)
+    """
+
+    def __init__(self, ocr_workers=DEFAULT_OCR_WORKERS, llm_concurrency=DEFAULT_LLM_CONCURRENCY,
+                 queue_size=DEFAULT_QUEUE_SIZE, process_type="processed", extraction_cache=None,
+                 chatbot_cache=None, max_chunk_tokens=pmr.DEFAULT_CHUNK_TOKENS, page_workers=None,
+                 executor=None, client=None, timings=False):
+        """
+        Args:
+            ocr_workers: Documents extracted at the same time
+            llm_concurrency: Ollama requests in flight at the same time (chunks included)
+            queue_size: Extracted texts buffered between the stages (0 for twice llm_concurrency)
+            process_type: Default OCR processing mode - "original", "processed" or "auto"
+            extraction_cache: resultCache.DiskCache for extracted text (default: EXTRACTION_CACHE_DIR).
+                Not passed to a process-pool executor; its workers use the environment default.
+            chatbot_cache: resultCache.DiskCache for structured records (default: CHATBOT_CACHE_DIR)
+            max_chunk_tokens: Token budget above which a text is structured in chunks
+            page_workers: OCR processes per scanned PDF (default: OCR_WORKERS or CPU count)
+            executor: Executor for the OCR stage (default: a thread pool of ocr_workers threads)
+            client: ollama.AsyncClient to use (default: one for OLLAMA_HOST)
+            timings: Attach per-stage timings to every result under "timings"
+        """
+        self.ocr_workers = max(1, ocr_workers)
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.queue_size = queue_size or 2 * self.llm_concurrency
+        self.process_type = process_type
+        self.extraction_cache = extraction_cache
+        self.chatbot_cache = chatbot_cache if chatbot_cache is not None else pmr.get_chatbot_cache()
+        self.max_chunk_tokens = max_chunk_tokens
+        self.page_workers = page_workers
+        self.client = client
+        self.timings = timings
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._started = False
+
+        # Counters reported by stats()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.ocr_busy = 0
+        self.llm_in_flight = 0
+        self.max_queued = 0
+
+    async def start(self):
+        """Create the queues and start the stage workers on the running loop."""
+        if self._started:
+            return
+        if self.client is None:
+            import ollama
+            self.client = ollama.AsyncClient()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.ocr_workers, thread_name_prefix="ocr")
+
+        self._pending = asyncio.Queue()
+        self._texts = asyncio.Queue(maxsize=self.queue_size)
+        self._llm_slots = asyncio.Semaphore(self.llm_concurrency)
+
+        self._ocr_tasks = [asyncio.create_task(self._ocr_worker()) for _ in range(self.ocr_workers)]
+        self._llm_tasks = [asyncio.create_task(self._llm_worker()) for _ in range(self.llm_concurrency)]
+        self._started = True
+
+    async def close(self):
+        """Finish every submitted document, then stop the workers."""
+        if not self._started:
+            return
+        self._started = False
+
+        for _ in self._ocr_tasks:
+            self._pending.put_nowait(None)
+        await asyncio.gather(*self._ocr_tasks)
+        for _ in self._llm_tasks:
+            await self._texts.put(None)
+        await asyncio.gather(*self._llm_tasks)
+
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def submit(self, file_path, process_type=None):
+        """
+        Queue a document for processing
+
+        Args:
+            file_path: Path to the medical record file
+            process_type: OCR processing mode (default: the pipeline's)
+
+        Returns:
+            asyncio.Future resolved with the process_medical_record style result
+        """
+        if not self._started:
+            raise RuntimeError("Pipeline is not running")
+        future = asyncio.get_running_loop().create_future()
+        trace = Trace("medical_record") if self.timings else None
+        self._pending.put_nowait((file_path, process_type or self.process_type, future, trace))
+        self.submitted += 1
+        return future
+
+    async def run(self, file_paths, process_type=None):
+        """Process documents and return their results in input order."""
+        futures = [self.submit(path, process_type) for path in file_paths]
+        return await asyncio.gather(*futures)
+
+    def stats(self):
+        """Queue depths and counters for monitoring."""
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "pending": self._pending.qsize() if self._started else 0,
+            "queued": self._texts.qsize() if self._started else 0,
+            "max_queued": self.max_queued,
+            "queue_size": self.queue_size,
+            "ocr_busy": self.ocr_busy,
+            "llm_in_flight": self.llm_in_flight
+        }
+
+    def _finish(self, future, result, trace=None, ocr=None):
+        if ocr:
+            result = dict(result, ocr=ocr)
+        if trace is not None:
+            trace.finish()
+            result = dict(result, timings=trace.summary())
+        if result.get("success"):
+            self.completed += 1
+        else:
+            self.failed += 1
+        if not future.done():
+            future.set_result(result)
+
+    async def _ocr_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._pending.get()
+            if job is None:
+                return
+            file_path, process_type, future, trace = job
+
+            self.ocr_busy += 1
+            try:
+                # DiskCache holds a lock and cannot be sent to worker processes; neither can
+                # a bound context, so stages inside a worker process are not traced
+                in_process = isinstance(self._executor, ProcessPoolExecutor)
+                cache = None if in_process else self.extraction_cache
+                with use_trace(trace), stage("extract"):
+                    # Bound inside the trace so the thread's stages land in it
+                    extract = extract_text_cached if in_process or trace is None else bind(extract_text_cached)
+                    extracted = await loop.run_in_executor(self._executor, extract, file_path, process_type,
+                                                           self.page_workers, process_type == "auto", cache)
+                text, ocr = pmr.text_and_ocr_summary(extracted)
+            except Exception as e:
+                self._finish(future, {"success": False, "error": f"Lỗi xử lý: {str(e)}"}, trace)
+                continue
+            finally:
+                self.ocr_busy -= 1
+
+            error = pmr.check_extracted_text(text)
+            if error:
+                self._finish(future, error, trace, ocr)
+                continue
+
+            # Blocks while the model is behind, which holds back further OCR
+            await self._texts.put((text, future, trace, ocr))
+            self.max_queued = max(self.max_queued, self._texts.qsize())
+
+    async def _llm_worker(self):
+        while True:
+            item = await self._texts.get()
+            if item is None:
+                return
+            text, future, trace, ocr = item
+            try:
+                with use_trace(trace):
+                    result = await self.structure_record(text)
+            except Exception as e:
+                result = {"success": False, "error": f"Lỗi xử lý: {str(e)}"}
+            self._finish(future, result, trace, ocr)
+
+    async def structure_record(self, text):
+        """Structure extracted text, in chunks when it is over max_chunk_tokens."""
+        if pmr.needs_chunking(text, self.max_chunk_tokens):
+            chunks = pmr.split_into_chunks(text, self.max_chunk_tokens)
+            if len(chunks) > 1:
+                results = await asyncio.gather(*(self.process_with_chatbot(chunk) for chunk in chunks))
+                return pmr.merge_chunk_results(results)
+        return await self.process_with_chatbot(text)
+
+    async def process_with_chatbot(self, text):
+        """Async version of processMedicalRecord.process_with_chatbot."""
+        loop = asyncio.get_running_loop()
+        cache = self.chatbot_cache
+        # Disk reads and the one-off model digest lookup stay off the event loop
+        with stage("cache_lookup"):
+            key, cached = await loop.run_in_executor(None, pmr.lookup_cached_record, text, cache)
+        if cached is not None:
+            return cached
+
+        result = await self.structure_with_chatbot(text)
+        if key is not None and result.get("success"):
+            await loop.run_in_executor(None, pmr.store_cached_record, cache, key, result)
+        return result
+
+    async def structure_with_chatbot(self, text):
+        """Async version of processMedicalRecord.structure_with_chatbot (same attempts and results)."""
+        messages = pmr.build_extraction_messages(text)
+        response_text = ""
+        generated_tokens = 0
+        wasted_tokens = 0
+
+        try:
+            for attempt in range(1 + pmr.MAX_REPAIR_ATTEMPTS):
+                async with self._llm_slots:
+                    self.llm_in_flight += 1
+                    try:
+                        with stage("llm"):
+                            stream = await self.client.chat(**pmr.build_chat_request(messages))
+                            response_text, tokens, final = await _read_json_stream_async(stream)
+                    finally:
+                        self.llm_in_flight -= 1
+                generated_tokens += tokens
+                record_llm(final, tokens, attempt + 1)
+
+                try:
+                    with stage("parse"):
+                        record_data = pmr.parse_record_response(response_text)
+                except ValueError:
+                    wasted_tokens += tokens
+                    messages = pmr.repair_messages(messages, response_text)
+                    continue
+
+                return pmr.record_result(record_data, attempt + 1, generated_tokens, wasted_tokens)
+
+            return pmr.format_error_result(response_text, generated_tokens, wasted_tokens)
+
+        except Exception as e:
+            return pmr.chatbot_error_result(e)
+
+async def process_medical_records(file_paths, process_type="processed", **options):
+    """
+    Process several medical records with overlapping OCR and chatbot stages
+
+    Args:
+        file_paths: Paths to the medical record files
+        process_type: OCR processing mode - "original", "processed" or "auto"
+        **options: AsyncPipeline settings (ocr_workers, llm_concurrency, queue_size, ...)
+
+    Returns:
+        Tuple of (results in input order, final pipeline stats)
+    """
+    async with AsyncPipeline(process_type=process_type, **options) as pipeline:
+        results = await pipeline.run(file_paths)
+        return results, pipeline.stats()
+
+if __name__ == "__main__":
+    import argparse
+
+    if sys.stdout.encoding != 'utf-8':
+        sys.stdout.reconfigure(encoding='utf-8', errors='backslashreplace')
+
+    parser = argparse.ArgumentParser(description='Process several medical record files concurrently')
+    parser.add_argument('files', nargs='+', help='Medical record files')
+    parser.add_argument('--mode', '-m', type=str, choices=['original', 'processed', 'auto'],
+                        default='processed', help='OCR processing mode')
+    parser.add_argument('--ocr-workers', type=int, default=DEFAULT_OCR_WORKERS,
+                        help='Documents extracted at the same time (default: PIPELINE_OCR_WORKERS or 2)')
+    parser.add_argument('--llm-concurrency', type=int, default=DEFAULT_LLM_CONCURRENCY,
+                        help='Ollama requests in flight (default: PIPELINE_LLM_CONCURRENCY or 2)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='Extracted texts buffered for the model (default: twice --llm-concurrency)')
+    parser.add_argument('--timings', action='store_true', help='Include per-stage timings in every result')
+
+    args = parser.parse_args()
+
+    results, stats = asyncio.run(process_medical_records(
+        args.files, args.mode, ocr_workers=args.ocr_workers,
+        llm_concurrency=args.llm_concurrency, queue_size=args.queue_size, timings=args.timings))
+
+    print(json.dumps(stats), file=sys.stderr)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
@@ -0,0 +1,103 @@
+"""
+Input listing and resumable JSONL output shared by the batch tools
+(process_skin_image.py --bulk and processMedicalRecord.py --batch).
+
+A source is a directory (walked recursively), a glob pattern, or a manifest:
+a .lst file with one path per line (blank lines and # comments are skipped,
+relative paths are resolved against the manifest's directory), or a .jsonl
+file with a "path" field and any per-file options next to it. Manifests are
+recognized by extension only, so a .txt file is always an input, never a list.
+
+Results are written one JSON object per line with the input under "path";
+load_checkpoint() reads them back so an interrupted run can be resumed.
+"""
+import os
+import sys
+import json
+import glob
+
+MANIFEST_EXTENSIONS = (".lst", ".jsonl")
+
+
+def collect_inputs(source, extensions):
+    """
+    Resolve a directory, glob pattern or manifest file into input files
+
+    Args:
+        source: Directory, glob pattern, or manifest (.lst/.jsonl) path
+        extensions: Lower-case file extensions to pick up from directories and globs
+
+    Returns:
+        List of (absolute path, manifest entry dict or None) tuples; directories
+        and globs are sorted, manifests keep their order
+    """
+    extensions = tuple(extensions)
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(extensions):
+                    paths.append(os.path.join(root, name))
+        return [(path, None) for path in sorted(os.path.abspath(p) for p in paths)]
+
+    if os.path.isfile(source) and source.lower().endswith(MANIFEST_EXTENSIONS):
+        base_dir = os.path.dirname(os.path.abspath(source))
+        inputs = []
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                entry = None
+                if line.startswith("{"):
+                    entry = json.loads(line)
+                    line = entry["path"]
+                inputs.append((os.path.abspath(os.path.join(base_dir, line)), entry))
+        return inputs
+
+    return [(path, None) for path in sorted(os.path.abspath(p) for p in glob.glob(source, recursive=True)
+                                            if p.lower().endswith(extensions))]
+
+
+def load_checkpoint(output_path, keep=None):
+    """
+    Read the inputs already handled in a previous run
+
+    A partially written last line (from an interrupted run) is truncated so
+    new results can be appended safely. Complete lines that do not parse are
+    skipped and reported on stderr; the results around them are kept.
+
+    Args:
+        output_path: JSONL output file of the previous run
+        keep: Optional predicate on an input's last result line; inputs it
+            rejects are left out, so they are run again
+
+    Returns:
+        Set of input paths that already have a result
+    """
+    latest = {}
+    if not os.path.exists(output_path):
+        return set()
+
+    valid_length = 0
+    corrupt_lines = []
+    with open(output_path, "rb") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.endswith(b"\n"):
+                break
+            valid_length += len(line)
+            try:
+                entry = json.loads(line)
+                latest[entry["path"]] = entry
+            except (ValueError, KeyError, TypeError):
+                corrupt_lines.append(line_number)
+
+    if corrupt_lines:
+        print(f"{output_path}: skipped {len(corrupt_lines)} unreadable line(s): "
+              f"{', '.join(map(str, corrupt_lines))}", file=sys.stderr)
+
+    if valid_length != os.path.getsize(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(valid_length)
+
+    return {path for path, entry in latest.items() if keep is None or keep(entry)}
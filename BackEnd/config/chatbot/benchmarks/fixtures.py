@@ -0,0 +1,218 @@
+"""
+Synthetic, offline fixtures for the chatbot pipeline benchmarks.
+
+Every generator writes a deterministic file under the given directory and
+returns its path:
+
+    text_pdf       PDF with a text layer (no OCR needed)
+    scanned_pdf    PDF whose pages are images only, like scanner output
+    scan_image     Vietnamese medical text rendered as a slightly rotated,
+                   noisy photo of a page (PNG or JPEG)
+    docx_file      Word document with a manual page break
+    txt_file       Plain UTF-8 text
+    lesion_image   Skin-lesion sized RGB photo (JPEG)
+
+CANNED_RECORD is the structured record a stand-in model replies with.
+
+build_fixtures(directory) writes the standard set used by benchmarks/suite.py;
+generators whose library (PyMuPDF, python-docx) is missing are skipped.
+"""
+import os
+
+RECORD_LINES = [
+    "BỆNH VIỆN ĐA KHOA TỈNH BÌNH DƯƠNG",
+    "PHIẾU KHÁM BỆNH",
+    "Họ và tên bệnh nhân: Nguyễn Văn An    Tuổi: 45    Giới tính: Nam",
+    "Ngày khám: 12/03/2024",
+    "Triệu chứng: Sốt, ho khan, đau họng, mệt mỏi",
+    "Chẩn đoán: Viêm phế quản cấp",
+    "Điều trị: Nghỉ ngơi, uống nhiều nước",
+    "Đơn thuốc:",
+    "1. Paracetamol 500mg - uống 2 viên/ngày sau ăn - 5 ngày",
+    "2. Amoxicillin 500mg - uống 3 lần/ngày - 7 ngày",
+    "3. Vitamin C 500mg - uống 1 viên/ngày - 10 ngày",
+    "Lời dặn: Tái khám sau 7 ngày nếu không đỡ",
+    "Bác sĩ điều trị: BS. Trần Thị Bình",
+]
+
+# Reply the stand-in models (suite.py, load_test.py) give for every document
+CANNED_RECORD = {
+    "record_date": "2024-03-12",
+    "diagnosis": "Viêm phế quản cấp",
+    "symptoms": "Sốt, ho khan, đau họng, mệt mỏi",
+    "treatments": "Nghỉ ngơi, uống nhiều nước",
+    "medications": [
+        {"name": "Paracetamol", "dosage": "500mg", "instructions": "Uống sau ăn", "duration": "5 ngày"},
+        {"name": "Amoxicillin", "dosage": "500mg", "instructions": "Uống 3 lần/ngày", "duration": "7 ngày"},
+    ],
+    "doctor_name": "Trần Thị Bình",
+    "hospital": "Bệnh viện Đa khoa tỉnh Bình Dương",
+    "notes": "Tái khám sau 7 ngày nếu không đỡ",
+    "record_type": "checkup",
+}
+
+# A4 at 300 DPI
+PAGE_SIZE = (2480, 3508)
+
+
+def record_text(repeat=1):
+    """Medical record text, repeated to make longer documents."""
+    return "\n".join(RECORD_LINES * repeat)
+
+
+def _font(size):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def render_page(size=PAGE_SIZE, rotation=0.0, noise=0, seed=0, background=(255, 255, 255)):
+    """
+    Render a page of record text as a PIL RGB image
+
+    Args:
+        size: Page size in pixels
+        rotation: Skew in degrees, as from a hand-held photo
+        noise: Standard deviation of Gaussian pixel noise (0 for a clean render)
+        seed: Random seed for the noise
+        background: Paper colour
+    """
+    from PIL import Image, ImageDraw
+
+    scale = size[0] / PAGE_SIZE[0]
+    font = _font(max(12, int(48 * scale)))
+    line_height = int(80 * scale)
+
+    img = Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(img)
+    y = int(160 * scale)
+    while y < size[1] - line_height:
+        for line in RECORD_LINES:
+            if y >= size[1] - line_height:
+                break
+            draw.text((int(160 * scale), y), line, fill=(25, 25, 35), font=font)
+            y += line_height
+
+    if rotation:
+        img = img.rotate(rotation, resample=Image.BILINEAR, fillcolor=background)
+    if noise:
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        pixels = np.asarray(img, dtype=np.int16) + rng.normal(0, noise, (size[1], size[0], 1)).astype(np.int16)
+        img = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return img
+
+
+def txt_file(directory, repeat=20):
+    path = os.path.join(directory, "record.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(record_text(repeat))
+    return path
+
+
+def docx_file(directory, pages=3):
+    import docx
+
+    path = os.path.join(directory, "record.docx")
+    document = docx.Document()
+    for page_num in range(pages):
+        for line in RECORD_LINES:
+            document.add_paragraph(line)
+        if page_num < pages - 1:
+            document.add_page_break()
+    document.save(path)
+    return path
+
+
+def text_pdf(directory, pages=5):
+    import fitz  # PyMuPDF
+
+    path = os.path.join(directory, "record_text.pdf")
+    document = fitz.open()
+    for _ in range(pages):
+        page = document.new_page(width=595, height=842)
+        page.insert_textbox(fitz.Rect(50, 50, 545, 792), record_text(2), fontsize=11)
+    document.save(path)
+    document.close()
+    return path
+
+
+def scanned_pdf(directory, pages=3):
+    import io
+    import fitz  # PyMuPDF
+
+    path = os.path.join(directory, "record_scanned.pdf")
+    document = fitz.open()
+    for page_num in range(pages):
+        buffer = io.BytesIO()
+        # 150 DPI scans keep the fixture small; PyMuPDF renders them at 72 DPI for OCR
+        render_page((1240, 1754), rotation=0.5, noise=8, seed=page_num).save(buffer, format="PNG")
+        page = document.new_page(width=595, height=842)
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    document.save(path)
+    document.close()
+    return path
+
+
+def scan_image(directory, image_format="png", size=(1240, 1754)):
+    path = os.path.join(directory, f"record_scan.{'jpg' if image_format == 'jpeg' else image_format}")
+    img = render_page(size, rotation=1.0, noise=12, background=(240, 235, 222))
+    if image_format == "jpeg":
+        img.save(path, format="JPEG", quality=85)
+    else:
+        img.save(path, format="PNG")
+    return path
+
+
+def lesion_image(directory, index=0, size=(1024, 768)):
+    """Skin-coloured photo with a darker irregular blob, at a typical phone-crop size."""
+    import numpy as np
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = np.random.default_rng(index)
+    img = Image.new("RGB", size, (224, 180, 150))
+    draw = ImageDraw.Draw(img)
+    cx, cy = size[0] // 2, size[1] // 2
+    for _ in range(6):
+        rx, ry = rng.integers(80, 200, size=2)
+        dx, dy = rng.integers(-60, 60, size=2)
+        shade = tuple(int(v) for v in rng.integers(60, 130, size=3))
+        draw.ellipse((cx + dx - rx, cy + dy - ry, cx + dx + rx, cy + dy + ry), fill=shade)
+    img = img.filter(ImageFilter.GaussianBlur(6))
+
+    pixels = np.asarray(img, dtype=np.int16) + rng.normal(0, 6, (size[1], size[0], 3)).astype(np.int16)
+    path = os.path.join(directory, f"lesion_{index}.jpg")
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path, format="JPEG", quality=90)
+    return path
+
+
+def build_fixtures(directory, lesions=4):
+    """
+    Write the standard fixture set
+
+    Returns:
+        Dict of fixture name -> path (or list of paths for "lesions"); names
+        whose generator library is not installed are left out
+    """
+    os.makedirs(directory, exist_ok=True)
+    generators = {
+        "txt": lambda: txt_file(directory),
+        "docx": lambda: docx_file(directory),
+        "pdf_text": lambda: text_pdf(directory),
+        "pdf_scanned": lambda: scanned_pdf(directory),
+        "png": lambda: scan_image(directory, "png"),
+        "jpeg": lambda: scan_image(directory, "jpeg"),
+        "lesions": lambda: [lesion_image(directory, index) for index in range(lesions)],
+    }
+
+    fixtures = {}
+    for name, generate in generators.items():
+        try:
+            fixtures[name] = generate()
+        except ImportError:
+            continue
+    return fixtures
@@ -0,0 +1,135 @@
+"""
+Startup/import-time benchmark for the medical record extractors.
+
+For each file type, a fresh interpreter runs `python -X importtime` to import
+processMedicalRecord and call extract_text on a small fixture. The report
+lists total import time and which heavy dependencies were loaded, and the
+script fails when a format loads a dependency it should not (e.g. OpenCV for
+a .txt upload) or exceeds --budget-ms.
+
+Usage:
+    python benchmarks/import_time.py [--budget-ms 150] [--types txt,docx,pdf,png]
+
+Fixtures for docx/pdf/png are generated with python-docx, PyMuPDF and Pillow;
+a type is skipped when its generator is not installed.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["cv2", "numpy", "PIL", "pytesseract", "tesserocr", "docx", "fitz", "ollama"]
+
+# Heavy modules each format is allowed to load
+ALLOWED_MODULES = {
+    "txt": set(),
+    "docx": {"docx"},
+    "pdf": {"fitz", "pytesseract", "tesserocr", "PIL", "numpy", "cv2"},
+    "png": {"PIL", "numpy", "cv2", "pytesseract", "tesserocr"},
+}
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def make_fixture(file_type, directory):
+    """Write a small fixture of the given type and return its path."""
+    path = os.path.join(directory, f"sample.{file_type}")
+    text = "Bệnh viện Đa khoa\nChẩn đoán: Viêm họng cấp\nParacetamol 500mg"
+
+    if file_type == "txt":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    elif file_type == "docx":
+        import docx
+        document = docx.Document()
+        for line in text.splitlines():
+            document.add_paragraph(line)
+        document.save(path)
+    elif file_type == "pdf":
+        import fitz
+        document = fitz.open()
+        page = document.new_page()
+        page.insert_text((72, 72), text * 5)
+        document.save(path)
+    elif file_type == "png":
+        from PIL import Image, ImageDraw
+        img = Image.new("RGB", (400, 120), "white")
+        ImageDraw.Draw(img).multiline_text((10, 10), text, fill="black")
+        img.save(path)
+    return path
+
+
+def measure(path):
+    """Run extract_text in a fresh interpreter and parse the -X importtime output."""
+    code = (
+        "import sys; sys.path.insert(0, {dir!r})\n"
+        "import processMedicalRecord, handleMedicalHistory\n"
+        "try:\n"
+        "    handleMedicalHistory.extract_text({path!r})\n"
+        "except Exception:\n"
+        "    pass\n"
+    ).format(dir=CHATBOT_DIR, path=path)
+
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, encoding="utf-8")
+
+    total_us = 0
+    loaded = set()
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, module = match.groups()
+        top_level = module.split(".")[0]
+        if top_level in HEAVY_MODULES:
+            loaded.add(top_level)
+        # Only top-level imports, nested ones are already in their parent's cumulative time
+        if len(indent) <= 1:
+            total_us += int(cumulative)
+
+    return total_us / 1000, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import time of the extractors per file type')
+    parser.add_argument('--types', type=str, default='txt,docx,pdf,png', help='Comma separated file types')
+    parser.add_argument('--budget-ms', type=float, default=None, help='Fail when .txt import time exceeds this')
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        for file_type in args.types.split(','):
+            try:
+                path = make_fixture(file_type, directory)
+            except ImportError as e:
+                results.append({"type": file_type, "skipped": f"cannot generate fixture: {e}"})
+                continue
+
+            import_ms, loaded = measure(path)
+            unexpected = sorted(loaded - ALLOWED_MODULES[file_type])
+            over_budget = file_type == "txt" and args.budget_ms is not None and import_ms > args.budget_ms
+            passed = not unexpected and not over_budget
+            failed = failed or not passed
+
+            results.append({
+                "type": file_type,
+                "importMs": import_ms,
+                "heavyModules": sorted(loaded),
+                "unexpectedModules": unexpected,
+                "passed": passed,
+            })
+            print(f"{file_type:<5} {import_ms:8.1f}ms  {', '.join(sorted(loaded)) or '-'}"
+                  f"{'' if passed else '  FAIL'}", file=sys.stderr)
+
+    print(json.dumps({"benchmark": "import_time", "python": sys.version.split()[0], "results": results}, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,486 @@
+"""
+Load test of the record-structuring path against a local Ollama stand-in.
+
+Starts a fake Ollama server in a subprocess (so it does not compete with
+the pipeline for the GIL), points OLLAMA_HOST at it and pushes a corpus of
+documents through the pipeline at each requested concurrency:
+
+    pipeline   asyncPipeline.AsyncPipeline, llm_concurrency = the level
+    threads    process_medical_record in that many threads
+
+The fake server speaks enough of the Ollama API for the real client:
+/api/chat (streamed and not), /api/tags, /api/show and /api/version. It
+waits --latency ms plus prompt tokens / --prompt-rate, then generates
+fixtures.CANNED_RECORD at --token-rate tokens per second per request, at
+most --server-parallel requests at a time (OLLAMA_NUM_PARALLEL); the rest
+wait in line. --malformed-rate replies are cut off mid-object and
+--error-rate requests fail with HTTP 500.
+
+For every level the JSON report gives throughput, end-to-end latency
+percentiles, error / parse-failure / repair rates, queue depths, mean stage
+times and the Python process' CPU use. Without --rate every document
+arrives at once, so latencies include the wait in line; use --rate for
+latency at a steady arrival rate. When throughput stops growing while
+the server still has idle slots (maxActive < --server-parallel) and CPU
+approaches 100%, the Python side is the bottleneck, not the model.
+
+Usage:
+    python benchmarks/load_test.py [--concurrency 1,2,4,8] [--documents 40] [--engine pipeline]
+                                   [--latency 200] [--token-rate 60] [--malformed-rate 0.05]
+    python benchmarks/load_test.py --corpus records/ --ollama-host http://gpu-box:11434
+    python benchmarks/load_test.py --serve --port 11435    # only run the fake server
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+import subprocess
+import tempfile
+import urllib.request
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CHATBOT_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+
+# Characters per streamed chunk, roughly one token
+CHUNK_CHARS = 4
+
+# How often queue depths are sampled while a level runs
+SAMPLE_SECONDS = 0.05
+
+FAKE_DIGEST = "sha256:" + "0" * 64
+
+
+class FakeOllama(ThreadingHTTPServer):
+    """Ollama stand-in with configurable latency, generation speed and failure rates."""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency, token_rate, prompt_rate, parallel, malformed_rate, error_rate, seed):
+        super().__init__(address, FakeOllamaHandler)
+        self.latency = latency
+        self.token_rate = token_rate
+        self.prompt_rate = prompt_rate
+        self.malformed_rate = malformed_rate
+        self.error_rate = error_rate
+        self.reply = json.dumps(fixtures.CANNED_RECORD, ensure_ascii=False)
+        self.slots = threading.BoundedSemaphore(parallel)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {"requests": 0, "malformed": 0, "errors": 0, "cancelled": 0,
+                             "active": 0, "maxActive": 0, "waiting": 0, "maxWaiting": 0}
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            counters = dict(self.counters)
+        if reset:
+            self.reset()
+        return counters
+
+    def count(self, name, delta=1, peak=None):
+        with self._lock:
+            self.counters[name] += delta
+            if peak:
+                self.counters[peak] = max(self.counters[peak], self.counters[name])
+
+    def roll(self, rate):
+        with self._lock:
+            return self._random.random() < rate
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            # Report the model the pipeline asks for, so its digest lookup and prompt cache keys work
+            from processMedicalRecord import MODEL_NAME
+            model = MODEL_NAME if ":" in MODEL_NAME else f"{MODEL_NAME}:latest"
+            self._send_json(200, {"models": [{
+                "name": model, "model": model, "digest": FAKE_DIGEST, "size": 0,
+                "modified_at": datetime.now(timezone.utc).isoformat(),
+                "details": {"format": "gguf", "family": "fake", "parameter_size": "0B"},
+            }]})
+        elif self.path == "/api/version":
+            self._send_json(200, {"version": "0.0.0-fake"})
+        elif self.path.startswith("/stats"):
+            self._send_json(200, self.server.snapshot(reset="reset" in self.path))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        request = self._read_json()
+        if self.path == "/api/show":
+            self._send_json(200, {"modelfile": "", "parameters": "", "template": "",
+                                  "details": {"format": "gguf", "family": "fake"}, "model_info": {}})
+        elif self.path == "/api/chat":
+            self._chat(request)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _chat(self, request):
+        server = self.server
+        server.count("requests")
+        if server.roll(server.error_rate):
+            server.count("errors")
+            self._send_json(500, {"error": "fake server error"})
+            return
+
+        reply = server.reply
+        if server.roll(server.malformed_rate):
+            server.count("malformed")
+            reply = reply[:len(reply) // 2]
+
+        prompt = "".join(message.get("content", "") for message in request.get("messages", []))
+        prompt_tokens = max(1, len(prompt) // CHUNK_CHARS)
+        chunks = [reply[start:start + CHUNK_CHARS] for start in range(0, len(reply), CHUNK_CHARS)]
+        model = request.get("model", "")
+
+        server.count("waiting", peak="maxWaiting")
+        server.slots.acquire()
+        server.count("waiting", -1)
+        server.count("active", peak="maxActive")
+        started = time.perf_counter()
+        try:
+            prompt_seconds = server.latency + prompt_tokens / server.prompt_rate
+            time.sleep(prompt_seconds)
+
+            def part(content, done=False):
+                payload = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(),
+                           "message": {"role": "assistant", "content": content}, "done": done}
+                if done:
+                    payload.update({
+                        "done_reason": "stop",
+                        "total_duration": int((time.perf_counter() - started) * 1e9),
+                        "load_duration": 0,
+                        "prompt_eval_count": prompt_tokens,
+                        "prompt_eval_duration": int(prompt_seconds * 1e9),
+                        "eval_count": len(chunks),
+                        "eval_duration": int(len(chunks) / server.token_rate * 1e9),
+                    })
+                return payload
+
+            if not request.get("stream", True):
+                time.sleep(len(chunks) / server.token_rate)
+                final = part(reply, done=True)
+                self._send_json(200, final)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            try:
+                for content in chunks:
+                    time.sleep(1 / server.token_rate)
+                    self.wfile.write((json.dumps(part(content), ensure_ascii=False) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write((json.dumps(part("", done=True)) + "\n").encode("utf-8"))
+            except (BrokenPipeError, ConnectionResetError):
+                # The client closed the stream once the object was complete; Ollama stops generating too
+                server.count("cancelled")
+        finally:
+            server.count("active", -1)
+            server.slots.release()
+
+
+def serve(args):
+    """Run the fake server until interrupted; the first stdout line is its URL."""
+    server = FakeOllama(("127.0.0.1", args.port), args.latency / 1000, args.token_rate, args.prompt_rate,
+                        args.server_parallel, args.malformed_rate, args.error_rate, args.seed)
+    print(f"http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def start_fake_server(args):
+    """Start serve() in a subprocess; returns (process, URL)."""
+    command = [sys.executable, os.path.abspath(__file__), '--serve', '--port', '0',
+               '--latency', str(args.latency), '--token-rate', str(args.token_rate),
+               '--prompt-rate', str(args.prompt_rate), '--server-parallel', str(args.server_parallel),
+               '--malformed-rate', str(args.malformed_rate), '--error-rate', str(args.error_rate),
+               '--seed', str(args.seed)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    url = process.stdout.readline().strip()
+    if not url:
+        process.wait()
+        raise RuntimeError("fake Ollama server did not start")
+    return process, url
+
+
+def server_stats(url, reset=False):
+    """Counters of the fake server, or None for a real Ollama server."""
+    try:
+        with urllib.request.urlopen(f"{url}/stats{'?reset' if reset else ''}", timeout=5) as response:
+            return json.load(response)
+    except OSError:
+        return None
+
+
+def build_corpus(directory, documents, repeat):
+    """Plain-text records, each with its own header line so no two texts are identical."""
+    paths = []
+    for index in range(documents):
+        path = os.path.join(directory, f"record_{index:04d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Mã hồ sơ: {index:06d}\n{fixtures.record_text(repeat)}")
+        paths.append(path)
+    return paths
+
+
+def load_corpus(directory):
+    names = sorted(name for name in os.listdir(directory) if not name.startswith("."))
+    return [os.path.join(directory, name) for name in names if os.path.isfile(os.path.join(directory, name))]
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def arrival_delays(count, rate, seed):
+    """Start offsets in seconds: all at once, or Poisson arrivals at rate documents per second."""
+    if not rate:
+        return [0.0] * count
+    rng = random.Random(seed)
+    offsets, now = [], 0.0
+    for _ in range(count):
+        offsets.append(now)
+        now += rng.expovariate(rate)
+    return offsets
+
+
+async def run_pipeline_level(paths, level, args):
+    """Push paths through one AsyncPipeline; returns (per-document (latency, result), queue samples)."""
+    from asyncPipeline import AsyncPipeline
+
+    samples = []
+    outcomes = []
+    pipeline = AsyncPipeline(ocr_workers=args.ocr_workers or level, llm_concurrency=level,
+                             queue_size=args.queue_size, process_type=args.mode,
+                             max_chunk_tokens=args.chunk_tokens, timings=True)
+
+    async def sample():
+        while True:
+            samples.append(pipeline.stats())
+            await asyncio.sleep(SAMPLE_SECONDS)
+
+    async def one(path, delay):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        result = await pipeline.submit(path)
+        outcomes.append((time.perf_counter() - start, result))
+
+    async with pipeline:
+        sampler = asyncio.create_task(sample())
+        delays = arrival_delays(len(paths), args.rate, args.seed)
+        await asyncio.gather(*(one(path, delay) for path, delay in zip(paths, delays)))
+        sampler.cancel()
+    return outcomes, samples
+
+
+def run_threads_level(paths, level, args):
+    """Push paths through process_medical_record on level threads."""
+    from concurrent.futures import ThreadPoolExecutor
+    from processMedicalRecord import process_medical_record
+
+    samples = []
+    outcomes = []
+    lock = threading.Lock()
+    state = {"in_flight": 0}
+    delays = arrival_delays(len(paths), args.rate, args.seed)
+    t0 = time.perf_counter()
+
+    def one(path, delay):
+        wait = t0 + delay - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        with lock:
+            state["in_flight"] += 1
+        start = time.perf_counter()
+        try:
+            result = process_medical_record(path, args.mode, max_chunk_tokens=args.chunk_tokens, timings=True)
+        finally:
+            with lock:
+                state["in_flight"] -= 1
+        outcomes.append((time.perf_counter() - start, result))
+
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(SAMPLE_SECONDS):
+            samples.append({"llm_in_flight": state["in_flight"]})
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    with ThreadPoolExecutor(max_workers=level) as executor:
+        list(executor.map(one, paths, delays))
+    stop.set()
+    sampler.join()
+    return outcomes, samples
+
+
+def summarize(level, outcomes, samples, wall, cpu, server):
+    """One level's report entry."""
+    latencies = [latency * 1000 for latency, _ in outcomes]
+    results = [result for _, result in outcomes]
+    count = len(results)
+    failures = [result for result in results if not result.get("success")]
+    parse_failures = [result for result in failures if "raw_response" in result]
+    repaired = [result for result in results if result.get("success") and (result.get("attempts") or 1) > 1]
+
+    stage_totals = {}
+    for result in results:
+        for name, entry in (result.get("timings") or {}).get("stages", {}).items():
+            stage_totals[name] = stage_totals.get(name, 0.0) + entry["wall_ms"]
+
+    entry = {
+        "concurrency": level,
+        "documents": count,
+        "wallSeconds": wall,
+        "throughputDocsPerSec": count / wall if wall else None,
+        "latencyMs": {
+            "p50": percentile(latencies, 0.50),
+            "p90": percentile(latencies, 0.90),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies),
+        },
+        "errorRate": len(failures) / count,
+        "parseFailureRate": len(parse_failures) / count,
+        "repairRate": len(repaired) / count,
+        "errors": sorted({result.get("error", "") for result in failures}),
+        "stageMeanMs": {name: total / count for name, total in stage_totals.items()},
+        # Process CPU seconds per wall second; near 1.0 means the GIL-bound Python side is saturated
+        "cpuUtilization": cpu / wall if wall else None,
+        "queue": {
+            "maxQueued": max((sample.get("queued", 0) for sample in samples), default=0),
+            "meanQueued": (sum(sample.get("queued", 0) for sample in samples) / len(samples)) if samples else 0,
+            "maxPending": max((sample.get("pending", 0) for sample in samples), default=0),
+            "maxLlmInFlight": max((sample.get("llm_in_flight", 0) for sample in samples), default=0),
+        },
+    }
+    if server is not None:
+        entry["server"] = server
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the record-structuring path against a fake Ollama server')
+    parser.add_argument('--concurrency', type=str, default='1,2,4,8', help='Comma separated concurrency levels')
+    parser.add_argument('--engine', choices=['pipeline', 'threads'], default='pipeline',
+                        help='AsyncPipeline, or process_medical_record on a thread pool')
+    parser.add_argument('--documents', type=int, default=40, help='Generated documents (without --corpus)')
+    parser.add_argument('--repeat', type=int, default=1, help='Record text repetitions per generated document')
+    parser.add_argument('--corpus', type=str, help='Directory of medical record files to use instead')
+    parser.add_argument('--rate', type=float, default=0, help='Poisson arrivals per second (default: all at once)')
+    parser.add_argument('--mode', '-m', type=str, default='processed', help='OCR processing mode')
+    parser.add_argument('--ocr-workers', type=int, default=0, help='Pipeline OCR workers (default: the level)')
+    parser.add_argument('--queue-size', type=int, default=0, help='Pipeline text queue size (default: twice the level)')
+    parser.add_argument('--chunk-tokens', type=int, default=None, help='Chunking threshold (default: CHUNK_TOKENS or 1000)')
+    parser.add_argument('--ollama-host', type=str, help='Use this Ollama server instead of the fake one')
+    parser.add_argument('--output', '-o', type=str, help='Write the JSON report here instead of stdout')
+
+    fake = parser.add_argument_group('fake server')
+    fake.add_argument('--serve', action='store_true', help='Only run the fake server and print its URL')
+    fake.add_argument('--port', type=int, default=0, help='Port for --serve (default: any free port)')
+    fake.add_argument('--latency', type=float, default=200, help='Milliseconds before the first token')
+    fake.add_argument('--token-rate', type=float, default=60, help='Generated tokens per second per request')
+    fake.add_argument('--prompt-rate', type=float, default=1000, help='Prompt tokens evaluated per second')
+    fake.add_argument('--server-parallel', type=int, default=4, help='Requests served at once (OLLAMA_NUM_PARALLEL)')
+    fake.add_argument('--malformed-rate', type=float, default=0.0, help='Fraction of replies cut off mid-object')
+    fake.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests failing with HTTP 500')
+    fake.add_argument('--seed', type=int, default=0, help='Random seed for failures and arrivals')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    # Every document must reach the model
+    for variable in ("EXTRACTION_CACHE_DIR", "CHATBOT_CACHE_DIR"):
+        os.environ.pop(variable, None)
+
+    process = None
+    if args.ollama_host:
+        url = args.ollama_host.rstrip("/")
+    else:
+        process, url = start_fake_server(args)
+    # Read by the ollama client when it is first imported
+    os.environ["OLLAMA_HOST"] = url
+
+    import processMedicalRecord as pmr
+    if args.chunk_tokens is None:
+        args.chunk_tokens = pmr.DEFAULT_CHUNK_TOKENS
+
+    report = {"benchmark": "load_test", "engine": args.engine, "ollamaHost": url,
+              "fakeServer": None if args.ollama_host else {
+                  "latencyMs": args.latency, "tokenRate": args.token_rate, "promptRate": args.prompt_rate,
+                  "parallel": args.server_parallel, "malformedRate": args.malformed_rate,
+                  "errorRate": args.error_rate},
+              "rate": args.rate or None, "levels": []}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = load_corpus(args.corpus) if args.corpus else build_corpus(tmp, args.documents, args.repeat)
+            report["documents"] = len(paths)
+            for level in (int(value) for value in args.concurrency.split(',')):
+                server_stats(url, reset=True)
+                start, cpu_start = time.perf_counter(), time.process_time()
+                if args.engine == "pipeline":
+                    outcomes, samples = asyncio.run(run_pipeline_level(paths, level, args))
+                else:
+                    outcomes, samples = run_threads_level(paths, level, args)
+                wall, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+
+                entry = summarize(level, outcomes, samples, wall, cpu, server_stats(url))
+                report["levels"].append(entry)
+                print(f"c={level:<3} {entry['throughputDocsPerSec']:6.2f} docs/s  "
+                      f"p50={entry['latencyMs']['p50']:8.0f}ms  p95={entry['latencyMs']['p95']:8.0f}ms  "
+                      f"errors={entry['errorRate']:.1%}  parse={entry['parseFailureRate']:.1%}  "
+                      f"cpu={entry['cpuUtilization']:.0%}  maxQueued={entry['queue']['maxQueued']}",
+                      file=sys.stderr)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compare OCR throughput (pages/second) between the tesserocr pool and pytesseract.
+
+Usage:
+    python benchmarks/ocr_engines.py [--pages 20] [--threads 1,4] [--images scans/]
+
+Without --images, synthetic text pages are rendered with Pillow. Each engine
+runs over the same pages with 1..N client threads; engines that are not
+installed are reported as skipped.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocrEngine import ENGINES
+
+SAMPLE_LINES = [
+    "BỆNH VIỆN ĐA KHOA TỈNH",
+    "Họ và tên bệnh nhân: Nguyễn Văn A    Tuổi: 45",
+    "Chẩn đoán: Viêm phế quản cấp",
+    "Paracetamol 500mg - uống 2 viên/ngày sau ăn - 5 ngày",
+    "Amoxicillin 500mg - uống 3 lần/ngày - 7 ngày",
+    "Ngày khám: 12/03/2024    Bác sĩ: Trần Thị B",
+]
+
+
+def synthetic_pages(count, size=(1240, 1754)):
+    """Render A4 pages at 150 DPI filled with Vietnamese medical text."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 28)
+    except OSError:
+        font = ImageFont.load_default()
+
+    pages = []
+    for page_num in range(count):
+        img = Image.new("L", size, 255)
+        draw = ImageDraw.Draw(img)
+        for row in range(40):
+            line = SAMPLE_LINES[(row + page_num) % len(SAMPLE_LINES)]
+            draw.text((80, 80 + row * 40), line, fill=0, font=font)
+        pages.append(img)
+    return pages
+
+
+def load_pages(directory):
+    from PIL import Image
+
+    names = sorted(name for name in os.listdir(directory)
+                   if name.lower().endswith((".png", ".jpg", ".jpeg", ".tiff", ".bmp")))
+    return [Image.open(os.path.join(directory, name)).convert("L") for name in names]
+
+
+def run(engine, pages, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        characters = sum(len(text) for text in executor.map(engine.image_to_string, pages))
+    wall = time.perf_counter() - start
+    return {"threads": threads, "seconds": wall, "pagesPerSecond": len(pages) / wall, "characters": characters}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark OCR engines in pages per second')
+    parser.add_argument('--pages', type=int, default=20, help='Synthetic pages to render')
+    parser.add_argument('--images', type=str, help='Directory of page images to use instead')
+    parser.add_argument('--threads', type=str, default='1,4', help='Comma separated client thread counts')
+    args = parser.parse_args()
+
+    pages = load_pages(args.images) if args.images else synthetic_pages(args.pages)
+    thread_counts = [int(count) for count in args.threads.split(',')]
+
+    results = []
+    for name, engine_class in ENGINES.items():
+        try:
+            engine = engine_class()
+            # Warm-up call: loads traineddata for tesserocr
+            engine.image_to_string(pages[0])
+        except Exception as e:
+            results.append({"engine": name, "skipped": str(e)})
+            print(f"{name:<12} skipped: {e}", file=sys.stderr)
+            continue
+
+        for threads in thread_counts:
+            stats = run(engine, pages, threads)
+            stats["engine"] = name
+            results.append(stats)
+            print(f"{name:<12} threads={threads:<3} {stats['pagesPerSecond']:6.2f} pages/s", file=sys.stderr)
+
+    print(json.dumps({"benchmark": "ocr_engines", "pages": len(pages), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Per-stage timing and peak memory of OCR preprocessing: legacy code vs ocrPreprocess.
+
+legacy reproduces the old "processed" path: PIL -> numpy -> BGR2GRAY -> Otsu
+-> 1x1 morphological open -> PIL, then Contrast / Sharpness / Brightness /
+Color ImageEnhance passes. fused runs ocrPreprocess.preprocess with the
+configured stages.
+
+Each variant runs in its own subprocess so peak RSS is comparable.
+tracemalloc peaks cover numpy buffers; Pillow allocates outside the Python
+allocator, which is why RSS is reported too.
+
+Usage:
+    python benchmarks/ocr_preprocess.py [--pages 10] [--images scans/] [--stages grayscale,threshold]
+
+Without --images, synthetic colour A4 pages at 300 DPI are rendered.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rss import format_mb, peak_rss_mb
+
+SAMPLE_LINES = [
+    "BỆNH VIỆN ĐA KHOA TỈNH",
+    "Họ và tên bệnh nhân: Nguyễn Văn A    Tuổi: 45",
+    "Chẩn đoán: Viêm phế quản cấp",
+    "Paracetamol 500mg - uống 2 viên/ngày sau ăn - 5 ngày",
+]
+
+
+def synthetic_pages(count, size=(2480, 3508)):
+    """Colour scans: slightly off-white paper with dark text, like a phone photo of a record."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 48)
+    except OSError:
+        font = ImageFont.load_default()
+
+    pages = []
+    for page_num in range(count):
+        img = Image.new("RGB", size, (238, 232, 220))
+        draw = ImageDraw.Draw(img)
+        for row in range(50):
+            line = SAMPLE_LINES[(row + page_num) % len(SAMPLE_LINES)]
+            draw.text((160, 160 + row * 64), line, fill=(30, 30, 40), font=font)
+        pages.append(img)
+    return pages
+
+
+def load_pages(directory):
+    from PIL import Image
+
+    names = sorted(name for name in os.listdir(directory)
+                   if name.lower().endswith((".png", ".jpg", ".jpeg", ".tiff", ".bmp")))
+    return [Image.open(os.path.join(directory, name)).convert("RGB") for name in names]
+
+
+class StageTimer:
+    """Accumulate wall time per named stage."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def __call__(self, name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+        return result
+
+
+def legacy_preprocess(img, timer):
+    import cv2
+    import numpy as np
+    from PIL import Image, ImageEnhance
+
+    img_np = timer("to_numpy", np.array, img)
+    gray = timer("grayscale", cv2.cvtColor, img_np, cv2.COLOR_BGR2GRAY)
+    _, thresh = timer("threshold", cv2.threshold, gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    kernel = np.ones((1, 1), np.uint8)
+    opening = timer("morph_open", cv2.morphologyEx, thresh, cv2.MORPH_OPEN, kernel)
+    processed = timer("to_pil", Image.fromarray, opening)
+    processed = timer("contrast", lambda im: ImageEnhance.Contrast(im).enhance(2.0), processed)
+    processed = timer("sharpness", lambda im: ImageEnhance.Sharpness(im).enhance(2.0), processed)
+    processed = timer("brightness", lambda im: ImageEnhance.Brightness(im).enhance(1.2), processed)
+    processed = timer("color", lambda im: ImageEnhance.Color(im).enhance(1.5), processed)
+    return processed
+
+
+def fused_preprocess(img, timer, stages):
+    from PIL import Image
+    from ocrPreprocess import preprocess
+
+    result = preprocess(img, stages, timings=timer.seconds)
+    return timer("to_pil", Image.fromarray, result)
+
+
+def run_worker(variant, pages, stages):
+    timer = StageTimer()
+
+    # Warm-up so import and first-call costs stay out of the numbers
+    if variant == "legacy":
+        legacy_preprocess(pages[0], StageTimer())
+    else:
+        fused_preprocess(pages[0], StageTimer(), stages)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for page in pages:
+        if variant == "legacy":
+            legacy_preprocess(page, timer)
+        else:
+            fused_preprocess(page, timer, stages)
+    total = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "variant": variant,
+        "pages": len(pages),
+        "msPerPage": total * 1000 / len(pages),
+        "stageMsPerPage": {name: seconds * 1000 / len(pages) for name, seconds in timer.seconds.items()},
+        "tracedPeakMb": traced_peak / (1024 * 1024),
+        "peakRssMb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark OCR preprocessing stages against the legacy code')
+    parser.add_argument('--pages', type=int, default=10, help='Synthetic pages to render')
+    parser.add_argument('--images', type=str, help='Directory of page images to use instead')
+    parser.add_argument('--stages', type=str, default='grayscale,threshold', help='ocrPreprocess stages for the fused variant')
+    parser.add_argument('--worker', choices=['legacy', 'fused'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        pages = load_pages(args.images) if args.images else synthetic_pages(args.pages)
+        print(json.dumps(run_worker(args.worker, pages, args.stages)))
+        return
+
+    results = []
+    for variant in ('legacy', 'fused'):
+        command = [sys.executable, os.path.abspath(__file__), '--pages', str(args.pages),
+                   '--stages', args.stages, '--worker', variant]
+        if args.images:
+            command += ['--images', args.images]
+        proc = subprocess.run(command, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr, file=sys.stderr)
+            sys.exit(1)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        stages = "  ".join(f"{name}={ms:.1f}" for name, ms in result["stageMsPerPage"].items())
+        print(f"{variant:<7} {result['msPerPage']:7.1f}ms/page  traced={result['tracedPeakMb']:6.1f}MB  "
+              f"rss={format_mb(result['peakRssMb'])}  {stages}", file=sys.stderr)
+
+    print(json.dumps({"benchmark": "ocr_preprocess", "stages": args.stages, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
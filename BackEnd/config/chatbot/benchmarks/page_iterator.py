@@ -0,0 +1,108 @@
+"""
+Peak memory and time to first page of iter_pages on scanned PDFs of growing length.
+
+For each page count a synthetic scanned PDF (one 300 DPI image per page) is
+built in one subprocess, then another iterates it with iter_pages and
+reports peak RSS, time to the first page and total time. The two are kept
+apart because Linux carries a process' peak RSS over into the programs it
+starts. Peak RSS should stay flat as the page count grows, since only one
+page pixmap is alive at a time.
+
+Usage:
+    python benchmarks/page_iterator.py [--pages 1,10,40] [--mode processed] [--workers 1]
+
+Needs PyMuPDF and a working OCR engine (see ocrEngine).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rss import format_mb, peak_rss_mb
+
+
+def build_scanned_pdf(path, page_count):
+    """Write a PDF whose pages are images only (no text layer), like a scanner output."""
+    import io
+    import fitz  # PyMuPDF
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 48)
+    except OSError:
+        font = ImageFont.load_default()
+
+    img = Image.new("RGB", (2480, 3508), "white")
+    draw = ImageDraw.Draw(img)
+    for row in range(40):
+        draw.text((160, 160 + row * 80), "Chẩn đoán: Viêm phế quản cấp - Paracetamol 500mg", fill="black", font=font)
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+
+    doc = fitz.open()
+    for _ in range(page_count):
+        page = doc.new_page(width=595, height=842)
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    doc.save(path)
+    doc.close()
+
+
+def run_worker(path, mode, workers):
+    from handleMedicalHistory import iter_pages
+
+    start = time.perf_counter()
+    first_page = None
+    pages = 0
+    for _ in iter_pages(path, mode, workers):
+        if first_page is None:
+            first_page = time.perf_counter() - start
+        pages += 1
+    total = time.perf_counter() - start
+
+    return {"pages": pages, "firstPageSeconds": first_page, "totalSeconds": total, "peakRssMb": peak_rss_mb()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure iter_pages memory and latency against page count')
+    parser.add_argument('--pages', type=str, default='1,10,40', help='Comma separated page counts')
+    parser.add_argument('--mode', '-m', type=str, default='processed', help='OCR processing mode')
+    parser.add_argument('--workers', type=int, default=1, help='OCR worker processes (1 keeps RSS in one process)')
+    parser.add_argument('--worker', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--build', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build:
+        build_scanned_pdf(args.build, int(args.pages))
+        return
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.mode, args.workers)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in (int(value) for value in args.pages.split(',')):
+            path = os.path.join(tmp, f"scanned_{count}.pdf")
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--pages', str(count), '--build', path],
+                           check=True)
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', args.mode,
+                                   '--workers', str(args.workers), '--worker', path],
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(proc.stderr, file=sys.stderr)
+                sys.exit(1)
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{count:>4} pages  first={result['firstPageSeconds']:.2f}s  total={result['totalSeconds']:.2f}s  "
+                  f"rss={format_mb(result['peakRssMb'], 0)}", file=sys.stderr)
+
+    print(json.dumps({"benchmark": "page_iterator", "mode": args.mode, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
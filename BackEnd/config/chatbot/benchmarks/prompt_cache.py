@@ -0,0 +1,95 @@
+"""
+Measure Ollama prompt evaluation for the medical record extraction prompt.
+
+Sends each document to the model in turn and reports prompt_eval_count and
+prompt_eval_duration from every response. With the system-prompt layout the
+fixed instructions are a shared prefix, so from the second request on only
+the document tokens should be evaluated; --layout legacy sends the old
+single-message prompt (document first) for comparison.
+
+Usage:
+    python benchmarks/prompt_cache.py --files a.pdf b.png c.txt [--layout system|legacy] [--repeats 2]
+
+Generation is capped with --num-predict (default 1) so total time is close to
+time-to-first-token. Results bypass the structured record cache.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import processMedicalRecord as pmr
+from handleMedicalHistory import extract_text_cached
+
+NS_PER_MS = 1_000_000
+
+
+def legacy_messages(text):
+    """Pre-change layout: document text first, instructions after it, all in one user message."""
+    return [{
+        "role": "user",
+        "content": "Dưới đây là văn bản được trích xuất từ một hồ sơ y tế bằng OCR, "
+                   f"có thể có lỗi nhận dạng:\n\n{text}\n\n{pmr.EXTRACTION_SYSTEM_PROMPT}"
+    }]
+
+
+def measure(texts, layout, repeats, num_predict):
+    import ollama
+
+    build = pmr.build_extraction_messages if layout == "system" else legacy_messages
+    options = dict(pmr.CHAT_OPTIONS, num_predict=num_predict)
+
+    calls = []
+    for round_num in range(repeats):
+        for index, text in enumerate(texts):
+            response = ollama.chat(model=pmr.MODEL_NAME, messages=build(text), options=options)
+            call = {
+                "round": round_num,
+                "document": index,
+                "promptEvalCount": response.get("prompt_eval_count"),
+                "promptEvalMs": (response.get("prompt_eval_duration") or 0) / NS_PER_MS,
+                "loadMs": (response.get("load_duration") or 0) / NS_PER_MS,
+                "totalMs": (response.get("total_duration") or 0) / NS_PER_MS,
+            }
+            calls.append(call)
+            print(f"round={round_num} doc={index} prompt_eval_count={call['promptEvalCount']} "
+                  f"prompt_eval={call['promptEvalMs']:.1f}ms total={call['totalMs']:.1f}ms", file=sys.stderr)
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure prompt evaluation and KV-cache reuse in Ollama')
+    parser.add_argument('--files', nargs='+', required=True, help='Medical record files (any supported format)')
+    parser.add_argument('--mode', '-m', type=str, default='processed', help='OCR processing mode')
+    parser.add_argument('--layout', choices=['system', 'legacy'], default='system', help='Prompt layout to measure')
+    parser.add_argument('--repeats', type=int, default=2, help='Passes over the document set')
+    parser.add_argument('--num-predict', type=int, default=1, help='Tokens to generate per call')
+    args = parser.parse_args()
+
+    texts = [extract_text_cached(path, args.mode) for path in args.files]
+    calls = measure(texts, args.layout, args.repeats, args.num_predict)
+
+    first, rest = calls[0], calls[1:]
+    summary = {
+        "firstPromptEvalCount": first["promptEvalCount"],
+        "firstPromptEvalMs": first["promptEvalMs"],
+        "laterMeanPromptEvalCount": statistics.mean(c["promptEvalCount"] or 0 for c in rest) if rest else None,
+        "laterMeanPromptEvalMs": statistics.mean(c["promptEvalMs"] for c in rest) if rest else None,
+        "laterMeanTotalMs": statistics.mean(c["totalMs"] for c in rest) if rest else None,
+    }
+
+    print(json.dumps({
+        "benchmark": "prompt_cache",
+        "model": pmr.MODEL_NAME,
+        "layout": args.layout,
+        "promptVersion": pmr.PROMPT_VERSION,
+        "summary": summary,
+        "calls": calls,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
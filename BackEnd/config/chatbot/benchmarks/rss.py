@@ -0,0 +1,26 @@
+"""
+Peak resident set size of the current process, for the benchmark workers.
+
+getrusage only exists on Unix: on Windows peak_rss_mb() returns None and
+the summaries print n/a instead of the RSS.
+"""
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak RSS of this process in MB, or None where the platform does not report it."""
+    if resource is None:
+        return None
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+
+
+def format_mb(value, width=7):
+    """Right-aligned "123.4MB", or n/a for a missing measurement."""
+    return f"{value:{width}.1f}MB" if value is not None else f"{'n/a':>{width + 2}}"
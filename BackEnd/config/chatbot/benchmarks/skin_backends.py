@@ -0,0 +1,147 @@
+"""
+Parity check and latency/memory comparison between skin model backends.
+
+Each backend runs in its own subprocess (so peak RSS is comparable) over the
+same fixture images. Predictions are compared against the Keras model: top-1
+agreement and per-class absolute probability differences.
+
+Usage:
+    python benchmarks/skin_backends.py --fixtures samples/ --backends keras,tflite,onnx
+    python benchmarks/skin_backends.py --fixtures samples/ --backends keras,tflite=model_dynamic.tflite
+
+Prints a JSON report on stdout and exits with status 1 when a backend falls
+outside --min-top1 / --max-abs-diff.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from rss import format_mb, peak_rss_mb
+
+
+def run_worker(backend_name, model_path, fixtures, repeat):
+    """Load one backend, classify every fixture and report predictions, latency and memory."""
+    import process_skin_image as skin
+    from skin_backends import create_backend
+    from skin_bulk import collect_image_paths
+
+    paths = collect_image_paths(fixtures)
+    images = [skin.load_image_array(path) for path in paths]
+
+    start = time.perf_counter()
+    backend = create_backend(backend_name, model_path or None)
+    load_seconds = time.perf_counter() - start
+
+    # First call includes graph setup, keep it out of the latency numbers
+    backend.predict(np.expand_dims(images[0], axis=0))
+
+    latencies = []
+    probabilities = []
+    for _ in range(repeat):
+        probabilities = []
+        for img in images:
+            start = time.perf_counter()
+            output = backend.predict(np.expand_dims(img, axis=0))
+            latencies.append((time.perf_counter() - start) * 1000)
+            probabilities.append(np.asarray(output[0], dtype=np.float64).tolist())
+
+    return {
+        "paths": paths,
+        "probabilities": probabilities,
+        "loadSeconds": load_seconds,
+        "p50Ms": float(np.percentile(latencies, 50)),
+        "p99Ms": float(np.percentile(latencies, 99)),
+        "meanMs": float(np.mean(latencies)),
+        "peakRssMb": peak_rss_mb(),
+        "tensorflowImported": "tensorflow" in sys.modules,
+    }
+
+
+def compare(reference, candidate):
+    """Top-1 agreement and per-class probability differences against the reference backend."""
+    ref = np.asarray(reference)
+    cand = np.asarray(candidate)
+    diff = np.abs(ref - cand)
+    return {
+        "top1Agreement": float(np.mean(np.argmax(ref, axis=1) == np.argmax(cand, axis=1))),
+        "maxAbsDiff": float(diff.max()),
+        "meanAbsDiff": float(diff.mean()),
+        "maxAbsDiffPerClass": diff.max(axis=0).tolist(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare skin model backends against the Keras model')
+    parser.add_argument('--fixtures', type=str, required=True, help='Directory, glob or manifest of images')
+    parser.add_argument('--backends', type=str, default='keras,tflite,onnx',
+                        help='Comma separated backends, optionally name=model_path')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the fixture set for latency')
+    parser.add_argument('--min-top1', type=float, default=0.98, help='Minimum top-1 agreement with Keras')
+    parser.add_argument('--max-abs-diff', type=float, default=0.05, help='Maximum per-class probability difference')
+    parser.add_argument('--worker', nargs=2, metavar=('BACKEND', 'MODEL_PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker[0], args.worker[1], args.fixtures, args.repeat)))
+        return
+
+    specs = [spec.split('=', 1) if '=' in spec else [spec, ''] for spec in args.backends.split(',')]
+    if specs[0][0] != 'keras':
+        specs.insert(0, ['keras', ''])
+
+    results = {}
+    for name, model_path in specs:
+        label = f"{name}={model_path}" if model_path else name
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--fixtures', args.fixtures,
+             '--repeat', str(args.repeat), '--worker', name, model_path],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            results[label] = {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+            print(f"{label}: {results[label]['error']}", file=sys.stderr)
+            continue
+        results[label] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    reference = results.get('keras')
+    if not reference or "error" in reference:
+        print(json.dumps({"benchmark": "skin_backends", "results": results}, indent=2))
+        sys.exit(1)
+
+    failed = False
+    report = []
+    for label, result in results.items():
+        if "error" in result:
+            report.append({"backend": label, "error": result["error"]})
+            failed = True
+            continue
+
+        entry = {"backend": label}
+        entry.update({key: result[key] for key in
+                      ("loadSeconds", "p50Ms", "p99Ms", "meanMs", "peakRssMb", "tensorflowImported")})
+        entry.update(compare(reference["probabilities"], result["probabilities"]))
+        entry["passed"] = entry["top1Agreement"] >= args.min_top1 and entry["maxAbsDiff"] <= args.max_abs_diff
+        failed = failed or not entry["passed"]
+        report.append(entry)
+
+        print(f"{label:<40} p50={entry['p50Ms']:7.1f}ms  rss={format_mb(entry['peakRssMb'])}  "
+              f"top1={entry['top1Agreement']:.3f}  maxdiff={entry['maxAbsDiff']:.4f}  "
+              f"{'OK' if entry['passed'] else 'FAIL'}", file=sys.stderr)
+
+    print(json.dumps({
+        "benchmark": "skin_backends",
+        "fixtures": len(reference["paths"]),
+        "results": report,
+    }, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
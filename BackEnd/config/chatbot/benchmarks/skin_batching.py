@@ -0,0 +1,121 @@
+"""
+Benchmark micro-batched skin classification: throughput and p50/p99 latency per max batch size.
+
+Usage:
+    python benchmarks/skin_batching.py --batch-sizes 1,2,4,8,16 --requests 128 --concurrency 16
+    python benchmarks/skin_batching.py --stub-model      # tiny stand-in model, no .keras file needed
+
+Prints a JSON report on stdout and a summary table on stderr.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import process_skin_image as skin
+from skin_batcher import MicroBatcher
+from skin_backends import KerasBackend
+
+
+def build_stub_model():
+    """Small CNN with the same input and output shape as the real model."""
+    tf = skin.import_tensorflow()
+    inputs = tf.keras.Input(shape=(skin.IMG_SIZE[0], skin.IMG_SIZE[1], 3))
+    x = tf.keras.layers.Conv2D(8, 3, strides=4, activation="relu")(inputs)
+    x = tf.keras.layers.Conv2D(16, 3, strides=4, activation="relu")(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = tf.keras.layers.Dense(len(skin.CLASS_NAMES), activation="softmax")(x)
+    return tf.keras.Model(inputs, outputs)
+
+
+def percentile(values, pct):
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+def run(batcher, images, concurrency):
+    """Send every image through the batcher from `concurrency` client threads."""
+    latencies = []
+    lock = threading.Lock()
+    next_index = [0]
+
+    def client():
+        while True:
+            with lock:
+                index = next_index[0]
+                next_index[0] += 1
+            if index >= len(images):
+                return
+            start = time.perf_counter()
+            batcher.predict(images[index])
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed * 1000)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": len(images),
+        "wallSeconds": wall,
+        "throughput": len(images) / wall,
+        "p50Ms": percentile(latencies, 50),
+        "p99Ms": percentile(latencies, 99),
+        "meanBatchSize": batcher.images / max(batcher.batches, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark micro-batched skin classification')
+    parser.add_argument('--batch-sizes', type=str, default='1,2,4,8,16', help='Comma separated max batch sizes')
+    parser.add_argument('--requests', type=int, default=128, help='Images to classify per batch size')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client threads')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help='Batcher max wait time')
+    parser.add_argument('--stub-model', action='store_true', help='Use a tiny stand-in model')
+    args = parser.parse_args()
+
+    if args.stub_model:
+        skin.set_backend(KerasBackend(model=build_stub_model()))
+
+    rng = np.random.default_rng(0)
+    images = [rng.random((skin.IMG_SIZE[0], skin.IMG_SIZE[1], 3), dtype=np.float32)
+              for _ in range(min(args.requests, 32))]
+    images = [images[i % len(images)] for i in range(args.requests)]
+
+    # Warm up so graph tracing is not counted in the first measurement
+    skin.predict_batch(np.stack(images[:2]))
+
+    results = []
+    for batch_size in [int(size) for size in args.batch_sizes.split(',')]:
+        batcher = MicroBatcher(skin.predict_batch, batch_size, args.max_wait_ms)
+        try:
+            stats = run(batcher, images, args.concurrency)
+        finally:
+            batcher.close()
+        stats["maxBatchSize"] = batch_size
+        results.append(stats)
+        print(f"batch={batch_size:>3}  {stats['throughput']:8.2f} img/s  "
+              f"p50={stats['p50Ms']:8.1f}ms  p99={stats['p99Ms']:8.1f}ms  "
+              f"mean batch={stats['meanBatchSize']:.1f}", file=sys.stderr)
+
+    print(json.dumps({
+        "benchmark": "skin_batching",
+        "concurrency": args.concurrency,
+        "maxWaitMs": args.max_wait_ms,
+        "stubModel": args.stub_model,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Decode time and peak memory of the skin classifier input path on 12MP photos.
+
+legacy reproduces the old load_image_array: full-resolution decode, nearest
+resize to 450x450, float32 copy, then a second array for the division.
+draft is process_skin_image.load_image_array reading the file, draft_bytes
+the same from in-memory bytes into a reused output buffer (the server and
+stdin path).
+
+Each variant runs in its own subprocess so peak RSS is comparable; the
+photos are generated in another one, since Linux carries a process' peak
+RSS over into the programs it starts. The report also gives the mean
+absolute pixel difference between the draft and legacy inputs on the first
+image, since reduced-scale JPEG decoding averages pixels where the full
+decode + nearest resize picks one.
+
+Usage:
+    python benchmarks/skin_decode.py [--images 8] [--size 4000x3000] [--photos photos/]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CHATBOT_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rss import format_mb, peak_rss_mb
+
+VARIANTS = ("legacy", "draft", "draft_bytes")
+
+
+def legacy_load(path):
+    import numpy as np
+    from PIL import Image
+    from process_skin_image import IMG_SIZE
+
+    with Image.open(path) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.size != (IMG_SIZE[1], IMG_SIZE[0]):
+            img = img.resize((IMG_SIZE[1], IMG_SIZE[0]), Image.NEAREST)
+        img_array = np.asarray(img, dtype=np.float32)
+    return img_array / 255.0
+
+
+def make_decoder(variant):
+    """Return a callable decoding one image path the way the variant does."""
+    import numpy as np
+    from process_skin_image import IMG_SIZE, load_image_array
+
+    if variant == "legacy":
+        return legacy_load
+    if variant == "draft":
+        return load_image_array
+
+    out = np.empty((IMG_SIZE[0], IMG_SIZE[1], 3), dtype=np.float32)
+
+    def decode_bytes(path):
+        # Reading the file stands in for the upload already being in memory
+        with open(path, "rb") as f:
+            data = f.read()
+        return load_image_array(data, out=out)
+    return decode_bytes
+
+
+def run_worker(variant, paths):
+    decode = make_decoder(variant)
+    decode(paths[0])  # warm-up: imports and first-call costs
+
+    tracemalloc.start()
+    samples = []
+    for path in paths:
+        start = time.perf_counter()
+        decode(path)
+        samples.append((time.perf_counter() - start) * 1000)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "variant": variant,
+        "images": len(paths),
+        "medianMs": statistics.median(samples),
+        "meanMs": statistics.mean(samples),
+        "tracedPeakMb": traced_peak / (1024 * 1024),
+        "peakRssMb": peak_rss_mb(),
+    }
+
+
+def build_photos(directory, count, size):
+    import fixtures
+    return [fixtures.lesion_image(directory, index, size) for index in range(count)]
+
+
+def list_photos(directory):
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith((".jpg", ".jpeg", ".png")))
+    return [os.path.join(directory, name) for name in names]
+
+
+def input_difference(path):
+    """Mean absolute difference between the draft and legacy model inputs, in [0, 1] units."""
+    import numpy as np
+    from process_skin_image import load_image_array
+
+    return float(np.mean(np.abs(load_image_array(path) - legacy_load(path))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark skin image decoding on large photos')
+    parser.add_argument('--images', type=int, default=8, help='Synthetic photos to generate')
+    parser.add_argument('--size', type=str, default='4000x3000', help='Synthetic photo size (12MP by default)')
+    parser.add_argument('--photos', type=str, help='Directory of JPEG/PNG photos to use instead')
+    parser.add_argument('--worker', choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument('--paths', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--generate', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.paths.split(os.pathsep))))
+        return
+    if args.generate:
+        width, height = (int(value) for value in args.size.lower().split('x'))
+        print(json.dumps(build_photos(args.generate, args.images, (width, height))))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.photos:
+            paths = list_photos(args.photos)
+        else:
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--images', str(args.images),
+                                   '--size', args.size, '--generate', tmp], capture_output=True, text=True, check=True)
+            paths = json.loads(proc.stdout.strip().splitlines()[-1])
+
+        for variant in VARIANTS:
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', variant,
+                                   '--paths', os.pathsep.join(paths)], capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(proc.stderr, file=sys.stderr)
+                sys.exit(1)
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{variant:<12} {result['medianMs']:7.1f}ms  traced={result['tracedPeakMb']:6.1f}MB  "
+                  f"rss={format_mb(result['peakRssMb'])}", file=sys.stderr)
+
+        difference = input_difference(paths[0])
+
+    print(json.dumps({"benchmark": "skin_decode", "results": results, "meanAbsInputDifference": difference},
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
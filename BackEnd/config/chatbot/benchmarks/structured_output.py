@@ -0,0 +1,103 @@
+"""
+Compare free-form and schema-constrained replies for record structuring.
+
+Runs every document through the model in two modes:
+  legacy - free-form reply parsed with the code-fence / brace heuristics;
+           a parse failure means the user re-uploads, so all tokens of
+           that call are wasted
+  schema - structure_with_chatbot: RECORD_SCHEMA, streamed with early stop
+           and one repair retry
+
+Reports parse failures, retries, generated tokens and wasted tokens per mode.
+
+Usage:
+    python benchmarks/structured_output.py --files a.pdf b.png c.txt [--repeats 3]
+
+Texts are extracted once (through the extraction cache) and reused for
+both modes, so only the chatbot step is measured.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import processMedicalRecord as pmr
+from handleMedicalHistory import extract_text_cached
+
+
+def run_legacy(text):
+    import ollama
+
+    response = ollama.chat(model=pmr.MODEL_NAME, messages=pmr.build_extraction_messages(text),
+                           options=pmr.CHAT_OPTIONS)
+    tokens = response.get("eval_count") or 0
+    try:
+        pmr.parse_record_response(response["message"]["content"])
+        success = True
+    except ValueError:
+        success = False
+    return {"success": success, "attempts": 1, "tokens": tokens, "wastedTokens": 0 if success else tokens}
+
+
+def run_schema(text):
+    result = pmr.structure_with_chatbot(text)
+    return {
+        "success": result["success"],
+        "attempts": result.get("attempts", 1),
+        "tokens": result.get("generated_tokens", 0),
+        "wastedTokens": result.get("wasted_tokens", 0),
+    }
+
+
+RUNNERS = {"legacy": run_legacy, "schema": run_schema}
+
+
+def measure(texts, mode, repeats):
+    runner = RUNNERS[mode]
+    calls = []
+    for round_num in range(repeats):
+        for index, text in enumerate(texts):
+            start = time.perf_counter()
+            call = runner(text)
+            call.update(round=round_num, document=index, seconds=time.perf_counter() - start)
+            calls.append(call)
+            print(f"{mode} round={round_num} doc={index} success={call['success']} "
+                  f"attempts={call['attempts']} tokens={call['tokens']} {call['seconds']:.2f}s", file=sys.stderr)
+    return calls
+
+
+def summarize(calls):
+    return {
+        "calls": len(calls),
+        "failures": sum(1 for c in calls if not c["success"]),
+        "retries": sum(c["attempts"] - 1 for c in calls),
+        "generatedTokens": sum(c["tokens"] for c in calls),
+        "wastedTokens": sum(c["wastedTokens"] for c in calls),
+        "meanSeconds": statistics.mean(c["seconds"] for c in calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare free-form and schema-constrained record structuring')
+    parser.add_argument('--files', nargs='+', required=True, help='Medical record files (any supported format)')
+    parser.add_argument('--mode', '-m', type=str, default='processed', help='OCR processing mode')
+    parser.add_argument('--outputs', nargs='+', choices=list(RUNNERS), default=list(RUNNERS), help='Reply modes to measure')
+    parser.add_argument('--repeats', type=int, default=1, help='Passes over the document set')
+    args = parser.parse_args()
+
+    texts = [extract_text_cached(path, args.mode) for path in args.files]
+
+    report = {"model": pmr.MODEL_NAME, "documents": len(texts), "modes": {}}
+    for mode in args.outputs:
+        calls = measure(texts, mode, args.repeats)
+        report["modes"][mode] = {"summary": summarize(calls), "calls": calls}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Benchmark suite for the chatbot Python pipeline on synthetic fixtures.
+
+Generates inputs offline (benchmarks/fixtures.py), then times:
+
+    extract_text/<format>/<mode>   txt, docx, text-layer PDF, scanned PDF, PNG and JPEG scans
+    process_image_for_ocr/<mode>   preprocessing of a scan
+    process_with_chatbot           prompt building, streaming and parsing against a stubbed Ollama
+    process_image                  skin classification with a tiny stand-in Keras model
+
+Cases whose dependency is missing (OCR engine, TensorFlow, PyMuPDF, ...)
+are reported as skipped. The JSON report includes the git commit so runs
+can be compared across commits:
+
+    python benchmarks/suite.py --output before.json
+    git checkout other-branch
+    python benchmarks/suite.py --output after.json --baseline before.json
+
+Usage:
+    python benchmarks/suite.py [--repeats 5] [--cases extract_text,process_image] [--output report.json]
+"""
+import os
+import sys
+import json
+import time
+import types
+import argparse
+import contextlib
+import platform
+import statistics
+import subprocess
+import tempfile
+
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CHATBOT_DIR)
+# Appended, so chatbot modules win over same-named benchmark scripts (skin_backends)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+
+# Characters per streamed chunk, roughly one token
+STUB_CHUNK_CHARS = 4
+
+
+def install_stub_ollama():
+    """Replace the ollama module with an in-process stand-in that answers instantly."""
+    module = types.ModuleType("ollama")
+    reply = json.dumps(fixtures.CANNED_RECORD, ensure_ascii=False)
+
+    def chat(model=None, messages=None, stream=False, **kwargs):
+        if not stream:
+            return {"message": {"role": "assistant", "content": reply}, "done": True,
+                    "eval_count": len(reply) // STUB_CHUNK_CHARS}
+
+        def parts():
+            for start in range(0, len(reply), STUB_CHUNK_CHARS):
+                yield {"message": {"role": "assistant", "content": reply[start:start + STUB_CHUNK_CHARS]},
+                       "done": False}
+            yield {"message": {"role": "assistant", "content": ""}, "done": True}
+        return parts()
+
+    module.chat = chat
+    module.list = lambda: {"models": []}
+    sys.modules["ollama"] = module
+
+
+def git_commit():
+    """Current commit hash and whether the chatbot directory has uncommitted changes."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=CHATBOT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", "."], cwd=CHATBOT_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def time_case(func, repeats, warmup=1):
+    """Run func warmup + repeats times and summarize the timed runs in milliseconds."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeats": repeats,
+        "minMs": min(samples),
+        "medianMs": statistics.median(samples),
+        "meanMs": statistics.mean(samples),
+        "maxMs": max(samples),
+    }
+
+
+def build_cases(paths):
+    """Map case name -> zero-argument callable for the fixtures that could be generated."""
+    import handleMedicalHistory as hmh
+
+    cases = {}
+    for name in ("txt", "docx", "pdf_text"):
+        if name in paths:
+            cases[f"extract_text/{name}/original"] = lambda path=paths[name]: hmh.extract_text(path, "original", 1)
+    for name in ("pdf_scanned", "png", "jpeg"):
+        if name in paths:
+            for mode in ("original", "processed"):
+                cases[f"extract_text/{name}/{mode}"] = lambda path=paths[name], mode=mode: hmh.extract_text(path, mode, 1)
+
+    if "png" in paths:
+        decoded = {}
+
+        def preprocess(mode):
+            # Decoded once, in the untimed warm-up run, so only the preprocessing is measured
+            if "img" not in decoded:
+                from PIL import Image
+                with Image.open(paths["png"]) as img:
+                    decoded["img"] = img.copy()
+            return hmh.process_image_for_ocr(decoded["img"], mode)
+        for mode in ("original", "processed"):
+            cases[f"process_image_for_ocr/{mode}"] = lambda mode=mode: preprocess(mode)
+
+    def chatbot():
+        import processMedicalRecord as pmr
+        result = pmr.process_with_chatbot(fixtures.record_text(), cache=None)
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+    cases["process_with_chatbot"] = chatbot
+
+    if "lesions" in paths:
+        state = {}
+
+        def classify():
+            import process_skin_image as skin
+            if "ready" not in state:
+                from skin_backends import KerasBackend
+                from skin_batching import build_stub_model
+                skin.set_backend(KerasBackend(model=build_stub_model()))
+                state["ready"] = True
+            for path in paths["lesions"]:
+                result = skin.process_image(path)
+                if not result["success"]:
+                    raise RuntimeError(result["error"])
+        cases["process_image"] = classify
+
+    return cases
+
+
+def compare(report, baseline):
+    """Print median time ratios against a previous report."""
+    previous = {case["name"]: case for case in baseline.get("cases", []) if "medianMs" in case}
+    print(f"\nvs {baseline.get('commit', '?')[:10]}:", file=sys.stderr)
+    for case in report["cases"]:
+        before = previous.get(case["name"])
+        if before and "medianMs" in case:
+            ratio = case["medianMs"] / before["medianMs"] if before["medianMs"] else float("inf")
+            print(f"  {case['name']:<40} {before['medianMs']:9.1f} -> {case['medianMs']:9.1f}ms  x{ratio:.2f}",
+                  file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the chatbot pipeline on synthetic fixtures')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed runs per case')
+    parser.add_argument('--cases', type=str, help='Comma separated case name prefixes to run (default: all)')
+    parser.add_argument('--fixtures-dir', type=str, help='Keep generated fixtures here instead of a temp directory')
+    parser.add_argument('--output', '-o', type=str, help='Write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', type=str, help='Previous JSON report to compare medians against')
+    args = parser.parse_args()
+
+    # Measure the work itself, not the result caches
+    for variable in ("EXTRACTION_CACHE_DIR", "CHATBOT_CACHE_DIR"):
+        os.environ.pop(variable, None)
+    install_stub_ollama()
+
+    prefixes = [prefix.strip() for prefix in args.cases.split(',')] if args.cases else None
+    commit, dirty = git_commit()
+    report = {
+        "benchmark": "suite",
+        "commit": commit,
+        "dirty": dirty,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "cases": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.fixtures_dir or tmp
+        # Page progress (and library notices) would otherwise end up in the JSON report
+        with contextlib.redirect_stdout(sys.stderr):
+            paths = fixtures.build_fixtures(directory)
+            cases = build_cases(paths)
+        for name, func in cases.items():
+            if prefixes and not any(name.startswith(prefix) for prefix in prefixes):
+                continue
+            entry = {"name": name}
+            try:
+                with contextlib.redirect_stdout(sys.stderr):
+                    entry.update(time_case(func, args.repeats))
+                print(f"{name:<40} median={entry['medianMs']:9.1f}ms  min={entry['minMs']:9.1f}ms", file=sys.stderr)
+            except Exception as e:
+                entry["skipped"] = f"{type(e).__name__}: {e}"
+                print(f"{name:<40} skipped ({entry['skipped']})", file=sys.stderr)
+            report["cases"].append(entry)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
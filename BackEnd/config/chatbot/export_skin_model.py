@@ -0,0 +1,122 @@
+"""
+Export the skin disease Keras model for the lighter CPU inference backends.
+
+Usage:
+    python export_skin_model.py tflite --quantize dynamic
+    python export_skin_model.py tflite --quantize int8 --calibration-dir samples/
+    python export_skin_model.py onnx [--quantize int8]
+
+Outputs are written next to the Keras model with the names skin_backends.py
+looks for by default (override with --output). Run
+benchmarks/skin_backends.py afterwards to check parity with the Keras model.
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+
+import process_skin_image as skin
+from skin_bulk import collect_image_paths
+
+
+def representative_dataset(calibration_dir, limit):
+    """Yield calibration images one at a time for int8 quantization."""
+    paths = collect_image_paths(calibration_dir)[:limit]
+    if not paths:
+        raise ValueError(f"No calibration images found in {calibration_dir}")
+
+    def generator():
+        for path in paths:
+            yield [np.expand_dims(skin.load_image_array(path), axis=0)]
+
+    return generator
+
+
+def export_tflite(model, output_path, quantize, calibration_dir=None, calibration_limit=200, integer_io=False):
+    """
+    Convert the Keras model to TFLite
+
+    Args:
+        model: Loaded Keras model
+        output_path: Destination .tflite file
+        quantize: "dynamic" (int8 weights) or "int8" (int8 weights and activations)
+        calibration_dir: Images used to calibrate activation ranges (int8 only)
+        calibration_limit: Maximum number of calibration images
+        integer_io: Also quantize the model's input and output tensors (int8 only)
+    """
+    tf = skin.import_tensorflow()
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantize == "int8":
+        if not calibration_dir:
+            raise ValueError("--calibration-dir is required for int8 quantization")
+        converter.representative_dataset = representative_dataset(calibration_dir, calibration_limit)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        if integer_io:
+            converter.inference_input_type = tf.int8
+            converter.inference_output_type = tf.int8
+
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, output_path, quantize=None, opset=17):
+    """
+    Convert the Keras model to ONNX, optionally with int8 dynamic quantization
+
+    Args:
+        model: Loaded Keras model
+        output_path: Destination .onnx file
+        quantize: None or "int8"
+        opset: ONNX opset version
+    """
+    tf = skin.import_tensorflow()
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, skin.IMG_SIZE[0], skin.IMG_SIZE[1], 3), tf.float32, name="input"),)
+
+    if quantize == "int8":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        float_path = output_path.replace(".onnx", "_float.onnx")
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=float_path)
+        quantize_dynamic(float_path, output_path, weight_type=QuantType.QInt8)
+        os.remove(float_path)
+    else:
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the skin disease model for TFLite or ONNX Runtime')
+    parser.add_argument('format', choices=['tflite', 'onnx'], help='Target format')
+    parser.add_argument('--quantize', '-q', type=str, choices=['none', 'dynamic', 'int8'], default=None,
+                        help='Quantization (tflite default: dynamic, onnx default: none)')
+    parser.add_argument('--calibration-dir', type=str, help='Calibration images for int8 TFLite')
+    parser.add_argument('--calibration-limit', type=int, default=200, help='Maximum calibration images')
+    parser.add_argument('--integer-io', action='store_true', help='Use int8 input/output tensors (TFLite int8)')
+    parser.add_argument('--output', '-o', type=str, help='Output file')
+    args = parser.parse_args()
+
+    model = skin.load_model()
+
+    if args.format == 'tflite':
+        quantize = args.quantize or 'dynamic'
+        if quantize == 'none':
+            parser.error('TFLite export is always quantized, use --quantize dynamic or int8')
+        output = args.output or os.path.join(skin.current_dir, f"skin_disease_detect_model_{quantize}.tflite")
+        export_tflite(model, output, quantize, args.calibration_dir, args.calibration_limit, args.integer_io)
+    else:
+        quantize = None if args.quantize in (None, 'none') else 'int8'
+        if args.quantize == 'dynamic':
+            print("ONNX int8 export uses dynamic quantization", file=sys.stderr)
+        name = "skin_disease_detect_model_int8.onnx" if quantize else "skin_disease_detect_model.onnx"
+        output = args.output or os.path.join(skin.current_dir, name)
+        export_onnx(model, output, quantize)
+
+    print(f"Exported {output} ({os.path.getsize(output) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
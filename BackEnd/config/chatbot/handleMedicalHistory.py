@@ -1,223 +1,677 @@
 import os
 import argparse
-import cv2
-import numpy as np
-from PIL import Image, ImageEnhance
-import pytesseract
-import docx
-import PyPDF2
-import fitz  # PyMuPDF
+import threading
+
+from instrumentation import stage
+from ocrEngine import TESSERACT_CONFIG, get_engine
+
+# Heavy dependencies (cv2, numpy, PIL, the OCR engine, docx, fitz) are
+# imported inside the extractor that needs them, so a .txt upload does not pay
+# for OpenCV or PyMuPDF at startup. See benchmarks/import_time.py.
+
+# Bump whenever a change to extraction or preprocessing changes the extracted text,
+# so cached results produced by an older pipeline are not reused
+PIPELINE_VERSION = 3
 
 def extract_text_from_txt(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         return f.read()
 
 def extract_text_from_docx(file_path):
-    doc = docx.Document(file_path)
+    import docx
+
+    with stage("decode"):
+        doc = docx.Document(file_path)
     fullText = []
     for para in doc.paragraphs:
         fullText.append(para.text)
     return "\n".join(fullText)
 
-def extract_text_from_pdf(file_path, process_type="processed"):
+# Pages with less embedded text than this are treated as scanned and OCR'd
+MIN_PAGE_TEXT_LENGTH = 50
+
+def default_ocr_workers():
+    """Number of OCR worker processes: OCR_WORKERS environment variable or the CPU count."""
+    return int(os.environ.get("OCR_WORKERS") or os.cpu_count() or 1)
+
+def pixmap_to_array(pix):
+    """
+    View a PyMuPDF pixmap's samples as an H x W x N uint8 array without copying
+    
+    The array borrows the pixmap's memory: keep the pixmap alive while it is used.
+    """
+    import numpy as np
+    
+    samples = getattr(pix, "samples_mv", None)
+    if samples is None:
+        # PyMuPDF < 1.18.17 only exposes a bytes copy
+        samples = pix.samples
+    return np.ndarray((pix.height, pix.width, pix.n), dtype=np.uint8, buffer=samples,
+                      strides=(pix.stride, pix.n, 1))
+
+def _ocr_pdf_page(page, process_type="processed"):
     """
-    Extract text from PDF file with fallback to OCR if normal extraction fails
+    Render one PyMuPDF page and run OCR on it
     
     Args:
-        file_path: Path to the PDF file
-        process_type: OCR processing mode if needed - "original" or "processed"
+        page: fitz.Page to process
+        process_type: OCR processing mode - "original", "processed" or "auto"
     
     Returns:
-        Extracted text as string
+        Tuple of (extracted text of the page, "auto" mode decision or None)
+    """
+    # Render the page and OCR straight from the pixmap's memory, only one pixmap alive at a time
+    with stage("render"):
+        pix = page.get_pixmap(alpha=False)
+    
+    if process_type == "auto":
+        text, _, decision = ocr_image_auto(pixmap_to_array(pix))
+        del pix
+        return text, decision
+    
+    # Process image with OCR (binarization happens in ocrPreprocess, shared with images)
+    processed_img = process_image_for_ocr(pixmap_to_array(pix), process_type)
+    
+    # Extract text from image
+    with stage("ocr"):
+        text = get_engine().image_to_string(processed_img)
+    del processed_img, pix
+    return text, None
+
+# PDF opened once per OCR worker process
+_worker_pdf = None
+
+def _init_pdf_worker(file_path):
+    global _worker_pdf
+    import fitz  # PyMuPDF
+    
+    # One Tesseract run per worker at a time, don't let each one spawn a thread per core
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    _worker_pdf = fitz.open(file_path)
+
+def _ocr_pdf_page_in_worker(args):
+    page_num, process_type = args
+    return _ocr_pdf_page(_worker_pdf[page_num], process_type)
+
+def iter_ocr_pdf_pages(file_path, process_type="processed", workers=None, page_numbers=None, pdf_document=None):
     """
-    text = ""
-    with open(file_path, "rb") as f:
-        reader = PyPDF2.PdfReader(f)
-        for page_num, page in enumerate(reader.pages):
-            page_text = page.extract_text()
-            text += page_text + "\n" if page_text else "\n"
+    OCR pages of a PDF, yielding each page's text as soon as it is ready
     
-    # Check if extracted text is insufficient (empty or very little text)
-    if not text.strip() or len(text.strip()) < 100:
-        print("Phát hiện PDF không có text layer, đang áp dụng OCR...")
+    Pages are OCR'd in parallel across worker processes when useful; results
+    still come out in page order.
+    
+    Args:
+        file_path: Path to the PDF file
+        process_type: OCR processing mode - "original", "processed" or "auto"
+        workers: Number of worker processes (default: default_ocr_workers()), 1 for sequential
+        page_numbers: Zero-based pages to OCR (default: every page)
+        pdf_document: Already opened fitz.Document to reuse in sequential mode
+    
+    Yields:
+        Page texts in the order of page_numbers
+    """
+    for text, _ in _iter_ocr_pdf_results(file_path, process_type, workers, page_numbers, pdf_document):
+        yield text
+
+def _iter_ocr_pdf_results(file_path, process_type, workers, page_numbers, pdf_document):
+    """iter_ocr_pdf_pages yielding (text, "auto" mode decision or None) tuples."""
+    import fitz  # PyMuPDF
+    from concurrent.futures import ProcessPoolExecutor
+    
+    if workers is None:
+        workers = default_ocr_workers()
+    
+    owns_document = pdf_document is None
+    if owns_document:
+        pdf_document = fitz.open(file_path)
+    
+    try:
+        if page_numbers is None:
+            page_numbers = list(range(len(pdf_document)))
+        page_count = len(page_numbers)
         
-        # Set tesseract path
-        pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+        # A single page (or a single worker) is not worth the process pool startup
+        if workers <= 1 or page_count <= 1:
+            for index, page_num in enumerate(page_numbers):
+                page_result = _ocr_pdf_page(pdf_document[page_num], process_type)
+                print(f"Đã xử lý trang {index + 1}/{page_count}")
+                yield page_result
+            return
+    finally:
+        if owns_document:
+            pdf_document.close()
+    
+    # map() returns results in page order even when pages finish out of order
+    jobs = [(page_num, process_type) for page_num in page_numbers]
+    executor = ProcessPoolExecutor(max_workers=min(workers, page_count),
+                                   initializer=_init_pdf_worker, initargs=(file_path,))
+    results = executor.map(_ocr_pdf_page_in_worker, jobs)
+    try:
+        for index, page_result in enumerate(results):
+            print(f"Đã xử lý trang {index + 1}/{page_count}")
+            yield page_result
+    finally:
+        # A caller that stops early only waits for the pages already being OCR'd
+        results.close()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def ocr_pdf_pages(file_path, process_type="processed", workers=None, page_numbers=None, pdf_document=None):
+    """
+    OCR pages of a PDF, in parallel across worker processes when useful
+    
+    Returns:
+        List of page texts in the order of page_numbers (see iter_ocr_pdf_pages for the arguments)
+    """
+    return list(iter_ocr_pdf_pages(file_path, process_type, workers, page_numbers, pdf_document))
+
+def iter_pdf_pages(file_path, process_type="processed", workers=None, min_text_length=MIN_PAGE_TEXT_LENGTH):
+    """
+    Yield the pages of a PDF, using OCR only for pages without a usable text layer
+    
+    The text layer is read in one pass first to find scanned pages; pages are
+    then yielded in order as soon as each is ready.
+    
+    Yields:
+        {"page": 1-based number, "text": page text, "source": "text_layer" or "ocr"},
+        plus the page's decision under "ocr" for pages OCR'd in "auto" mode
+    """
+    import fitz  # PyMuPDF
+
+    pdf_document = fitz.open(file_path)
+    ocr_results = None
+    try:
+        with stage("text_layer"):
+            page_texts = [pdf_document[page_num].get_text() for page_num in range(len(pdf_document))]
         
-        # Process PDF pages with OCR
-        ocr_text = ""
-        pdf_document = fitz.open(file_path)
+        # Pages with empty or very little embedded text are probably scanned
+        ocr_pages = [page_num for page_num, page_text in enumerate(page_texts)
+                     if len(page_text.strip()) < min_text_length]
         
-        for page_num in range(len(pdf_document)):
-            # Get page
-            page = pdf_document[page_num]
-            
-            # Convert page to image
-            pix = page.get_pixmap(alpha=False)
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            
-            # Process image with OCR
-            processed_img = process_image_for_ocr(img, process_type)
-            
-            # Enhance image
-            if process_type == "processed":
-                # Tăng độ tương phản
-                enhancer = ImageEnhance.Contrast(processed_img)
-                processed_img = enhancer.enhance(2.0)
-                
-                # Tăng độ sắc nét
-                enhancer = ImageEnhance.Sharpness(processed_img)
-                processed_img = enhancer.enhance(2.0)
-                
-                # Tăng độ sáng
-                enhancer = ImageEnhance.Brightness(processed_img)
-                processed_img = enhancer.enhance(1.2)
-            
-            # Define custom configuration for Tesseract
-            custom_config = r'--oem 3 --psm 6 -l eng+vie'
-            
-            # Extract text from image
-            page_text = pytesseract.image_to_string(processed_img, config=custom_config)
-            ocr_text += page_text + "\n\n"
-            
-            print(f"Đã xử lý trang {page_num + 1}/{len(pdf_document)}")
+        if ocr_pages:
+            print(f"Phát hiện {len(ocr_pages)}/{len(page_texts)} trang không có text layer, đang áp dụng OCR...")
+            ocr_results = _iter_ocr_pdf_results(file_path, process_type, workers, ocr_pages, pdf_document)
         
+        ocr_set = set(ocr_pages)
+        for page_num in range(len(page_texts)):
+            if page_num in ocr_set:
+                text, decision = next(ocr_results)
+                page = {"page": page_num + 1, "text": text, "source": "ocr"}
+                if decision is not None:
+                    page["ocr"] = decision
+                yield page
+            else:
+                yield {"page": page_num + 1, "text": page_texts[page_num], "source": "text_layer"}
+            page_texts[page_num] = None
+    finally:
+        if ocr_results is not None:
+            ocr_results.close()
         pdf_document.close()
-        return ocr_text
+
+def extract_text_from_pdf(file_path, process_type="processed", workers=None, min_text_length=MIN_PAGE_TEXT_LENGTH,
+                          decisions=None):
+    """
+    Extract text from PDF file, using OCR only for pages without a usable text layer
     
-    return text
+    The PDF is parsed once with PyMuPDF. Pages whose embedded text is shorter
+    than min_text_length are rendered and OCR'd, all other pages keep their text layer.
+    
+    Args:
+        file_path: Path to the PDF file
+        process_type: OCR processing mode if needed - "original", "processed" or "auto"
+        workers: Number of OCR worker processes (default: OCR_WORKERS or CPU count)
+        min_text_length: Minimum characters of embedded text for a page to skip OCR
+        decisions: List to append the "auto" mode decision of every OCR'd page to
+    
+    Returns:
+        Extracted text as string
+    """
+    texts = []
+    for page in iter_pdf_pages(file_path, process_type, workers, min_text_length):
+        if decisions is not None and "ocr" in page:
+            decisions.append(page["ocr"])
+        texts.append(page["text"].strip("\n"))
+    return "\n\n".join(texts)
 
-def process_image_for_ocr(img, process_type="original"):
-    # Convert PIL Image to numpy array for OpenCV processing if needed
-    if isinstance(img, Image.Image):
-        img_np = np.array(img)
-    else:
-        img_np = img
-        
+def process_image_for_ocr(img, process_type="original", stages=None):
+    """
+    Prepare an image for OCR
+    
+    Args:
+        img: PIL Image or numpy array
+        process_type: "original" returns the image as is, "processed" runs the
+            ocrPreprocess stages (grayscale and Otsu threshold by default)
+        stages: Preprocessing stage names (default: OCR_PREPROCESS or ocrPreprocess.DEFAULT_STAGES)
+    
+    Returns:
+        PIL Image for the OCR engine
+    """
+    from PIL import Image
+    
     if process_type == "processed":
-        # Convert to grayscale
-        if len(img_np.shape) == 3:
-            gray = cv2.cvtColor(img_np, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = img_np
-            
-        # Apply thresholding to get clear black and white image
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        from ocrPreprocess import preprocess
         
-        # Noise removal using morphological operations
-        kernel = np.ones((1, 1), np.uint8)
-        opening = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=1)
-        
-        # Return as PIL Image for pytesseract
-        return Image.fromarray(opening)
-    else:
-        # Return original image as PIL Image
-        if isinstance(img, Image.Image):
-            return img
-        else:
-            return Image.fromarray(img_np)
+        # Return as PIL Image for the OCR engine (shares the array's memory)
+        with stage("preprocess"):
+            return Image.fromarray(preprocess(img, stages))
+    
+    # Return original image as PIL Image
+    if isinstance(img, Image.Image):
+        return img
+    return Image.fromarray(img)
 
-def extract_text_from_image(file_path, process_type="original"):
+def extract_text_from_image(file_path, process_type="original", with_confidence=False):
     """
     Extract text from image with enhanced line-by-line extraction
     
     Args:
         file_path: Path to the image file
-        process_type: Type of image processing - "original" or "processed"
+        process_type: Type of image processing - "original", "processed" or "auto"
+            (see ocr_image_auto)
+        with_confidence: Return word-level OCR confidences along with the text
     
     Returns:
-        Extracted text as string
+        Extracted text as string, or when with_confidence is set a dictionary
+        with "text", "words" ([{"text", "confidence"}]) and "mean_confidence",
+        plus the summarize_ocr_decisions summary under "ocr" in "auto" mode
     """
-    # Set Tesseract executable path
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-    
+    from PIL import Image
+
     # Load image
-    img = Image.open(file_path)
+    with stage("decode"):
+        img = Image.open(file_path)
+        img.load()
+    return ocr_image(img, process_type, with_confidence)
+
+def ocr_image(img, process_type="original", with_confidence=False):
+    """
+    OCR one loaded image or frame (see extract_text_from_image)
+    
+    Args:
+        img: PIL Image or numpy array
+        process_type: Type of image processing - "original", "processed" or "auto"
+        with_confidence: Return word-level OCR confidences along with the text
+    """
+    if process_type == "auto":
+        text, words, decision = ocr_image_auto(img)
+        if with_confidence:
+            return {
+                "text": text,
+                "words": words,
+                "mean_confidence": mean_word_confidence(words),
+                "ocr": summarize_ocr_decisions([decision])
+            }
+        return text
     
     # Process image based on selected mode
     processed_img = process_image_for_ocr(img, process_type)
     
-    # Enhance image if processed mode is selected
-    if process_type == "processed":
-        # Tăng độ tương phản
-        enhancer = ImageEnhance.Contrast(processed_img)
-        processed_img = enhancer.enhance(2.0)  # Tăng giá trị để tăng độ tương phản
-        
-        # Tăng độ sắc nét
-        enhancer = ImageEnhance.Sharpness(processed_img) 
-        processed_img = enhancer.enhance(2.0)  # Tăng giá trị để làm rõ nét hơn
-        
-        # Tăng độ sáng nếu cần
-        enhancer = ImageEnhance.Brightness(processed_img)
-        processed_img = enhancer.enhance(1.2)  # > 1.0 để tăng độ sáng
-        
-        # Nâng cao độ nét của đường viền bằng cách tăng đặc trưng màu
-        enhancer = ImageEnhance.Color(processed_img)
-        processed_img = enhancer.enhance(1.5)
-        # Display processed image for visual inspection for 10 seconds
-        try:
-            # Convert PIL image to numpy array for OpenCV
-            img_array = np.array(processed_img)
-            # # Display the image
-            # cv2.imshow("Processed Image", img_array)
-            # # Wait for 10 seconds
-            # cv2.waitKey(5000)
-            # # Close the window
-            # cv2.destroyAllWindows()
-        except Exception as e:
-            print(f"Could not display processed image: {str(e)}")
-        
-    # Define custom configuration for Tesseract
-    # --oem 3: Default, --psm 6: Assume a single uniform block of text
-    # -l eng+vie: Use both English and Vietnamese language data
-    custom_config = r'--oem 3 --psm 6 -l eng+vie'
+    # Tesseract settings (--oem 3 --psm 6 -l eng+vie) live in ocrEngine
+    engine = get_engine()
     
-    # Get text
-    text = pytesseract.image_to_string(processed_img, config=custom_config)
-
-    if process_type == "processed":
-        # Get information about detected text regions
-        data = pytesseract.image_to_data(processed_img, config=custom_config, output_type=pytesseract.Output.DICT)
-        
-        # Group words by line
-        lines = {}
-        for i, word in enumerate(data['text']):
-            if word.strip():  # Skip empty words
-                line_num = data['line_num'][i]
-                if line_num not in lines:
-                    lines[line_num] = []
-                lines[line_num].append(word)
-        
-        # Format lines
-        formatted_lines = []
-        for line_num in sorted(lines.keys()):
-            formatted_lines.append(' '.join(lines[line_num]))
-        
-        # Return the formatted text with clear line breaks if we have any lines
-        if formatted_lines:
-            text = '\n'.join(formatted_lines)
+    with stage("ocr"):
+        if process_type == "processed" or with_confidence:
+            # One Tesseract pass gives both the words and their confidences
+            data = engine.image_to_data(processed_img)
+            text, words = group_ocr_words(data)
+        else:
+            # Get text
+            text = engine.image_to_string(processed_img)
+            words = []
     
+    if with_confidence:
+        return {
+            "text": text,
+            "words": words,
+            "mean_confidence": mean_word_confidence(words)
+        }
     return text
 
-def extract_text(file_path, process_type="original"):
+def group_ocr_words(data):
+    """
+    Rebuild text lines from an OCR engine's image_to_data output
+    
+    Words are grouped by (block_num, par_num, line_num): line_num restarts
+    at 1 in every block and paragraph, so it cannot identify a line on its own.
+    
+    Args:
+        data: Dictionary returned by the engine's image_to_data
+    
+    Returns:
+        Tuple of (text with one line per detected line, list of {"text", "confidence"} words)
+    """
+    lines = {}
+    words = []
+    for i, word in enumerate(data['text']):
+        if not word.strip():  # Skip empty words
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append(word)
+        words.append({"text": word, "confidence": float(data['conf'][i])})
+    
+    text = '\n'.join(' '.join(lines[key]) for key in sorted(lines))
+    return text, words
+
+def mean_word_confidence(words):
+    """Average Tesseract confidence (0-100) of recognized words, None when there are none."""
+    confidences = [word["confidence"] for word in words if word["confidence"] >= 0]
+    if not confidences:
+        return None
+    return sum(confidences) / len(confidences)
+
+# "auto" mode accepts the fast pass (the image as is, no preprocessing) when its mean word
+# confidence and word count reach these, and escalates to "processed" otherwise
+AUTO_MIN_CONFIDENCE = float(os.environ.get("OCR_AUTO_MIN_CONFIDENCE") or 70)
+AUTO_MIN_WORDS = int(os.environ.get("OCR_AUTO_MIN_WORDS") or 10)
+
+# Longest side of the image for the fast pass, 0 to keep the full size
+AUTO_FAST_MAX_SIDE = int(os.environ.get("OCR_AUTO_FAST_MAX_SIDE") or 0)
+
+# "auto" mode decisions made in this process, see auto_ocr_stats()
+_auto_counts = {"pages": 0, "fast": 0, "escalated": 0, "low_confidence": 0, "low_yield": 0, "kept_fast": 0}
+_auto_counts_lock = threading.Lock()
+
+def _ocr_words(img, process_type):
+    """Preprocess and OCR an image in one image_to_data pass; returns (text, words)."""
+    processed_img = process_image_for_ocr(img, process_type)
+    with stage("ocr"):
+        data = get_engine().image_to_data(processed_img)
+    return group_ocr_words(data)
+
+def downscale_for_ocr(img, max_side):
+    """Shrink an image (PIL Image or numpy array) so its longest side is at most max_side."""
+    from PIL import Image
+    
+    if not isinstance(img, Image.Image):
+        img = Image.fromarray(img)
+    scale = max_side / max(img.size) if max_side else 1
+    if scale >= 1:
+        return img
+    return img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.BILINEAR)
+
+def _pass_stats(words):
+    return {"words": len(words), "mean_confidence": mean_word_confidence(words)}
+
+def ocr_image_auto(img, min_confidence=None, min_words=None, fast_max_side=None):
+    """
+    OCR an image with the cheapest pipeline that reads it well
+    
+    The fast pass OCRs the image as is, optionally downscaled. Only when it
+    finds fewer than min_words words or their mean confidence is below
+    min_confidence is the image run through the "processed" pipeline; of the
+    two passes, the one whose words add up to the higher confidence is kept.
+    
+    Args:
+        img: PIL Image or numpy array
+        min_confidence: Mean word confidence (0-100) to accept the fast pass (default: OCR_AUTO_MIN_CONFIDENCE or 70)
+        min_words: Words the fast pass must find (default: OCR_AUTO_MIN_WORDS or 10)
+        fast_max_side: Longest image side for the fast pass, 0 for full size (default: OCR_AUTO_FAST_MAX_SIDE)
+    
+    Returns:
+        Tuple of (text, words, decision); decision is {"path": "fast" or "processed",
+        "reason": None, "low_yield" or "low_confidence", "fast": {"words", "mean_confidence"}}
+        plus the same statistics under "processed" when the fast pass was rejected
+    """
+    min_confidence = AUTO_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    min_words = AUTO_MIN_WORDS if min_words is None else min_words
+    fast_max_side = AUTO_FAST_MAX_SIDE if fast_max_side is None else fast_max_side
+    
+    fast_img = downscale_for_ocr(img, fast_max_side) if fast_max_side else img
+    text, words = _ocr_words(fast_img, "original")
+    decision = {"path": "fast", "reason": None, "fast": _pass_stats(words)}
+    
+    confidence = decision["fast"]["mean_confidence"]
+    if len(words) < min_words:
+        decision["reason"] = "low_yield"
+    elif confidence is None or confidence < min_confidence:
+        decision["reason"] = "low_confidence"
+    
+    if decision["reason"]:
+        processed_text, processed_words = _ocr_words(img, "processed")
+        decision["processed"] = _pass_stats(processed_words)
+        # Total confidence rewards both reading more words and reading them better
+        if _total_confidence(processed_words) >= _total_confidence(words):
+            text, words = processed_text, processed_words
+            decision["path"] = "processed"
+    
+    with _auto_counts_lock:
+        _auto_counts["pages"] += 1
+        _auto_counts["fast" if decision["reason"] is None else "escalated"] += 1
+        if decision["reason"]:
+            _auto_counts[decision["reason"]] += 1
+            if decision["path"] == "fast":
+                _auto_counts["kept_fast"] += 1
+    return text, words, decision
+
+def _total_confidence(words):
+    return sum(word["confidence"] for word in words if word["confidence"] > 0)
+
+def summarize_ocr_decisions(decisions):
+    """
+    Document-level summary of "auto" mode decisions, returned under "ocr"
+    
+    Args:
+        decisions: Decisions from ocr_image_auto, one per OCR'd page
+    
+    Returns:
+        {"mode": "auto", "path": "fast", "processed" or "mixed", "pages", "fast",
+         "escalated", "thresholds", "decisions"}
+    """
+    kept_fast = sum(1 for decision in decisions if decision["path"] == "fast")
+    if kept_fast == len(decisions):
+        path = "fast"
+    elif kept_fast == 0:
+        path = "processed"
+    else:
+        path = "mixed"
+    return {
+        "mode": "auto",
+        "path": path,
+        "pages": len(decisions),
+        "fast": sum(1 for decision in decisions if decision["reason"] is None),
+        "escalated": sum(1 for decision in decisions if decision["reason"]),
+        "thresholds": {"min_confidence": AUTO_MIN_CONFIDENCE, "min_words": AUTO_MIN_WORDS,
+                       "fast_max_side": AUTO_FAST_MAX_SIDE},
+        "decisions": decisions
+    }
+
+def auto_ocr_stats():
+    """
+    Counts of the "auto" mode decisions made in this process, for tuning the thresholds
+    
+    Pages OCR'd in worker processes (scanned PDFs) are not included.
+    """
+    with _auto_counts_lock:
+        stats = dict(_auto_counts)
+    stats["escalation_rate"] = stats["escalated"] / stats["pages"] if stats["pages"] else None
+    return stats
+
+IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg", ".bmp", ".tiff"]
+
+def iter_txt_pages(file_path):
+    """Yield the pages of a text file, split on form feeds, reading it line by line."""
+    page_num = 1
+    lines = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            # A form feed ends the current page; a line may contain several
+            *finished, line = line.split("\f")
+            for part in finished:
+                lines.append(part)
+                yield {"page": page_num, "text": "".join(lines), "source": "text"}
+                page_num += 1
+                lines = []
+            lines.append(line)
+    yield {"page": page_num, "text": "".join(lines), "source": "text"}
+
+def iter_docx_pages(file_path):
+    """
+    Yield the pages of a Word document, split at explicit page breaks
+    
+    Word lays pages out at render time, so only manual breaks (w:br type="page"
+    and "page break before" paragraphs) are known in the file.
+    """
+    import docx
+
+    doc = docx.Document(file_path)
+    page_num = 1
+    lines = []
+    for para in doc.paragraphs:
+        if para.paragraph_format.page_break_before and lines:
+            yield {"page": page_num, "text": "\n".join(lines), "source": "text"}
+            page_num += 1
+            lines = []
+        has_page_break = bool(para._p.xpath('.//w:br[@w:type="page"]'))
+        # Word puts a manual page break in an otherwise empty paragraph of its own
+        if para.text or not has_page_break:
+            lines.append(para.text)
+        if has_page_break:
+            yield {"page": page_num, "text": "\n".join(lines), "source": "text"}
+            page_num += 1
+            lines = []
+    if lines or page_num == 1:
+        yield {"page": page_num, "text": "\n".join(lines), "source": "text"}
+
+def iter_image_pages(file_path, process_type="original"):
+    """Yield the OCR text of every frame of an image (multi-page TIFFs have several), one frame in memory at a time."""
+    from PIL import Image, ImageSequence
+
+    with Image.open(file_path) as img:
+        for page_num, frame in enumerate(ImageSequence.Iterator(img), start=1):
+            if process_type == "auto":
+                text, _, decision = ocr_image_auto(frame)
+                yield {"page": page_num, "text": text, "source": "ocr", "ocr": decision}
+            else:
+                yield {"page": page_num, "text": ocr_image(frame, process_type), "source": "ocr"}
+
+def iter_pages(file_path, process_type="original", workers=None):
+    """
+    Extract a document page by page, yielding each page as soon as it is ready
+    
+    Unlike extract_text, the whole document never has to be held in memory:
+    PDFs render one page pixmap at a time (per OCR worker) and text files are
+    read line by line.
+    
+    Args:
+        file_path: Path to the file
+        process_type: OCR processing mode - "original", "processed" or "auto"
+        workers: Number of OCR worker processes for scanned PDFs
+    
+    Yields:
+        {"page": 1-based number, "text": page text,
+         "source": "text", "text_layer" (PDF text layer) or "ocr"},
+        plus the ocr_image_auto decision under "ocr" for pages OCR'd in "auto" mode
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return iter_image_pages(file_path, process_type)
+    if ext in [".txt"]:
+        return iter_txt_pages(file_path)
+    if ext in [".docx"]:
+        return iter_docx_pages(file_path)
+    if ext in [".pdf"]:
+        return iter_pdf_pages(file_path, process_type, workers)
+    raise ValueError(f"Định dạng file '{ext}' chưa được hỗ trợ")
+
+def extract_text(file_path, process_type="original", workers=None, with_confidence=False):
     ext = os.path.splitext(file_path)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return extract_text_from_image(file_path, process_type, with_confidence)
+    
+    decisions = []
     if ext in [".txt"]:
-        return extract_text_from_txt(file_path)
+        text = extract_text_from_txt(file_path)
     elif ext in [".docx"]:
-        return extract_text_from_docx(file_path)
+        text = extract_text_from_docx(file_path)
     elif ext in [".pdf"]:
-        return extract_text_from_pdf(file_path)
-    elif ext in [".png", ".jpg", ".jpeg", ".bmp", ".tiff"]:
-        return extract_text_from_image(file_path, process_type)
+        text = extract_text_from_pdf(file_path, process_type, workers, decisions=decisions)
     else:
         raise ValueError(f"Định dạng file '{ext}' chưa được hỗ trợ")
+    
+    if with_confidence:
+        # Word confidences are only available for images
+        result = {"text": text, "words": [], "mean_confidence": None}
+        if decisions:
+            result["ocr"] = summarize_ocr_decisions(decisions)
+        return result
+    return text
+
+# Extraction cache configured from the environment, resolved on first use
+_extraction_cache = None
+_extraction_cache_loaded = False
+
+def get_extraction_cache():
+    """
+    Return the extraction cache configured by EXTRACTION_CACHE_DIR
+    (size limit: EXTRACTION_CACHE_MAX_MB, default 512), or None when caching is disabled
+    """
+    global _extraction_cache, _extraction_cache_loaded
+    if not _extraction_cache_loaded:
+        from resultCache import cache_from_env
+        _extraction_cache = cache_from_env("EXTRACTION_CACHE_DIR", "EXTRACTION_CACHE_MAX_MB")
+        _extraction_cache_loaded = True
+    return _extraction_cache
+
+def extraction_cache_key(file_path, process_type, with_confidence=False):
+    """Cache key from the file's bytes, its extension and everything that affects the OCR output."""
+    from resultCache import hash_file, make_key
+    
+    ext = os.path.splitext(file_path)[1].lower()
+    # Raw OCR_PREPROCESS value: resolving it through ocrPreprocess would import OpenCV for every file type
+    stages = os.environ.get("OCR_PREPROCESS", "")
+    parts = [hash_file(file_path), ext, process_type, TESSERACT_CONFIG, PIPELINE_VERSION, stages]
+    if process_type == "auto":
+        parts.append([AUTO_MIN_CONFIDENCE, AUTO_MIN_WORDS, AUTO_FAST_MAX_SIDE])
+    if process_type == "original" and with_confidence:
+        # "original" reads images with image_to_data instead of image_to_string then
+        parts.append("with_confidence")
+    return make_key(*parts)
+
+def extract_text_cached(file_path, process_type="original", workers=None, with_confidence=False, cache=None):
+    """
+    extract_text with a content-addressed cache in front of it
+    
+    A hit returns the stored result without decoding the file or running OCR.
+    Misses run the same extraction as the uncached call, so the cache never
+    changes the text.
+    
+    Args:
+        file_path: Path to the file
+        process_type: OCR processing mode - "original", "processed" or "auto"
+        workers: Number of OCR worker processes for scanned PDFs
+        with_confidence: Return the {"text", "words", "mean_confidence"} dictionary
+            (with the "auto" mode summary under "ocr")
+        cache: resultCache.DiskCache to use (default: get_extraction_cache())
+    
+    Returns:
+        Same as extract_text
+    """
+    if cache is None:
+        cache = get_extraction_cache()
+    if cache is None:
+        return extract_text(file_path, process_type, workers, with_confidence)
+    
+    # "processed" and "auto" get the confidences from the same OCR pass as the text, so one
+    # detailed entry serves both return types; plain "original" stores the text it reads
+    detailed = with_confidence or process_type != "original"
+    key = extraction_cache_key(file_path, process_type, with_confidence)
+    result = cache.get(key)
+    if result is None:
+        result = extract_text(file_path, process_type, workers, with_confidence=detailed)
+        if not detailed:
+            result = {"text": result}
+        cache.set(key, result)
+    
+    return result if with_confidence else result["text"]
 
 if __name__ == "__main__":
     # Set up command line arguments
     parser = argparse.ArgumentParser(description='Extract text from various file types including images')
     parser.add_argument('--path', '-p', type=str, help='Path to the file')
-    parser.add_argument('--mode', '-m', type=str, choices=['original', 'processed'], 
-                        default='original', help='Image processing mode (for images only)')
+    parser.add_argument('--mode', '-m', type=str, choices=['original', 'processed', 'auto'], 
+                        default='original',
+                        help='Image processing mode (for images only); auto preprocesses only when the plain OCR is poor')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='OCR worker processes for scanned PDFs (default: OCR_WORKERS or CPU count)')
     
     args = parser.parse_args()
     
@@ -228,8 +682,14 @@ if __name__ == "__main__":
     
     try:
         print(f"Chế độ xử lý hình ảnh: {process_type}")
-        content = extract_text(path, process_type)
+        content = extract_text(path, process_type, args.workers, with_confidence=True)
         print("=== Nội dung trích xuất ===")
-        print(content)
+        print(content["text"])
+        if "ocr" in content:
+            ocr = content["ocr"]
+            print(f"=== OCR auto: {ocr['path']} ({ocr['fast']}/{ocr['pages']} trang đạt ở lượt nhanh) ===")
+            for page_num, decision in enumerate(ocr["decisions"], start=1):
+                print(f"Trang {page_num}: {decision['path']}  lý do={decision['reason']}  "
+                      f"nhanh={decision['fast']}  xử lý={decision.get('processed')}")
     except Exception as e:
         print("Lỗi:", e)
@@ -0,0 +1,426 @@
+"""
+Opt-in per-stage timing and resource instrumentation for the pipelines.
+
+Code marks its stages with `stage()`; nothing is recorded (and nearly
+nothing is spent) unless a trace is active in the current context:
+
+    with tracing("medical_record") as trace:
+        with stage("extract"):
+            ...
+    result["timings"] = trace.summary()
+
+For every stage the trace keeps calls, wall time, CPU time of the calling
+thread and, with memory=True (PIPELINE_TIMINGS_MEMORY=1), the tracemalloc
+peak above the stage's starting allocation. LLM calls additionally record
+Ollama's eval_count / eval_duration / prompt_eval_* / load_duration.
+
+The trace lives in a contextvar, so it follows asyncio tasks; use bind()
+to carry it into executor threads. Stages run in worker processes (page
+OCR of scanned PDFs) are only seen as their parent stage.
+
+Finished traces can also be exported:
+    PIPELINE_TRACE_FILE       append one JSON line per trace
+    PIPELINE_PROMETHEUS_FILE  Prometheus text-format counters and histograms
+                              (node_exporter textfile collector); every
+                              process adds its counts to the running totals
+                              in <file>.state.json, so one-shot CLI runs
+                              accumulate. render_prometheus() returns this
+                              process' own counts
+"""
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+import contextvars
+
+# Histogram buckets for stage durations, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+NS_PER_MS = 1_000_000
+
+_current_trace = contextvars.ContextVar("pipeline_trace", default=None)
+# Open memory-tracked stages in this context, innermost last
+_open_frames = contextvars.ContextVar("pipeline_trace_frames", default=())
+
+def active():
+    """Whether a trace is recording in the current context."""
+    return _current_trace.get() is not None
+
+class Trace:
+    """Stage measurements of one pipeline run."""
+
+    def __init__(self, name, memory=False):
+        self.name = name
+        self.memory = memory
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.total_seconds = None
+        self.stages = {}
+        self.llm_calls = []
+        self._lock = threading.Lock()
+
+    def record(self, name, wall, cpu, peak_bytes=None):
+        with self._lock:
+            entry = self.stages.setdefault(name, {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+            entry["calls"] += 1
+            entry["wall_ms"] += wall * 1000
+            entry["cpu_ms"] += cpu * 1000
+            if peak_bytes is not None:
+                entry["peak_mb"] = max(entry.get("peak_mb", 0.0), peak_bytes / (1024 * 1024))
+        _metrics.observe_stage(name, wall)
+
+    def record_llm(self, stats):
+        with self._lock:
+            self.llm_calls.append(stats)
+        _metrics.observe_llm(stats)
+
+    def finish(self):
+        """Stop the clock and export the trace (see export())."""
+        self.total_seconds = time.perf_counter() - self._start
+        export(self)
+
+    def summary(self):
+        """JSON-serializable timings attached to results under "timings"."""
+        total = self.total_seconds if self.total_seconds is not None else time.perf_counter() - self._start
+        with self._lock:
+            summary = {
+                "total_ms": total * 1000,
+                "stages": {name: {key: round(value, 3) if isinstance(value, float) else value
+                                  for key, value in entry.items()}
+                           for name, entry in self.stages.items()},
+            }
+            if self.llm_calls:
+                summary["llm"] = list(self.llm_calls)
+        return summary
+
+@contextlib.contextmanager
+def tracing(name, memory=None):
+    """
+    Record stages for the duration of the block
+
+    Args:
+        name: Trace name (e.g. "medical_record"), used in exported lines and metrics
+        memory: Track peak memory with tracemalloc (default: PIPELINE_TIMINGS_MEMORY)
+
+    Yields:
+        The Trace; exported to PIPELINE_TRACE_FILE / PIPELINE_PROMETHEUS_FILE when the block ends
+    """
+    if memory is None:
+        memory = os.environ.get("PIPELINE_TIMINGS_MEMORY", "").lower() in ("1", "true", "yes")
+
+    trace = Trace(name, memory)
+    started_tracemalloc = False
+    if memory:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracemalloc = True
+
+    trace_token = _current_trace.set(trace)
+    frames_token = _open_frames.set(())
+    try:
+        yield trace
+    finally:
+        _open_frames.reset(frames_token)
+        _current_trace.reset(trace_token)
+        if started_tracemalloc:
+            import tracemalloc
+            tracemalloc.stop()
+        trace.finish()
+
+@contextlib.contextmanager
+def use_trace(trace):
+    """Make an existing trace current, e.g. in a pipeline stage running in another task."""
+    if trace is None:
+        yield
+        return
+    token = _current_trace.set(trace)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+
+class _Frame:
+    __slots__ = ("start_bytes", "peak_bytes")
+
+    def __init__(self, start_bytes):
+        self.start_bytes = start_bytes
+        self.peak_bytes = start_bytes
+
+def _fold_peak(frames):
+    """Credit the tracemalloc peak so far to every open frame, then start a new peak window."""
+    import tracemalloc
+
+    peak = tracemalloc.get_traced_memory()[1]
+    for frame in frames:
+        frame.peak_bytes = max(frame.peak_bytes, peak)
+    tracemalloc.reset_peak()
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a pipeline stage; a no-op when no trace is active."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    frame = None
+    if trace.memory:
+        import tracemalloc
+        frames = _open_frames.get()
+        _fold_peak(frames)
+        frame = _Frame(tracemalloc.get_traced_memory()[0])
+        frames_token = _open_frames.set(frames + (frame,))
+
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        peak = None
+        if frame is not None:
+            _open_frames.reset(frames_token)
+            _fold_peak(_open_frames.get() + (frame,))
+            peak = frame.peak_bytes - frame.start_bytes
+        trace.record(name, wall, cpu, peak)
+
+def record_llm(response, streamed_chunks=None, attempt=None):
+    """
+    Record the server-side statistics of one Ollama call
+
+    Args:
+        response: Final (done) response part, or None when the stream was cut short
+        streamed_chunks: Chunks read from the stream (about one per generated token)
+        attempt: 1 for the first request, 2 for the repair request
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+
+    response = response or {}
+    stats = {
+        "attempt": attempt,
+        "streamed_chunks": streamed_chunks,
+        "prompt_eval_count": response.get("prompt_eval_count"),
+        "eval_count": response.get("eval_count"),
+    }
+    for key in ("prompt_eval_duration", "eval_duration", "load_duration", "total_duration"):
+        value = response.get(key)
+        stats[f"{key}_ms"] = value / NS_PER_MS if value is not None else None
+    trace.record_llm(stats)
+
+def bind(func):
+    """
+    Wrap func to run in a copy of the current context
+
+    Executors do not carry contextvars over to their threads; each call gets
+    its own copy so concurrent calls can share one trace.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+def _empty_state():
+    """Counters of the Prometheus metrics, as plain JSON-serializable dicts."""
+    return {
+        "buckets": list(DURATION_BUCKETS),
+        "traces": {},
+        "stage_calls": {},
+        "stage_seconds": {},
+        "stage_buckets": {},
+        "llm_calls": 0,
+        "llm_tokens": {"prompt": 0, "generated": 0},
+        "llm_seconds": {"load": 0.0, "prompt_eval": 0.0, "eval": 0.0},
+    }
+
+def _merge_state(into, delta):
+    """Add the counters in delta (a full or partial state) to into."""
+    for key in ("traces", "stage_calls", "stage_seconds", "llm_tokens", "llm_seconds"):
+        for name, value in delta.get(key, {}).items():
+            into[key][name] = into[key].get(name, 0) + value
+    for name, counts in delta.get("stage_buckets", {}).items():
+        current = into["stage_buckets"].get(name, [0] * len(DURATION_BUCKETS))
+        into["stage_buckets"][name] = [a + b for a, b in zip(current, counts)]
+    into["llm_calls"] += delta.get("llm_calls", 0)
+    return into
+
+def _render(state):
+    lines = [
+        "# HELP pipeline_runs_total Finished traced pipeline runs.",
+        "# TYPE pipeline_runs_total counter",
+    ]
+    for name, count in sorted(state["traces"].items()):
+        lines.append(f'pipeline_runs_total{{pipeline="{name}"}} {count}')
+
+    lines += [
+        "# HELP pipeline_stage_duration_seconds Wall time per pipeline stage.",
+        "# TYPE pipeline_stage_duration_seconds histogram",
+    ]
+    for name in sorted(state["stage_calls"]):
+        for bound, count in zip(DURATION_BUCKETS, state["stage_buckets"][name]):
+            lines.append(f'pipeline_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+        lines.append(f'pipeline_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {state["stage_calls"][name]}')
+        lines.append(f'pipeline_stage_duration_seconds_sum{{stage="{name}"}} {state["stage_seconds"][name]:.6f}')
+        lines.append(f'pipeline_stage_duration_seconds_count{{stage="{name}"}} {state["stage_calls"][name]}')
+
+    lines += [
+        "# HELP pipeline_llm_requests_total Ollama requests made.",
+        "# TYPE pipeline_llm_requests_total counter",
+        f"pipeline_llm_requests_total {state['llm_calls']}",
+        "# HELP pipeline_llm_tokens_total Tokens evaluated by Ollama.",
+        "# TYPE pipeline_llm_tokens_total counter",
+    ]
+    for kind, count in state["llm_tokens"].items():
+        lines.append(f'pipeline_llm_tokens_total{{kind="{kind}"}} {count}')
+    lines += [
+        "# HELP pipeline_llm_seconds_total Time Ollama reported spending per phase.",
+        "# TYPE pipeline_llm_seconds_total counter",
+    ]
+    for phase, seconds in state["llm_seconds"].items():
+        lines.append(f'pipeline_llm_seconds_total{{phase="{phase}"}} {seconds:.6f}')
+    return "\n".join(lines) + "\n"
+
+class _Metrics:
+    """Process-wide aggregates of every finished stage and LLM call, for Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Everything recorded in this process, and what is not yet in PIPELINE_PROMETHEUS_FILE
+        self.totals = _empty_state()
+        self.unexported = _empty_state()
+
+    def _add(self, delta):
+        with self._lock:
+            _merge_state(self.totals, delta)
+            _merge_state(self.unexported, delta)
+
+    def observe_stage(self, name, seconds):
+        self._add({
+            "stage_calls": {name: 1},
+            "stage_seconds": {name: seconds},
+            "stage_buckets": {name: [1 if seconds <= bound else 0 for bound in DURATION_BUCKETS]},
+        })
+
+    def observe_llm(self, stats):
+        self._add({
+            "llm_calls": 1,
+            "llm_tokens": {
+                "prompt": stats.get("prompt_eval_count") or 0,
+                "generated": stats.get("eval_count") or stats.get("streamed_chunks") or 0,
+            },
+            "llm_seconds": {key: (stats.get(f"{key}_duration_ms") or 0) / 1000
+                            for key in ("load", "prompt_eval", "eval")},
+        })
+
+    def observe_trace(self, name):
+        self._add({"traces": {name: 1}})
+
+    def render(self):
+        with self._lock:
+            return _render(self.totals)
+
+    def export_file(self, path):
+        """
+        Add what this process recorded since its last export to the counters kept
+        for path, then rewrite path from them
+
+        The running totals live in <path>.state.json, so processes that each
+        handle one upload add up to monotonic counters instead of overwriting
+        each other's.
+        """
+        state_path = f"{path}.state.json"
+        with self._lock:
+            delta, self.unexported = self.unexported, _empty_state()
+        try:
+            with _file_lock(f"{path}.lock"):
+                try:
+                    with open(state_path, encoding="utf-8") as f:
+                        state = json.load(f)
+                except (OSError, ValueError):
+                    state = None
+                # Changed histogram buckets cannot be merged; Prometheus handles the counter reset
+                if not state or state.get("buckets") != list(DURATION_BUCKETS):
+                    state = _empty_state()
+                _merge_state(state, delta)
+                _write_atomic(state_path, json.dumps(state))
+                _write_atomic(path, _render(state))
+        except OSError as e:
+            # Keep the counts for the next export
+            with self._lock:
+                _merge_state(self.unexported, delta)
+            _report_export_error(path, e)
+
+_metrics = _Metrics()
+
+@contextlib.contextmanager
+def _file_lock(path, timeout=10.0):
+    """
+    Cross-process lock held by exclusively creating path (works on Windows and POSIX)
+
+    A lock file older than timeout is assumed to be left by a killed process and removed.
+    """
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > timeout:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+def _write_atomic(path, text):
+    # Written to a temp file and renamed so a reader never sees half a file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+# Export paths whose failure was already reported, so a broken path warns once, not per request
+_reported_export_paths = set()
+
+def _report_export_error(path, error):
+    # Instrumentation never fails the request it measures: note the problem and carry on
+    if path not in _reported_export_paths:
+        _reported_export_paths.add(path)
+        print(f"Pipeline instrumentation: cannot write {path}: {error}", file=sys.stderr)
+
+def render_prometheus():
+    """Prometheus text exposition of everything recorded in this process."""
+    return _metrics.render()
+
+def export(trace):
+    """
+    Write a finished trace to PIPELINE_TRACE_FILE and PIPELINE_PROMETHEUS_FILE when configured
+
+    Paths that cannot be written are reported once on stderr; the traced call still succeeds.
+    """
+    _metrics.observe_trace(trace.name)
+
+    trace_file = os.environ.get("PIPELINE_TRACE_FILE")
+    if trace_file:
+        line = json.dumps({"trace": trace.name, "started_at": trace.started_at, **trace.summary()},
+                          ensure_ascii=False)
+        try:
+            with open(trace_file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            _report_export_error(trace_file, e)
+
+    prometheus_file = os.environ.get("PIPELINE_PROMETHEUS_FILE")
+    if prometheus_file:
+        _metrics.export_file(prometheus_file)
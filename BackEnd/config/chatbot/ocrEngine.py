@@ -0,0 +1,188 @@
+"""
+OCR engines used by handleMedicalHistory.
+
+    tesserocr    Pool of persistent Tesseract API handles with the eng+vie traineddata
+                 loaded once; images are passed in memory
+    pytesseract  Writes a temp image and runs the tesseract binary on every call
+                 (fallback, used when tesserocr is not installed)
+
+Select with the OCR_ENGINE environment variable: "auto" (default, tesserocr
+when available), "tesserocr" or "pytesseract". OCR_POOL_SIZE limits the number
+of tesserocr handles per process (default: CPU count).
+"""
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+# --oem 3: Default, --psm 6: Assume a single uniform block of text
+# -l eng+vie: Use both English and Vietnamese language data
+TESSERACT_OEM = 3
+TESSERACT_PSM = 6
+TESSERACT_LANG = "eng+vie"
+TESSERACT_CONFIG = f"--oem {TESSERACT_OEM} --psm {TESSERACT_PSM} -l {TESSERACT_LANG}"
+
+# Default Tesseract install location on the Windows development machines
+WINDOWS_TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+
+class PytesseractEngine:
+    """Run the tesseract binary through pytesseract."""
+
+    name = "pytesseract"
+
+    def __init__(self):
+        import pytesseract
+
+        # Set Tesseract executable path
+        tesseract_cmd = os.environ.get("TESSERACT_CMD") or (WINDOWS_TESSERACT_CMD if os.name == "nt" else None)
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        self._pytesseract = pytesseract
+
+    def image_to_string(self, img):
+        return self._pytesseract.image_to_string(img, config=TESSERACT_CONFIG)
+
+    def image_to_data(self, img):
+        """Word boxes as a dict with "text", "conf", "block_num", "par_num" and "line_num" lists."""
+        return self._pytesseract.image_to_data(img, config=TESSERACT_CONFIG,
+                                               output_type=self._pytesseract.Output.DICT)
+
+
+class TesserocrEngine:
+    """Pool of initialized tesserocr API handles, one per concurrent OCR call."""
+
+    name = "tesserocr"
+
+    def __init__(self, pool_size=None):
+        import tesserocr
+
+        self._tesserocr = tesserocr
+        self.pool_size = pool_size or int(os.environ.get("OCR_POOL_SIZE") or os.cpu_count() or 1)
+        self._available = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create_api(self):
+        tesserocr = self._tesserocr
+        kwargs = {
+            "lang": TESSERACT_LANG,
+            "psm": tesserocr.PSM.SINGLE_BLOCK,
+            "oem": tesserocr.OEM.DEFAULT,
+        }
+        if os.environ.get("TESSDATA_PREFIX"):
+            kwargs["path"] = os.environ["TESSDATA_PREFIX"]
+        return tesserocr.PyTessBaseAPI(**kwargs)
+
+    @contextmanager
+    def _api(self):
+        # Handles are created on demand, up to pool_size, then reused
+        try:
+            api = self._available.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.pool_size
+                if create:
+                    self._created += 1
+            if not create:
+                api = self._available.get()
+            else:
+                try:
+                    api = self._create_api()
+                except Exception:
+                    # Give the reserved slot back so a failed creation does not shrink the pool
+                    with self._lock:
+                        self._created -= 1
+                    raise
+
+        try:
+            yield api
+        finally:
+            api.Clear()
+            self._available.put(api)
+
+    @staticmethod
+    def _to_pil(img):
+        from PIL import Image
+
+        return img if isinstance(img, Image.Image) else Image.fromarray(img)
+
+    def image_to_string(self, img):
+        with self._api() as api:
+            api.SetImage(self._to_pil(img))
+            return api.GetUTF8Text()
+
+    def image_to_data(self, img):
+        """Word boxes in the same dict layout as pytesseract's image_to_data(Output.DICT)."""
+        RIL = self._tesserocr.RIL
+        data = {"text": [], "conf": [], "block_num": [], "par_num": [], "line_num": []}
+
+        with self._api() as api:
+            api.SetImage(self._to_pil(img))
+            api.Recognize()
+
+            block_num = par_num = line_num = 0
+            for word in self._tesserocr.iterate_level(api.GetIterator(), RIL.WORD):
+                # Same numbering as Tesseract's TSV output: paragraphs and lines restart per parent
+                if word.IsAtBeginningOf(RIL.BLOCK):
+                    block_num += 1
+                    par_num = line_num = 0
+                if word.IsAtBeginningOf(RIL.PARA):
+                    par_num += 1
+                    line_num = 0
+                if word.IsAtBeginningOf(RIL.TEXTLINE):
+                    line_num += 1
+
+                data["text"].append(word.GetUTF8Text(RIL.WORD) or "")
+                data["conf"].append(word.Confidence(RIL.WORD))
+                data["block_num"].append(block_num)
+                data["par_num"].append(par_num)
+                data["line_num"].append(line_num)
+
+        return data
+
+    def close(self):
+        while True:
+            try:
+                self._available.get_nowait().End()
+            except queue.Empty:
+                return
+
+
+ENGINES = {
+    "pytesseract": PytesseractEngine,
+    "tesserocr": TesserocrEngine,
+}
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def create_engine(name=None):
+    """
+    Create an OCR engine
+
+    Args:
+        name: "auto", "tesserocr" or "pytesseract" (default: OCR_ENGINE or "auto")
+
+    Returns:
+        Engine exposing image_to_string(img) and image_to_data(img)
+    """
+    name = (name or os.environ.get("OCR_ENGINE") or "auto").lower()
+    if name == "auto":
+        try:
+            return TesserocrEngine()
+        except ImportError:
+            return PytesseractEngine()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine '{name}', expected auto, tesserocr or pytesseract")
+    return ENGINES[name]()
+
+
+def get_engine():
+    """Return the process-wide OCR engine, creating it on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine()
+    return _engine
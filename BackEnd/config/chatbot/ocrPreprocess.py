@@ -0,0 +1,148 @@
+"""
+Image preprocessing for OCR as a pipeline of named stages.
+
+Every stage takes and returns a numpy uint8 array and works in place where
+OpenCV allows it, so a page is converted from PIL once and the grayscale
+buffer is the only full-size allocation on the default path:
+
+    grayscale  RGB/RGBA -> single channel (the one new buffer)
+    threshold  Otsu binarization, in place
+    denoise    3x3 median filter, in place (optional)
+    deskew     rotate by the text skew angle (optional, allocates the rotated page)
+
+The stage list comes from the OCR_PREPROCESS environment variable
+(comma-separated, e.g. "grayscale,denoise,deskew,threshold") and defaults to
+grayscale,threshold. The other stages need a single channel, so grayscale
+always runs first, whether it is listed or not. Used by both the image and
+the scanned PDF paths in handleMedicalHistory. See benchmarks/ocr_preprocess.py
+for per-stage timings.
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+DEFAULT_STAGES = ("grayscale", "threshold")
+
+# Skew angles below this (degrees) are left alone, rotating costs more than it helps
+MIN_DESKEW_ANGLE = 0.3
+
+# Width of the downscaled copy used to estimate the skew angle
+DESKEW_ESTIMATE_WIDTH = 1000
+
+def grayscale(img):
+    """Convert to a single channel; RGB input (PIL order) uses RGB2GRAY."""
+    if img.ndim == 2:
+        return img
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+
+def threshold(img):
+    """Otsu binarization into the same buffer."""
+    cv2.threshold(img, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU, dst=img)
+    return img
+
+def denoise(img):
+    """Remove salt-and-pepper scanner noise with a 3x3 median filter."""
+    cv2.medianBlur(img, 3, dst=img)
+    return img
+
+def deskew(img):
+    """Rotate the page so text lines are horizontal, estimated from the dark pixels' bounding box."""
+    # The angle does not change with scale, so estimate it on a small Otsu mask of the text
+    scale = min(1.0, DESKEW_ESTIMATE_WIDTH / img.shape[1])
+    small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else img
+    _, mask = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    coords = cv2.findNonZero(mask)
+    if coords is None:
+        return img
+
+    angle = cv2.minAreaRect(coords)[-1]
+    # minAreaRect reports angles in [0, 90) (OpenCV >= 4.5) or [-90, 0); map to the smallest rotation
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    if abs(angle) < MIN_DESKEW_ANGLE:
+        return img
+
+    height, width = img.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(img, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+
+STAGES = {
+    "grayscale": grayscale,
+    "threshold": threshold,
+    "denoise": denoise,
+    "deskew": deskew,
+}
+
+def parse_stages(spec):
+    """
+    Turn a stage list into a tuple of stage names, starting with grayscale
+
+    Otsu thresholding and deskewing only work on one channel, and the stages
+    after grayscale write in place, so grayscale is moved to the front (or
+    added) to give every later stage a single-channel buffer of its own.
+
+    Args:
+        spec: Comma-separated string, sequence of names, or None for OCR_PREPROCESS / DEFAULT_STAGES
+
+    Returns:
+        Tuple of stage names
+
+    Raises:
+        ValueError: For unknown stage names
+    """
+    if spec is None:
+        spec = os.environ.get("OCR_PREPROCESS") or DEFAULT_STAGES
+    if isinstance(spec, str):
+        spec = [name.strip() for name in spec.split(",") if name.strip()]
+
+    unknown = [name for name in spec if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown preprocessing stage(s) {', '.join(unknown)}; choose from {', '.join(STAGES)}")
+    return ("grayscale",) + tuple(name for name in spec if name != "grayscale")
+
+def to_array(image):
+    """
+    Get the working uint8 array for a PIL image or numpy array
+
+    Stages after grayscale write in place, so single-channel input is copied
+    once here and never modified in the caller's buffer. Colour arrays
+    (e.g. np.frombuffer over a PyMuPDF pixmap) are used as they are: the
+    grayscale stage, which parse_stages always puts first, allocates the
+    working buffer for them before anything writes.
+    """
+    if isinstance(image, np.ndarray):
+        return image.copy() if image.ndim == 2 else image
+    if image.mode not in ("RGB", "RGBA", "L"):
+        image = image.convert("RGB")
+    return np.array(image)
+
+def preprocess(image, stages=None, timings=None):
+    """
+    Run the preprocessing stages over one image
+
+    Args:
+        image: PIL image or numpy uint8 array (H x W, H x W x 3 or H x W x 4)
+        stages: Stage names or comma-separated string (default: OCR_PREPROCESS or grayscale,threshold)
+        timings: Optional dict filled with seconds spent converting the input ("to_array") and in each stage
+
+    Returns:
+        Preprocessed numpy array
+    """
+    start = time.perf_counter()
+    img = to_array(image)
+    if timings is not None:
+        timings["to_array"] = timings.get("to_array", 0.0) + time.perf_counter() - start
+    
+    for name in parse_stages(stages):
+        start = time.perf_counter()
+        img = STAGES[name](img)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+    return img
@@ -1,33 +1,80 @@
 import os
+import re
 import json
-import ollama
-from handleMedicalHistory import extract_text
+import time
+import unicodedata
+from handleMedicalHistory import extract_text_cached
+from instrumentation import active as tracing_active, bind, record_llm, stage, tracing
+from recordChunks import RECORD_FIELDS, RECORD_TYPE_PRIORITY, estimate_tokens, merge_records, split_into_chunks
 
-def process_medical_record(file_path, process_type="processed"):
+# Custom model defined in Modelfile.txt (same variable as the Node chat controller)
+MODEL_NAME = os.environ.get("AI_MODEL_NAME") or "AMH_chatbot"
+
+# How long the model stays loaded after a request, with the same default as start.py's warm-up
+# so requests do not cut it back to the server's 5 minutes; bare numbers are seconds (-1 for ever)
+KEEP_ALIVE = os.environ.get("AI_KEEP_ALIVE") or "30m"
+
+# Low temperature for more consistent structured responses
+CHAT_OPTIONS = {
+    "temperature": 0.05
+}
+
+# Bump whenever the extraction prompt or response post-processing changes,
+# so structured records cached for the old prompt are not reused
+PROMPT_VERSION = 3
+
+# Cached structured records expire after a week by default
+DEFAULT_CHATBOT_CACHE_TTL = 7 * 24 * 3600
+
+# Records longer than this (estimated tokens) are structured chunk by chunk,
+# leaving room in the model context for the system prompt and the JSON reply
+DEFAULT_CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS") or 1000)
+
+# Chunks sent to Ollama at the same time (set OLLAMA_NUM_PARALLEL on the server to match)
+DEFAULT_CHUNK_WORKERS = int(os.environ.get("CHUNK_WORKERS") or 4)
+
+def process_medical_record(file_path, process_type="processed", extraction_cache=None, chatbot_cache=None,
+                           max_chunk_tokens=DEFAULT_CHUNK_TOKENS, timings=False):
     """
     Process a medical record file using OCR and chatbot analysis
     
     Args:
         file_path: Path to the uploaded file
-        process_type: OCR processing mode - "original" or "processed"
+        process_type: OCR processing mode - "original", "processed" or "auto"
+        extraction_cache: Optional resultCache.DiskCache for extracted text (default: EXTRACTION_CACHE_DIR)
+        chatbot_cache: Optional resultCache.DiskCache for structured records (default: CHATBOT_CACHE_DIR)
+        max_chunk_tokens: Token budget above which the text is structured in chunks (None disables chunking)
+        timings: Attach per-stage wall/CPU time (and Ollama eval statistics) under "timings"
     
     Returns:
-        Dictionary with structured medical record data
+        Dictionary with structured medical record data, with the OCR path taken
+        under "ocr" in "auto" mode
     """
+    if timings:
+        with tracing("medical_record") as trace:
+            result = process_medical_record(file_path, process_type, extraction_cache, chatbot_cache,
+                                            max_chunk_tokens)
+        # Copy so a record served from the cache is not modified
+        return dict(result, timings=trace.summary())
+    
     try:
         # Extract text from the file using OCR
-        extracted_text = extract_text(file_path, process_type)
+        with stage("extract"):
+            extracted = extract_text_cached(file_path, process_type, with_confidence=process_type == "auto",
+                                            cache=extraction_cache)
+        extracted_text, ocr = text_and_ocr_summary(extracted)
         
         # Check if we got enough text
-        if not extracted_text or len(extracted_text.strip()) < 10:
-            return {
-                "success": False,
-                "error": "Không thể trích xuất đủ dữ liệu từ file. Vui lòng thử lại với file khác."
-            }
+        result = check_extracted_text(extracted_text)
+        if result is None:
+            # Process the extracted text with chatbot
+            if needs_chunking(extracted_text, max_chunk_tokens):
+                result = process_with_chatbot_chunked(extracted_text, max_chunk_tokens, cache=chatbot_cache)
+            else:
+                result = process_with_chatbot(extracted_text, chatbot_cache)
         
-        # Process the extracted text with chatbot
-        result = process_with_chatbot(extracted_text)
-        return result
+        # Copy so a record served from the cache is not modified
+        return dict(result, ocr=ocr) if ocr else result
     
     except Exception as e:
         return {
@@ -35,28 +82,36 @@ def process_medical_record(file_path, process_type="processed"):
             "error": f"Lỗi xử lý: {str(e)}"
         }
 
-def process_with_chatbot(text):
-    """
-    Send extracted text to chatbot and get structured data back
-    
-    Args:
-        text: Extracted text from medical record
-    
-    Returns:
-        Dictionary with structured medical record fields
-    """
-    try:        # Define the prompt for the chatbot      
-        text_portion = f"""
-Dưới đây là văn bản được trích xuất từ một hồ sơ y tế bằng OCR, có thể có lỗi nhận dạng:
+def text_and_ocr_summary(extracted):
+    """Split an extract_text result into (text, "auto" mode OCR summary or None)."""
+    if isinstance(extracted, dict):
+        return extracted["text"], extracted.get("ocr")
+    return extracted, None
 
-{text}
+def check_extracted_text(text):
+    """Return the error result for text too short to structure, or None if it can be sent to the chatbot."""
+    if not text or len(text.strip()) < 10:
+        return {
+            "success": False,
+            "error": "Không thể trích xuất đủ dữ liệu từ file. Vui lòng thử lại với file khác."
+        }
+    return None
+
+def needs_chunking(text, max_chunk_tokens):
+    """Whether the text is over the chunking budget (a falsy budget disables chunking)."""
+    return bool(max_chunk_tokens) and estimate_tokens(text) > max_chunk_tokens
+
+# Fixed extraction instructions, sent as the system prompt. The document text
+# goes last (in the user message) so Ollama can reuse the KV cache for this
+# prefix across requests instead of re-evaluating it every time.
+EXTRACTION_SYSTEM_PROMPT = """Bạn sẽ nhận được văn bản được trích xuất từ một hồ sơ y tế bằng OCR, có thể có lỗi nhận dạng.
 
 Hãy phân tích và trích xuất thông tin sau đây từ hồ sơ y tế, nếu một trường không có thông tin thì để chuỗi rỗng (""):
 - record_date: Ngày khám (định dạng YYYY-MM-DD, ví dụ: "2023-12-31")
 - diagnosis: Chẩn đoán bệnh chính (định dạng chuỗi)
 - symptoms: Các triệu chứng (định dạng chuỗi)
 - treatments: Các phương pháp điều trị (định dạng chuỗi, không chứa thông tin về thuốc, nếu không có thì ghi "Uống thuốc theo chỉ định")
-- medications: Danh sách thuốc theo định dạng JSON array. Mỗi thuốc có 4 thuộc tính: name (tên thuốc), dosage (liều lượng), instructions (hướng dẫn), duration (thời gian). Ví dụ: [{{"name":"Paracetamol","dosage":"500mg","instructions":"Uống sau khi ăn","duration":"7 ngày"}}]
+- medications: Danh sách thuốc theo định dạng JSON array. Mỗi thuốc có 4 thuộc tính: name (tên thuốc), dosage (liều lượng), instructions (hướng dẫn), duration (thời gian). Ví dụ: [{"name":"Paracetamol","dosage":"500mg","instructions":"Uống sau khi ăn","duration":"7 ngày"}]
 - doctor_name: Tên bác sĩ 
 - hospital: Tên bệnh viện/phòng khám/trung tâm y tế.
 - notes: Ghi chú khác
@@ -74,83 +129,454 @@ Hãy chú ý:
 Chỉ trả về JSON, không cần giải thích hay bổ sung thông tin khác.
 """
 
-        # Combine text portion with the rest of the prompt to create the final prompt
-        prompt = text_portion
-        
-        # Send prompt to chatbot
-        response = ollama.chat(
-            model="AMH_chatbot",  # Use custom model defined in Modelfile
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            options={
-                "temperature": 0.05  # Low temperature for more consistent structured responses
+def build_extraction_messages(text):
+    """
+    Build the chat messages for structuring one medical record
+    
+    Args:
+        text: Extracted text from medical record
+    
+    Returns:
+        List of Ollama chat messages: the fixed system prompt, then the document
+    """
+    return [
+        {
+            "role": "system",
+            "content": EXTRACTION_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"Dưới đây là văn bản được trích xuất từ hồ sơ y tế:\n\n{text}"
+        }
+    ]
+
+# Seconds a looked-up model digest is reused before asking the server again, so a
+# long-lived worker notices a model recreated by start.py
+MODEL_DIGEST_TTL = float(os.environ.get("MODEL_DIGEST_TTL") or 60)
+
+# Chatbot cache, resolved on first use, and model digests as (digest, looked up at)
+_chatbot_cache = None
+_chatbot_cache_loaded = False
+_model_digests = {}
+
+def get_chatbot_cache():
+    """
+    Return the structured record cache configured by CHATBOT_CACHE_DIR
+    (CHATBOT_CACHE_MAX_MB, CHATBOT_CACHE_TTL in seconds), or None when caching is disabled
+    """
+    global _chatbot_cache, _chatbot_cache_loaded
+    if not _chatbot_cache_loaded:
+        from resultCache import cache_from_env
+        _chatbot_cache = cache_from_env("CHATBOT_CACHE_DIR", "CHATBOT_CACHE_MAX_MB", "CHATBOT_CACHE_TTL",
+                                        default_ttl=DEFAULT_CHATBOT_CACHE_TTL)
+        _chatbot_cache_loaded = True
+    return _chatbot_cache
+
+def get_model_digest(model_name=MODEL_NAME):
+    """
+    Digest of a local Ollama model, so cached records are invalidated when the model is recreated
+    
+    Found digests are reused for MODEL_DIGEST_TTL seconds; a missing model or
+    unreachable server is asked again on the next call.
+    
+    Returns:
+        Digest string, or None when the model server cannot be reached or the model is missing
+    """
+    cached = _model_digests.get(model_name)
+    if cached and time.monotonic() - cached[1] < MODEL_DIGEST_TTL:
+        return cached[0]
+    
+    import ollama
+    
+    digest = None
+    try:
+        names = {model_name, f"{model_name}:latest"}
+        for model in ollama.list()["models"]:
+            if (model.get("model") or model.get("name")) in names:
+                digest = model["digest"]
+                break
+    except Exception:
+        return None
+    
+    if digest is not None:
+        _model_digests[model_name] = (digest, time.monotonic())
+    return digest
+
+def normalize_text(text):
+    """Unicode-normalize and collapse whitespace so trivially different OCR output shares a cache entry."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+def chatbot_cache_key(text, model_digest):
+    from resultCache import make_key
+    return make_key(normalize_text(text), MODEL_NAME, model_digest, PROMPT_VERSION, CHAT_OPTIONS)
+
+def process_with_chatbot(text, cache=None):
+    """
+    Send extracted text to chatbot and get structured data back, reusing cached records
+    
+    Only successfully parsed and validated records are cached. The key includes
+    the model digest and PROMPT_VERSION, so recreating the model or changing the
+    prompt invalidates old entries.
+    
+    Args:
+        text: Extracted text from medical record
+        cache: Optional resultCache.DiskCache (default: get_chatbot_cache())
+    
+    Returns:
+        Dictionary with structured medical record fields
+    """
+    if cache is None:
+        cache = get_chatbot_cache()
+    
+    with stage("cache_lookup"):
+        key, cached = lookup_cached_record(text, cache)
+    if cached is not None:
+        return cached
+    
+    result = structure_with_chatbot(text)
+    store_cached_record(cache, key, result)
+    return result
+
+def lookup_cached_record(text, cache):
+    """
+    Look up a structured record in the chatbot cache
+    
+    Returns:
+        Tuple of (cache key, cached result); the key is None when the result
+        cannot be cached and the cached result is None on a miss
+    """
+    if cache is None:
+        return None, None
+    
+    model_digest = get_model_digest()
+    # Without a digest we could not tell a stale entry from a fresh one
+    if not model_digest:
+        return None, None
+    
+    key = chatbot_cache_key(text, model_digest)
+    return key, cache.get(key)
+
+def store_cached_record(cache, key, result):
+    """Cache a successfully parsed and validated record under the key from lookup_cached_record."""
+    if key is not None and result.get("success"):
+        cache.set(key, result)
+
+def process_with_chatbot_chunked(text, max_chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_CHUNK_WORKERS,
+                                 cache=None):
+    """
+    Structure a long record by splitting it into chunks, processing them concurrently and merging the results
+    
+    Latency follows the slowest chunk instead of the whole document, and each
+    chunk's reply stays well below the model's num_predict limit.
+    
+    Args:
+        text: Extracted text from medical record
+        max_chunk_tokens: Estimated token budget per chunk
+        max_workers: Chunks sent to Ollama at the same time
+        cache: Optional resultCache.DiskCache, applied per chunk
+    
+    Returns:
+        Dictionary with the merged medical record fields, plus the number of chunks
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    chunks = split_into_chunks(text, max_chunk_tokens)
+    if len(chunks) <= 1:
+        return process_with_chatbot(text, cache)
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        # bind() keeps the caller's timing trace in the executor threads
+        results = list(executor.map(bind(lambda chunk: process_with_chatbot(chunk, cache)), chunks))
+    
+    return merge_chunk_results(results)
+
+def merge_chunk_results(results):
+    """
+    Merge per-chunk chatbot results into one record result
+    
+    Args:
+        results: process_with_chatbot results, one per chunk in document order
+    
+    Returns:
+        Dictionary with the merged record, or the first error if every chunk failed
+    """
+    records = [result["data"] for result in results if result.get("success")]
+    if not records:
+        # Every chunk failed, report the first error
+        return results[0]
+    
+    return {
+        "success": True,
+        "data": merge_records(records),
+        "chunks": len(results),
+        "failed_chunks": len(results) - len(records)
+    }
+
+# JSON schema passed to Ollama's structured output, so the reply is always a
+# complete object with the nine record fields and no surrounding text
+RECORD_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "record_date": {"type": "string"},
+        "diagnosis": {"type": "string"},
+        "symptoms": {"type": "string"},
+        "treatments": {"type": "string"},
+        "medications": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "dosage": {"type": "string"},
+                    "instructions": {"type": "string"},
+                    "duration": {"type": "string"}
+                },
+                "required": ["name", "dosage", "instructions", "duration"]
             }
-        )
-          # Extract response content from chatbot
-        response_text = response['message']['content'].strip()
-        
-        # print(response_text)  # Debug: print the raw response from the chatbot
-        
-        # Try to extract JSON from the response
-        # First, look for JSON between code blocks
-        json_text = None
-        if "```json" in response_text and "```" in response_text.split("```json", 1)[1]:
-            json_text = response_text.split("```json", 1)[1].split("```", 1)[0].strip()
-        elif "```" in response_text and "```" in response_text.split("```", 1)[1]:
-            json_text = response_text.split("```", 1)[1].split("```", 1)[0].strip()
-        else:
-            # Try to find a JSON-like structure in the text
-            start_idx = response_text.find("{")
-            end_idx = response_text.rfind("}")
+        },
+        "doctor_name": {"type": "string"},
+        "hospital": {"type": "string"},
+        "notes": {"type": "string"},
+        "record_type": {"type": "string", "enum": ["checkup", "hospitalization", "surgery", "other"]}
+    },
+    "required": RECORD_FIELDS
+}
+
+# One repair request when the reply cannot be parsed, reusing the extracted text
+MAX_REPAIR_ATTEMPTS = 1
+
+# Chunks read past the end of the object while timing, hoping for the final "done" part
+STATS_WAIT_CHUNKS = 2
+
+REPAIR_PROMPT = "Phản hồi trên không phải JSON hợp lệ. Hãy trả lời lại CHỈ bằng JSON hợp lệ với đúng các trường đã yêu cầu."
+
+def _extract_json_text(response_text):
+    """Find the JSON object in a reply that may be wrapped in code fences or prose."""
+    # First, look for JSON between code blocks
+    if "```json" in response_text and "```" in response_text.split("```json", 1)[1]:
+        return response_text.split("```json", 1)[1].split("```", 1)[0].strip()
+    if "```" in response_text and "```" in response_text.split("```", 1)[1]:
+        return response_text.split("```", 1)[1].split("```", 1)[0].strip()
+    
+    # Try to find a JSON-like structure in the text
+    start_idx = response_text.find("{")
+    end_idx = response_text.rfind("}")
+    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
+        return response_text[start_idx:end_idx+1]
+    return None
+
+def parse_record_response(response_text):
+    """
+    Parse and validate the chatbot reply into a medical record
+    
+    Args:
+        response_text: Raw reply content
+    
+    Returns:
+        Record dictionary with every field present, medications as a JSON string
+    
+    Raises:
+        ValueError (json.JSONDecodeError included) when no valid record object can be read
+    """
+    json_text = _extract_json_text(response_text.strip())
+    if not json_text:
+        raise ValueError("No JSON object in response")
+    
+    record_data = json.loads(json_text)
+    if not isinstance(record_data, dict):
+        raise ValueError("Response JSON is not an object")
+    
+    # Ensure all required fields are present
+    for field in RECORD_FIELDS:
+        if field not in record_data:
+            record_data[field] = ""
+    
+    # Special handling for medications to ensure it's a valid JSON string
+    if record_data["medications"] and isinstance(record_data["medications"], list):
+        record_data["medications"] = json.dumps(record_data["medications"])
+    
+    # Validate record_type to ensure it's one of the allowed values
+    if record_data["record_type"] not in RECORD_TYPE_PRIORITY:
+        record_data["record_type"] = "other"
+    
+    return record_data
+
+class JsonObjectTracker:
+    """Follow streamed text and report when the top-level JSON object has been closed."""
+    
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+    
+    def feed(self, content):
+        """Consume a chunk of text; return True once the outermost object is complete."""
+        for char in content:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                self.started = True
+            elif char in "}]":
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    return True
+        return False
+
+def _read_json_stream(stream):
+    """
+    Collect a streamed chat reply, stopping as soon as the JSON object is complete
+    
+    Some models keep emitting whitespace after a constrained object until
+    num_predict is reached; closing the stream stops generation on the server.
+    
+    Returns:
+        Tuple of (reply text, number of streamed chunks, final response part or None)
+    """
+    tracker = JsonObjectTracker()
+    parts = []
+    final = None
+    trailing = None
+    try:
+        for part in stream:
+            content = part["message"]["content"]
+            parts.append(content)
+            if part.get("done"):
+                final = part
+                break
+            if trailing is not None:
+                trailing -= 1
+                if trailing <= 0:
+                    break
+            elif tracker.feed(content):
+                # When timing, wait briefly for the final part, which carries the eval statistics
+                if not tracing_active():
+                    break
+                trailing = STATS_WAIT_CHUNKS
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    return "".join(parts), len(parts), final
+
+def parse_keep_alive(value):
+    """
+    keep_alive as Ollama expects it: Ollama reads a string as a duration ("30m"),
+    so a bare number of seconds ("-1" keeps the model loaded) is sent as a number.
+    Shared with start.py's warm-up and matching the Node chat controller.
+    """
+    return int(value) if isinstance(value, str) and re.fullmatch(r"-?\d+", value) else value
+
+def build_chat_request(messages, stream=True):
+    """
+    Keyword arguments for ollama.chat / AsyncClient.chat for one structuring attempt
+    
+    Args:
+        messages: Chat messages from build_extraction_messages (plus any repair turns)
+        stream: Stream the reply so reading can stop once the object is complete
+    """
+    request = {
+        "model": MODEL_NAME,  # Use custom model defined in Modelfile
+        "messages": messages,
+        "format": RECORD_SCHEMA,
+        "options": CHAT_OPTIONS,
+        "stream": stream
+    }
+    # Every request resets the unload timer
+    request["keep_alive"] = parse_keep_alive(KEEP_ALIVE)
+    return request
+
+def repair_messages(messages, response_text):
+    """Messages for the repair attempt: the unparseable reply followed by REPAIR_PROMPT."""
+    return messages + [
+        {"role": "assistant", "content": response_text},
+        {"role": "user", "content": REPAIR_PROMPT}
+    ]
+
+def record_result(record_data, attempts, generated_tokens, wasted_tokens):
+    """Successful structure_with_chatbot result."""
+    return {
+        "success": True,
+        "data": record_data,
+        "attempts": attempts,
+        "generated_tokens": generated_tokens,
+        "wasted_tokens": wasted_tokens
+    }
+
+def format_error_result(response_text, generated_tokens, wasted_tokens):
+    """structure_with_chatbot result when no attempt could be parsed."""
+    return {
+        "success": False,
+        "error": "Lỗi định dạng phản hồi từ chatbot",
+        "raw_response": response_text,
+        "attempts": 1 + MAX_REPAIR_ATTEMPTS,
+        "generated_tokens": generated_tokens,
+        "wasted_tokens": wasted_tokens
+    }
+
+def chatbot_error_result(error):
+    """structure_with_chatbot result when the model server call itself failed."""
+    return {
+        "success": False,
+        "error": f"Lỗi xử lý chatbot: {str(error)}"
+    }
+
+def structure_with_chatbot(text):
+    """
+    Send extracted text to chatbot and get structured data back
+    
+    The reply is constrained to RECORD_SCHEMA and streamed so reading stops
+    when the object is complete. If it still cannot be parsed, the model is
+    asked once to repair its reply (no new OCR needed). asyncPipeline has the
+    asyncio version of this loop.
+    
+    Args:
+        text: Extracted text from medical record
+    
+    Returns:
+        Dictionary with structured medical record fields, plus the number of
+        attempts and the generated / wasted (unparseable) token counts
+    """
+    # Imported on first use to keep startup fast for uploads that fail extraction
+    import ollama
+
+    messages = build_extraction_messages(text)
+    response_text = ""
+    generated_tokens = 0
+    wasted_tokens = 0
+    
+    try:
+        for attempt in range(1 + MAX_REPAIR_ATTEMPTS):
+            # Send prompt to chatbot
+            with stage("llm"):
+                stream = ollama.chat(**build_chat_request(messages))
+                response_text, tokens, final = _read_json_stream(stream)
+            record_llm(final, tokens, attempt + 1)
+            generated_tokens += tokens
             
-            if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                json_text = response_text[start_idx:end_idx+1]
-          # If we couldn't extract JSON, return the raw response
-        if not json_text:
-            return {
-                "success": False,
-                "error": "Không thể phân tích kết quả từ chatbot",
-                "raw_response": response_text
-            }
-        
-        # Parse the JSON response
-        record_data = json.loads(json_text)
-          # Ensure all required fields are present
-        required_fields = ["record_date", "diagnosis", "symptoms", "treatments", "medications", 
-                          "doctor_name", "hospital", "notes", "record_type"]
-        
-        for field in required_fields:
-            if field not in record_data:
-                record_data[field] = ""
-          # Special handling for medications to ensure it's a valid JSON string
-        if record_data["medications"] and isinstance(record_data["medications"], list):
-            record_data["medications"] = json.dumps(record_data["medications"])
-        
-        # Validate record_type to ensure it's one of the allowed values
-        valid_record_types = ["checkup", "hospitalization", "surgery", "other"]
-        if record_data["record_type"] not in valid_record_types:
-            record_data["record_type"] = "other"
+            try:
+                with stage("parse"):
+                    record_data = parse_record_response(response_text)
+            except ValueError:
+                wasted_tokens += tokens
+                # Ask the model to fix its own reply instead of redoing the whole pipeline
+                messages = repair_messages(messages, response_text)
+                continue
+            
+            return record_result(record_data, attempt + 1, generated_tokens, wasted_tokens)
         
-        return {
-            "success": True,
-            "data": record_data
-        }
+        return format_error_result(response_text, generated_tokens, wasted_tokens)
     
-    except json.JSONDecodeError as e:
-        return {
-            "success": False,
-            "error": "Lỗi định dạng phản hồi từ chatbot",
-            "raw_response": response_text
-        }
     except Exception as e:
-        return {
-            "success": False,
-            "error": f"Lỗi xử lý chatbot: {str(e)}"
-        }
+        return chatbot_error_result(e)
 
 if __name__ == "__main__":
     # Test with a sample file
@@ -161,15 +587,43 @@ if __name__ == "__main__":
     if sys.stdout.encoding != 'utf-8':
         sys.stdout.reconfigure(encoding='utf-8', errors='backslashreplace')
     
+    # Worker mode: stay up and take jobs as JSON lines on stdin
+    if len(sys.argv) >= 2 and sys.argv[1] == "--worker":
+        from recordWorker import main as worker_main
+        worker_main(sys.argv[2:])
+        sys.exit(0)
+    
+    # Batch mode: structure a directory, glob or manifest and stream JSON lines
+    if len(sys.argv) >= 2 and sys.argv[1] == "--batch":
+        from recordBatch import main as batch_main
+        batch_main(sys.argv[2:])
+        sys.exit(0)
+    
     parser = argparse.ArgumentParser(description='Process medical record file')
     parser.add_argument('--file', '-f', type=str, required=True, help='Path to medical record file')
-    parser.add_argument('--mode', '-m', type=str, choices=['original', 'processed'], 
-                       default='processed', help='OCR processing mode')
+    parser.add_argument('--mode', '-m', type=str, choices=['original', 'processed', 'auto'], 
+                       default='processed',
+                       help='OCR processing mode; auto preprocesses only pages the plain OCR reads poorly')
     parser.add_argument('--output', '-o', type=str, help='Output file path for JSON result')
+    parser.add_argument('--cache-dir', type=str,
+                        help='Cache extracted text and structured records under this directory '
+                             '(default: EXTRACTION_CACHE_DIR / CHATBOT_CACHE_DIR)')
+    parser.add_argument('--chunk-tokens', type=int, default=DEFAULT_CHUNK_TOKENS,
+                        help='Structure longer records in chunks of this many tokens, 0 to disable')
+    parser.add_argument('--timings', action='store_true',
+                        help='Include per-stage timings in the result (PIPELINE_TRACE_FILE / '
+                             'PIPELINE_PROMETHEUS_FILE also export them)')
     
     args = parser.parse_args()
     
-    result = process_medical_record(args.file, args.mode)
+    extraction_cache = chatbot_cache = None
+    if args.cache_dir:
+        from resultCache import DiskCache
+        extraction_cache = DiskCache(os.path.join(args.cache_dir, "extraction"))
+        chatbot_cache = DiskCache(os.path.join(args.cache_dir, "chatbot"), ttl=DEFAULT_CHATBOT_CACHE_TTL)
+    
+    result = process_medical_record(args.file, args.mode, extraction_cache, chatbot_cache, args.chunk_tokens,
+                                    args.timings)
     
     # Use ensure_ascii=False to keep Unicode characters and force output as UTF-8
     json_output = json.dumps(result, indent=2, ensure_ascii=False)
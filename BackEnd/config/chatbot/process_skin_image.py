@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import threading
 import warnings
 
 # MUST set environment variables BEFORE importing TensorFlow
@@ -27,128 +28,255 @@ logging.getLogger('tensorflow.python.platform').setLevel(logging.ERROR)
 import contextlib
 import io
 
-# Capture and suppress all output during TensorFlow import
-with contextlib.redirect_stderr(io.StringIO()):
-    import tensorflow as tf
-    import numpy as np
+import numpy as np
+from PIL import Image
 
-# Suppress TensorFlow logging
-tf.get_logger().setLevel('ERROR')
-tf.autograph.set_verbosity(0)
+from instrumentation import stage, tracing
 
-# Disable TensorFlow GPU growth warnings and info
-try:
-    tf.config.experimental.set_memory_growth(tf.config.list_physical_devices('GPU')[0], True)
-except:
-    pass  # Ignore if no GPU available
+# TensorFlow is only imported when the Keras backend needs it
+tf = None
+
+def import_tensorflow():
+    """Import TensorFlow quietly on first use and return the module."""
+    global tf
+    if tf is not None:
+        return tf
+
+    # Capture and suppress all output during TensorFlow import
+    with contextlib.redirect_stderr(io.StringIO()):
+        import tensorflow
+
+    # Suppress TensorFlow logging
+    tensorflow.get_logger().setLevel('ERROR')
+    tensorflow.autograph.set_verbosity(0)
+
+    # Disable TensorFlow GPU growth warnings and info
+    try:
+        tensorflow.config.experimental.set_memory_growth(tensorflow.config.list_physical_devices('GPU')[0], True)
+    except:
+        pass  # Ignore if no GPU available
+
+    tf = tensorflow
+    return tf
 
 # Get the directory containing the script
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
+# Define image size based on model requirements
+IMG_SIZE = (450, 450)
+
+# Decode JPEGs at a reduced scale close to IMG_SIZE (0 decodes at full resolution like load_img)
+DRAFT_DECODE = os.environ.get("SKIN_DRAFT_DECODE", "1") != "0"
+
+# Get class names from directory structure with Vietnamese translations
+CLASS_NAMES = ['Actinic keratosis', 'Atopic Dermatitis', 'Benign keratosis',
+               'Dermatofibroma', 'Melanocytic nevus', 'Melanoma',
+               'Squamous cell carcinoma', 'Tinea Ringworm Candidiasis', 'Vascular lesion']
+
+# Vietnamese translations for disease names
+VIETNAMESE_NAMES = {
+    'Actinic keratosis': 'Sừng hóa quang tuyến',
+    'Atopic Dermatitis': 'Viêm da cơ địa',
+    'Benign keratosis': 'Sừng hóa lành tính',
+    'Dermatofibroma': 'U xơ da',
+    'Melanocytic nevus': 'Nốt ruồi hắc tố',
+    'Melanoma': 'Ung thư hắc tố',
+    'Squamous cell carcinoma': 'Ung thư tế bào vảy',
+    'Tinea Ringworm Candidiasis': 'Nhiễm nấm da',
+    'Vascular lesion': 'Tổn thương mạch máu'
+}
+
+# Inference backend kept in memory after the first load (shared by every request in server mode)
+_backend = None
+_backend_lock = threading.Lock()
+_predict_lock = threading.Lock()
+# Per-thread (1, 450, 450, 3) input buffer, reused by every request on that thread
+_buffers = threading.local()
+
 def load_model():
     """Load the saved Keras model."""
     model_path = os.path.join(current_dir, "skin_disease_detect_model.keras")
-    return tf.keras.models.load_model(model_path)
+    return import_tensorflow().keras.models.load_model(model_path)
+
+def get_backend():
+    """Return the cached inference backend, loading it on first use (see skin_backends)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            from skin_backends import create_backend
+            _backend = create_backend()
+    return _backend
+
+def set_backend(backend):
+    """Replace the inference backend, e.g. with a quantized model or a stand-in for benchmarks."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+def predict_batch(batch):
+    """
+    Run the model on a batch of preprocessed images
+
+    Args:
+        batch: Float32 array of shape (N, 450, 450, 3)
+
+    Returns:
+        Numpy array of shape (N, len(CLASS_NAMES)) with class probabilities
+    """
+    backend = get_backend()
+    with _predict_lock:
+        return np.asarray(backend.predict(batch))
+
+def load_image_array(image_source, out=None):
+    """
+    Decode an image into a normalized float32 array of shape (450, 450, 3)
+
+    JPEGs are decoded at 1/2, 1/4 or 1/8 scale (the smallest still covering
+    450x450), so a 12MP phone photo is never decoded in full.
+
+    Args:
+        image_source: Path to the image file, the raw encoded image bytes (any
+            bytes-like buffer) or a binary file object
+        out: Float32 array of shape (450, 450, 3) to write into instead of a new one
+
+    Returns:
+        Numpy array with pixel values scaled to [0, 1]
+    """
+    if not isinstance(image_source, str) and not hasattr(image_source, "read"):
+        image_source = io.BytesIO(image_source)
+
+    # Same decoding as tf.keras.utils.load_img (RGB, nearest resize) without importing TensorFlow
+    with Image.open(image_source) as img:
+        if DRAFT_DECODE:
+            img.draft('RGB', (IMG_SIZE[1], IMG_SIZE[0]))
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.size != (IMG_SIZE[1], IMG_SIZE[0]):
+            img = img.resize((IMG_SIZE[1], IMG_SIZE[0]), Image.NEAREST)
+        pixels = np.asarray(img)
+
+    if out is None:
+        out = np.empty((IMG_SIZE[0], IMG_SIZE[1], 3), dtype=np.float32)
+    return np.divide(pixels, np.float32(255.0), out=out)
+
+def _input_buffer():
+    """This thread's (1, 450, 450, 3) model input buffer."""
+    buffer = getattr(_buffers, "batch", None)
+    if buffer is None:
+        buffer = _buffers.batch = np.empty((1, IMG_SIZE[0], IMG_SIZE[1], 3), dtype=np.float32)
+    return buffer
+
+def format_predictions(probabilities):
+    """
+    Build the classification result from the model output for one image
+
+    Args:
+        probabilities: Sequence of class probabilities in CLASS_NAMES order
+
+    Returns:
+        Dictionary with the top disease and all predictions sorted by probability
+    """
+    # Get top prediction and probability
+    top_prob_index = int(np.argmax(probabilities))
+    top_prob = float(probabilities[top_prob_index]) * 100
+
+    # Format all predictions with Vietnamese names
+    all_predictions = []
+    for i, prob in enumerate(probabilities):
+        english_name = CLASS_NAMES[i]
+        vietnamese_name = VIETNAMESE_NAMES.get(english_name, english_name)
+        all_predictions.append({
+            "disease": english_name,
+            "vietnameseName": vietnamese_name,
+            "probability": float(prob) * 100
+        })
+
+    # Sort predictions by probability (highest first)
+    all_predictions.sort(key=lambda x: x["probability"], reverse=True)
+
+    # Get top prediction with Vietnamese name
+    top_class_english = CLASS_NAMES[top_prob_index]
+    top_class_vietnamese = VIETNAMESE_NAMES.get(top_class_english, top_class_english)
+
+    return {
+        "success": True,
+        "topDisease": top_class_english,
+        "topDiseaseVietnamese": top_class_vietnamese,
+        "topProbability": top_prob,
+        "allPredictions": all_predictions
+    }
+
+def process_image(image_source, batcher=None, timings=False):
+    """
+    Process the uploaded image and return the classification results.
+
+    Args:
+        image_source: Path to the image file, the raw encoded image bytes or a binary file object
+        batcher: Optional MicroBatcher to share model calls with concurrent requests
+        timings: Attach per-stage wall/CPU time under "timings"
+
+    Returns:
+        Dictionary with the classification results
+    """
+    if timings:
+        with tracing("skin_image") as trace:
+            result = process_image(image_source, batcher)
+        result["timings"] = trace.summary()
+        return result
 
-def process_image(image_path):
-    """Process the uploaded image and return the classification results."""
     try:
         # Check if image file exists
-        if not os.path.exists(image_path):
+        if isinstance(image_source, str) and not os.path.exists(image_source):
             return {
                 "success": False,
-                "error": f"Image file not found: {image_path}"
+                "error": f"Image file not found: {image_source}"
             }
         
-        # Define image size based on model requirements
-        img_size = (450, 450)
-        
-        # Load and preprocess the image
+        # Load and preprocess the image, straight into this thread's input buffer
+        batch = _input_buffer()
         try:
-            img = tf.keras.utils.load_img(
-                image_path, 
-                target_size=(img_size[0], img_size[1]),
-                color_mode='rgb'
-            )
-            img_array = tf.keras.utils.img_to_array(img)
-            img_array = img_array / 255.0
-            img_array = np.expand_dims(img_array, axis=0)
+            with stage("decode"):
+                img_array = load_image_array(image_source, out=batch[0])
         except Exception as img_error:
             return {
                 "success": False,
                 "error": f"Error loading image: {str(img_error)}"
             }
         
+        # Let the batcher group this image with other pending requests (it copies the
+        # image into its batch before predict() returns, so the buffer can be reused)
+        if batcher is not None:
+            try:
+                with stage("predict"):
+                    probabilities = batcher.predict(img_array)
+            except Exception as pred_error:
+                return {
+                    "success": False,
+                    "error": f"Error making prediction: {str(pred_error)}"
+                }
+            return format_predictions(probabilities)
+        
         # Load model
         try:
-            model = load_model()
+            with stage("model_load"):
+                get_backend()
         except Exception as model_error:
             return {
                 "success": False,
                 "error": f"Error loading model: {str(model_error)}"
             }
-          # Get class names from directory structure with Vietnamese translations
-        class_names = ['Actinic keratosis', 'Atopic Dermatitis', 'Benign keratosis', 
-                       'Dermatofibroma', 'Melanocytic nevus', 'Melanoma', 
-                       'Squamous cell carcinoma', 'Tinea Ringworm Candidiasis', 'Vascular lesion']
-        
-        # Vietnamese translations for disease names
-        vietnamese_names = {
-            'Actinic keratosis': 'Sừng hóa quang tuyến',
-            'Atopic Dermatitis': 'Viêm da cơ địa',
-            'Benign keratosis': 'Sừng hóa lành tính',
-            'Dermatofibroma': 'U xơ da',
-            'Melanocytic nevus': 'Nốt ruồi hắc tố',
-            'Melanoma': 'Ung thư hắc tố',
-            'Squamous cell carcinoma': 'Ung thư tế bào vảy',
-            'Tinea Ringworm Candidiasis': 'Nhiễm nấm da',
-            'Vascular lesion': 'Tổn thương mạch máu'
-        }
         
         # Make prediction
         try:
-            predictions = model.predict(img_array, verbose=0)  # Suppress prediction output
+            with stage("predict"):
+                predictions = predict_batch(batch)
         except Exception as pred_error:
             return {
                 "success": False,
                 "error": f"Error making prediction: {str(pred_error)}"
             }
         
-        # Process results
-        result_data = {}
-        
-        # Get top prediction and probability
-        top_prob_index = np.argmax(predictions[0])
-        top_class = class_names[top_prob_index]
-        top_prob = float(predictions[0][top_prob_index]) * 100
-          # Format all predictions with Vietnamese names
-        all_predictions = []
-        for i, prob in enumerate(predictions[0]):
-            english_name = class_names[i]
-            vietnamese_name = vietnamese_names.get(english_name, english_name)
-            all_predictions.append({
-                "disease": english_name,
-                "vietnameseName": vietnamese_name,
-                "probability": float(prob) * 100
-            })
-        
-        # Sort predictions by probability (highest first)
-        all_predictions.sort(key=lambda x: x["probability"], reverse=True)
-        
-        # Get top prediction with Vietnamese name
-        top_class_english = class_names[top_prob_index]
-        top_class_vietnamese = vietnamese_names.get(top_class_english, top_class_english)
-        
-        # Create result object
-        result_data = {
-            "success": True,
-            "topDisease": top_class_english,
-            "topDiseaseVietnamese": top_class_vietnamese,
-            "topProbability": top_prob,
-            "allPredictions": all_predictions
-        }
-        
-        return result_data
+        return format_predictions(predictions[0])
         
     except Exception as e:
         return {
@@ -157,15 +285,27 @@ def process_image(image_path):
         }
 
 if __name__ == "__main__":
-    # Get image path from command line arguments
+    # Server mode: keep the model warm and answer requests over HTTP
+    if len(sys.argv) >= 2 and sys.argv[1] == "--serve":
+        from skin_server import main as serve_main
+        serve_main(sys.argv[2:])
+        sys.exit(0)
+
+    # Bulk mode: classify a directory, glob or manifest and stream JSON lines
+    if len(sys.argv) >= 2 and sys.argv[1] == "--bulk":
+        from skin_bulk import main as bulk_main
+        bulk_main(sys.argv[2:])
+        sys.exit(0)
+
+    # Get image path from command line arguments ("-" reads the image bytes from stdin)
     if len(sys.argv) < 2:
         print(json.dumps({"success": False, "error": "No image path provided"}))
         sys.exit(1)
     
-    image_path = sys.argv[1]
+    image_source = sys.stdin.buffer.read() if sys.argv[1] == "-" else sys.argv[1]
     
-    # Process image
-    result = process_image(image_path)
+    # Process image (--timings after the path adds per-stage timings)
+    result = process_image(image_source, timings="--timings" in sys.argv[2:])
     
     # Output result as JSON
     print(json.dumps(result))
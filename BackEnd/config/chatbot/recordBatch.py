@@ -0,0 +1,196 @@
+"""
+Batch ingestion of medical record files.
+
+Structures every document from a directory, glob pattern or manifest file in
+one run: documents are extracted in a process pool while a separate limit
+caps the Ollama requests in flight (see asyncPipeline), and each result is
+written as one JSON line as soon as it is ready, in completion order.
+
+Usage:
+    python processMedicalRecord.py --batch scans/ --output records.jsonl
+    python processMedicalRecord.py --batch manifest.jsonl --output records.jsonl --resume
+    python processMedicalRecord.py --batch "archive/**/*.pdf" --workers 8 --llm-concurrency 4
+
+A manifest is a .lst file with one file path per line (relative paths are
+resolved against the manifest's directory), or a .jsonl file with a "path"
+field and optionally a "mode" overriding --mode for that file. A .txt source
+is always a document to structure, never a manifest.
+
+Every line is {"path": ..., **process_medical_record result} with per-stage
+timings under "timings"; failed files carry "success": false and "error".
+With --resume, files already present in the output are skipped, so an
+interrupted run can be continued; --retry-failed also runs the failed ones
+again (their new line follows the old one). Progress and the final summary
+go to stderr, so with no --output stdout carries only the JSON lines.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from batchInput import collect_inputs, load_checkpoint
+from handleMedicalHistory import IMAGE_EXTENSIONS
+
+DOCUMENT_EXTENSIONS = tuple(IMAGE_EXTENSIONS) + (".pdf", ".docx", ".txt")
+
+
+def collect_jobs(source):
+    """
+    Resolve a directory, glob pattern or manifest file into (path, mode) jobs
+
+    Args:
+        source: Directory, glob pattern, or manifest (.lst/.jsonl) path
+
+    Returns:
+        List of (absolute path, OCR mode or None for the default) tuples in a stable order
+    """
+    return [(path, (entry or {}).get("mode")) for path, entry in collect_inputs(source, DOCUMENT_EXTENSIONS)]
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+async def ingest(jobs, out, pipeline):
+    """
+    Run jobs through a pipeline and write one JSON line per file to `out`
+
+    Only a window of jobs is submitted at a time, so each document's timings
+    start when the pipeline can actually take it rather than at launch.
+
+    Args:
+        jobs: (path, mode or None) tuples to process
+        out: Writable text stream for the JSONL results
+        pipeline: Started asyncPipeline.AsyncPipeline
+
+    Returns:
+        Dictionary with counts of processed and failed files
+    """
+    counts = {"processed": 0, "failed": 0}
+    start = time.perf_counter()
+    window = asyncio.Semaphore(pipeline.ocr_workers + pipeline.queue_size + pipeline.llm_concurrency)
+
+    async def run_one(path, mode):
+        try:
+            result = await pipeline.submit(path, mode)
+        finally:
+            window.release()
+
+        # Every line written is a valid checkpoint
+        out.write(json.dumps({"path": path, **result}, ensure_ascii=False) + "\n")
+        out.flush()
+
+        counts["processed"] += 1
+        counts["failed"] += 0 if result.get("success") else 1
+        done = counts["processed"]
+        elapsed = time.perf_counter() - start
+        rate = done / elapsed
+        status = "ok" if result.get("success") else f"error: {result.get('error')}"
+        print(f"[{done}/{len(jobs)}] {path} {status} ({rate:.2f} files/s, "
+              f"eta {_format_duration((len(jobs) - done) / rate)})", file=sys.stderr)
+
+    tasks = set()
+    for path, mode in jobs:
+        await window.acquire()
+        task = asyncio.create_task(run_one(path, mode))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    return counts
+
+
+async def run_batch(jobs, out, workers, llm_concurrency, **options):
+    """
+    Process jobs with document extraction spread over a pool of worker processes
+
+    Args:
+        jobs: (path, mode or None) tuples to process
+        out: Writable text stream for the JSONL results
+        workers: Extraction processes (documents extracted at the same time)
+        llm_concurrency: Ollama requests in flight
+        **options: Other AsyncPipeline settings (process_type, chatbot_cache, ...)
+
+    Returns:
+        Tuple of (counts of processed and failed files, final pipeline stats)
+    """
+    from asyncPipeline import AsyncPipeline
+
+    # Each process OCRs its scanned PDF pages sequentially: the pool already uses the cores
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        async with AsyncPipeline(ocr_workers=workers, llm_concurrency=llm_concurrency, executor=executor,
+                                 page_workers=1, timings=True, **options) as pipeline:
+            counts = await ingest(jobs, out, pipeline)
+            return counts, pipeline.stats()
+
+
+def main(argv=None):
+    """Entry point for processMedicalRecord.py --batch."""
+    from asyncPipeline import DEFAULT_LLM_CONCURRENCY, DEFAULT_QUEUE_SIZE
+    from processMedicalRecord import DEFAULT_CHATBOT_CACHE_TTL, DEFAULT_CHUNK_TOKENS
+    from recordWorker import claim_stdout
+
+    parser = argparse.ArgumentParser(description='Structure many medical record files in one run')
+    parser.add_argument('source', type=str, help='Directory, glob pattern or manifest (.lst/.jsonl)')
+    parser.add_argument('--output', '-o', type=str, help='JSONL output file (default: stdout)')
+    parser.add_argument('--mode', '-m', type=str, choices=['original', 'processed', 'auto'],
+                        default='processed', help='OCR processing mode for files the manifest does not set one for')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Extraction processes (default: CPU count)')
+    parser.add_argument('--llm-concurrency', type=int, default=DEFAULT_LLM_CONCURRENCY,
+                        help='Ollama requests in flight (default: PIPELINE_LLM_CONCURRENCY or 2)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='Extracted texts buffered for the model (default: twice --llm-concurrency)')
+    parser.add_argument('--chunk-tokens', type=int, default=DEFAULT_CHUNK_TOKENS,
+                        help='Structure longer records in chunks of this many tokens, 0 to disable')
+    parser.add_argument('--cache-dir', type=str,
+                        help='Cache extracted text and structured records under this directory '
+                             '(default: EXTRACTION_CACHE_DIR / CHATBOT_CACHE_DIR)')
+    parser.add_argument('--resume', action='store_true', help='Skip files already in the output file')
+    parser.add_argument('--retry-failed', action='store_true', help='With --resume, run failed files again')
+    args = parser.parse_args(argv)
+
+    jobs = collect_jobs(args.source)
+    total = len(jobs)
+
+    if args.resume:
+        if not args.output:
+            parser.error('--resume requires --output')
+        done = load_checkpoint(args.output, keep=(lambda entry: entry.get("success")) if args.retry_failed else None)
+        jobs = [(path, mode) for path, mode in jobs if path not in done]
+        print(f"Resuming: {total - len(jobs)} of {total} files already processed", file=sys.stderr)
+
+    chatbot_cache = None
+    if args.cache_dir:
+        from resultCache import DiskCache
+        # Pool workers open the extraction cache from the environment
+        os.environ["EXTRACTION_CACHE_DIR"] = os.path.join(args.cache_dir, "extraction")
+        chatbot_cache = DiskCache(os.path.join(args.cache_dir, "chatbot"), ttl=DEFAULT_CHATBOT_CACHE_TTL)
+
+    # Page progress printed by the extractors (also in the pool) goes to stderr
+    stdout = claim_stdout()
+    options = dict(process_type=args.mode, queue_size=args.queue_size, max_chunk_tokens=args.chunk_tokens,
+                   chatbot_cache=chatbot_cache)
+    start = time.perf_counter()
+    try:
+        if args.output:
+            with open(args.output, "a" if args.resume else "w", encoding="utf-8") as out:
+                counts, stats = asyncio.run(run_batch(jobs, out, args.workers, args.llm_concurrency, **options))
+        else:
+            counts, stats = asyncio.run(run_batch(jobs, stdout, args.workers, args.llm_concurrency, **options))
+    except KeyboardInterrupt:
+        print("Interrupted; run again with --resume to continue", file=sys.stderr)
+        sys.exit(130)
+
+    elapsed = time.perf_counter() - start
+    summary = dict(counts, skipped=total - len(jobs), elapsed_seconds=round(elapsed, 1),
+                   files_per_second=round(counts["processed"] / elapsed, 3) if elapsed else None, pipeline=stats)
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Split long medical record text into chunks and merge the per-chunk records.
+
+Used by processMedicalRecord's chunked mode: each chunk is structured by the
+chatbot on its own (concurrently), then merge_records combines the results
+deterministically.
+"""
+import re
+import json
+
+# Rough characters per token for Vietnamese/English text with the llama3 tokenizer
+CHARS_PER_TOKEN = 3
+
+RECORD_FIELDS = ["record_date", "diagnosis", "symptoms", "treatments", "medications",
+                 "doctor_name", "hospital", "notes", "record_type"]
+
+# When chunks disagree, the most involved record type wins
+RECORD_TYPE_PRIORITY = ["surgery", "hospitalization", "checkup", "other"]
+
+# Default value the prompt asks for when no treatment is mentioned
+DEFAULT_TREATMENT = "Uống thuốc theo chỉ định"
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_long(block, max_chars):
+    """Split a block that is too long on its own: by lines first, then by characters."""
+    pieces = []
+    current = ""
+    for line in block.split("\n"):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and len(current) + len(line) + 1 > max_chars:
+            pieces.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(text, max_tokens):
+    """
+    Split text into chunks of at most max_tokens (estimated), along page/section boundaries
+
+    Pages and paragraphs are separated by blank lines in the extracted text;
+    consecutive blocks are packed together until the budget is reached.
+
+    Args:
+        text: Extracted text of the whole record
+        max_tokens: Token budget per chunk
+
+    Returns:
+        List of chunk strings in document order
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    blocks = [block.strip() for block in re.split(r"\n\s*\n", text) if block.strip()]
+
+    chunks = []
+    current = ""
+    for block in blocks:
+        for piece in (_split_long(block, max_chars) if len(block) > max_chars else [block]):
+            if current and len(current) + len(piece) + 2 > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _date_key(value):
+    """Sort key preferring the most specific date (YYYY-MM-DD > YYYY-MM > YYYY), then the earliest."""
+    match = re.fullmatch(r"(\d{4})(?:-(\d{2}))?(?:-(\d{2}))?", value.strip())
+    if not match:
+        return None
+    year, month, day = match.groups()
+    specificity = 1 + (month is not None) + (day is not None)
+    return (-specificity, value.strip())
+
+
+def _normalize(value):
+    return re.sub(r"\s+", " ", str(value)).strip().casefold()
+
+
+def _unique_values(values):
+    seen = set()
+    result = []
+    for value in values:
+        value = str(value).strip()
+        if value and _normalize(value) not in seen:
+            seen.add(_normalize(value))
+            result.append(value)
+    return result
+
+
+def _medication_list(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value) if value.strip() else []
+        except ValueError:
+            return []
+    return [med for med in value if isinstance(med, dict)] if isinstance(value, list) else []
+
+
+def merge_medications(lists):
+    """Deduplicate medications by name and dosage, filling missing details from later duplicates."""
+    merged = {}
+    for medications in lists:
+        for med in medications:
+            name = _normalize(med.get("name", ""))
+            if not name:
+                continue
+            key = (name, _normalize(med.get("dosage", "")))
+            if key not in merged:
+                merged[key] = dict(med)
+            else:
+                for field, value in med.items():
+                    if value and not merged[key].get(field):
+                        merged[key][field] = value
+    return list(merged.values())
+
+
+def merge_records(records):
+    """
+    Merge structured records extracted from chunks of the same document
+
+    - record_date: most specific valid date, earliest on ties
+    - diagnosis, symptoms, treatments: distinct values joined with "; "
+    - doctor_name, hospital: first non-empty value
+    - notes: distinct values joined with newlines
+    - medications: deduplicated by name and dosage
+    - record_type: highest of surgery > hospitalization > checkup > other
+
+    Args:
+        records: Record dictionaries in chunk order (medications as list or JSON string)
+
+    Returns:
+        Merged record dictionary with medications as a JSON string (or [] when none)
+    """
+    def values(field):
+        return [record.get(field) or "" for record in records]
+
+    dates = sorted(key for key in (_date_key(str(value)) for value in values("record_date")) if key)
+    treatments = [value for value in _unique_values(values("treatments")) if value != DEFAULT_TREATMENT]
+    record_types = [value for value in values("record_type") if value in RECORD_TYPE_PRIORITY]
+    medications = merge_medications(_medication_list(record.get("medications")) for record in records)
+
+    return {
+        "record_date": dates[0][1] if dates else "",
+        "diagnosis": "; ".join(_unique_values(values("diagnosis"))),
+        "symptoms": "; ".join(_unique_values(values("symptoms"))),
+        "treatments": "; ".join(treatments) or (DEFAULT_TREATMENT if DEFAULT_TREATMENT in values("treatments") else ""),
+        "medications": json.dumps(medications, ensure_ascii=False) if medications else [],
+        "doctor_name": next(iter(_unique_values(values("doctor_name"))), ""),
+        "hospital": next(iter(_unique_values(values("hospital"))), ""),
+        "notes": "\n".join(_unique_values(values("notes"))),
+        "record_type": min(record_types, key=RECORD_TYPE_PRIORITY.index) if record_types else "other",
+    }
@@ -0,0 +1,202 @@
+"""
+Long-lived medical record worker speaking JSON lines on stdin/stdout.
+
+Started once by the Node backend (processMedicalRecord.py --worker) instead
+of spawning a fresh interpreter per upload. Several jobs run at the same
+time through asyncPipeline.AsyncPipeline.
+
+Requests, one JSON object per line on stdin:
+    {"id": "42", "file": "/path/to/upload.pdf", "mode": "processed"}
+    {"id": "43", "type": "health"}
+    {"type": "shutdown"}
+
+Replies, one JSON object per line on stdout:
+    {"type": "ready", "pid": 1234}
+    {"id": "42", "type": "result", "result": {...process_medical_record result...}}
+    {"id": "43", "type": "health", "stats": {...}}
+    {"type": "heartbeat", "stats": {...}}
+    {"id": "44", "type": "error", "error": "..."}
+    {"type": "stopped", "stats": {...}}
+
+On EOF, {"type": "shutdown"}, SIGTERM or SIGINT the worker stops reading,
+finishes the jobs it has accepted, writes "stopped" and exits. Anything else
+printed to stdout (page progress, library output) goes to stderr so the
+protocol stream stays clean.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import threading
+
+# OCR modes a job may ask for (same choices as --mode)
+OCR_MODES = ("original", "processed", "auto")
+
+# Seconds between heartbeat messages
+DEFAULT_HEARTBEAT_SECONDS = float(os.environ.get("RECORD_WORKER_HEARTBEAT") or 10)
+
+def claim_stdout():
+    """
+    Keep the real stdout for protocol messages and point fd 1 at stderr
+
+    Done at the file descriptor level so prints from libraries and child
+    processes cannot interleave with the JSON lines.
+
+    Returns:
+        Line-buffered text stream writing to the original stdout
+    """
+    sys.stdout.flush()
+    protocol_fd = os.dup(sys.stdout.fileno())
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return os.fdopen(protocol_fd, "w", encoding="utf-8", buffering=1)
+
+class RecordWorker:
+    """Read jobs from a line stream, run them on an AsyncPipeline and write results."""
+
+    def __init__(self, pipeline, output, heartbeat_seconds=DEFAULT_HEARTBEAT_SECONDS):
+        """
+        Args:
+            pipeline: asyncPipeline.AsyncPipeline (not yet started)
+            output: Text stream for protocol messages
+            heartbeat_seconds: Interval between heartbeat messages (0 disables them)
+        """
+        self.pipeline = pipeline
+        self.output = output
+        self.heartbeat_seconds = heartbeat_seconds
+        self.started_at = time.time()
+        self.active = 0
+        self._write_lock = threading.Lock()
+
+    def send(self, message):
+        line = json.dumps(message, ensure_ascii=False)
+        with self._write_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def stats(self):
+        from handleMedicalHistory import auto_ocr_stats
+
+        stats = self.pipeline.stats()
+        stats["auto_ocr"] = auto_ocr_stats()
+        stats["active_jobs"] = self.active
+        stats["uptime_seconds"] = round(time.time() - self.started_at, 1)
+        return stats
+
+    async def run(self, input_stream=None):
+        """Serve until the input ends or a shutdown is requested, then drain."""
+        loop = asyncio.get_running_loop()
+        lines = asyncio.Queue()
+        input_stream = input_stream or sys.stdin
+
+        # Reading stdin in a thread works the same on Windows and POSIX
+        def read_lines():
+            for line in input_stream:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            loop.call_soon_threadsafe(lines.put_nowait, None)
+
+        threading.Thread(target=read_lines, name="stdin-reader", daemon=True).start()
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, lines.put_nowait, None)
+            except (NotImplementedError, RuntimeError, ValueError):
+                # Windows event loops have no signal handlers; Ctrl+C still ends the process
+                pass
+
+        await self.pipeline.start()
+        heartbeat = asyncio.create_task(self._heartbeat()) if self.heartbeat_seconds > 0 else None
+        jobs = set()
+        self.send({"type": "ready", "pid": os.getpid()})
+
+        while True:
+            line = await lines.get()
+            if line is None:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+                if not isinstance(message, dict):
+                    raise ValueError("message must be a JSON object")
+            except ValueError as e:
+                self.send({"type": "error", "error": f"Invalid message: {e}"})
+                continue
+
+            message_type = message.get("type", "job")
+            if message_type == "shutdown":
+                break
+            if message_type == "health":
+                self.send({"id": message.get("id"), "type": "health", "stats": self.stats()})
+            elif message_type == "job":
+                job = asyncio.create_task(self._run_job(message))
+                jobs.add(job)
+                job.add_done_callback(jobs.discard)
+            else:
+                self.send({"id": message.get("id"), "type": "error",
+                           "error": f"Unknown message type: {message_type}"})
+
+        # Graceful drain: finish accepted jobs before exiting
+        await asyncio.gather(*jobs)
+        await self.pipeline.close()
+        if heartbeat:
+            heartbeat.cancel()
+        self.send({"type": "stopped", "stats": self.stats()})
+
+    async def _run_job(self, message):
+        job_id = message.get("id")
+        file_path = message.get("file")
+        if not file_path:
+            self.send({"id": job_id, "type": "error", "error": "Missing 'file'"})
+            return
+        mode = message.get("mode")
+        if mode is not None and mode not in OCR_MODES:
+            self.send({"id": job_id, "type": "error",
+                       "error": f"Invalid 'mode': {mode!r} (expected one of {', '.join(OCR_MODES)})"})
+            return
+
+        self.active += 1
+        try:
+            result = await self.pipeline.submit(file_path, mode)
+        finally:
+            self.active -= 1
+        self.send({"id": job_id, "type": "result", "result": result})
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            self.send({"type": "heartbeat", "stats": self.stats()})
+
+def main(argv=None):
+    """Entry point for processMedicalRecord.py --worker."""
+    from asyncPipeline import AsyncPipeline, DEFAULT_LLM_CONCURRENCY, DEFAULT_OCR_WORKERS, DEFAULT_QUEUE_SIZE
+    from processMedicalRecord import DEFAULT_CHUNK_TOKENS
+
+    parser = argparse.ArgumentParser(description='Serve medical record jobs as JSON lines on stdin/stdout')
+    parser.add_argument('--mode', '-m', type=str, choices=OCR_MODES,
+                        default='processed', help='OCR processing mode for jobs that do not set one')
+    parser.add_argument('--ocr-workers', type=int, default=DEFAULT_OCR_WORKERS,
+                        help='Documents extracted at the same time (default: PIPELINE_OCR_WORKERS or 2)')
+    parser.add_argument('--llm-concurrency', type=int, default=DEFAULT_LLM_CONCURRENCY,
+                        help='Ollama requests in flight (default: PIPELINE_LLM_CONCURRENCY or 2)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='Extracted texts buffered for the model (default: twice --llm-concurrency)')
+    parser.add_argument('--chunk-tokens', type=int, default=DEFAULT_CHUNK_TOKENS,
+                        help='Structure longer records in chunks of this many tokens, 0 to disable')
+    parser.add_argument('--heartbeat', type=float, default=DEFAULT_HEARTBEAT_SECONDS,
+                        help='Seconds between heartbeat messages, 0 to disable (default: RECORD_WORKER_HEARTBEAT or 10)')
+    parser.add_argument('--timings', action='store_true', help='Include per-stage timings in every job result')
+    args = parser.parse_args(argv)
+
+    output = claim_stdout()
+    pipeline = AsyncPipeline(ocr_workers=args.ocr_workers, llm_concurrency=args.llm_concurrency,
+                             queue_size=args.queue_size, process_type=args.mode,
+                             max_chunk_tokens=args.chunk_tokens, timings=args.timings)
+    worker = RecordWorker(pipeline, output, args.heartbeat)
+    asyncio.run(worker.run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Content-addressed on-disk cache for pipeline results.
+
+Entries are JSON files stored under <directory>/<key[:2]>/<key>.json. Writes
+go to a temp file in the same directory and are moved into place with
+os.replace, so concurrent workers never see a partial entry. The cache is
+bounded by size: reading an entry refreshes its mtime, and when the total
+size exceeds max_bytes the least recently used entries are deleted. An
+optional TTL expires entries by their creation time.
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# After an eviction the cache is trimmed to this fraction of max_bytes
+EVICTION_TARGET = 0.9
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(*parts):
+    """Combine key parts (strings or JSON-serializable values) into one SHA-256 hex key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, ensure_ascii=False)
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """Size-bounded LRU cache of JSON values on local disk, safe for concurrent processes."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, ttl=None):
+        """
+        Args:
+            directory: Cache directory, created if missing
+            max_bytes: Total size above which least recently used entries are evicted
+            ttl: Seconds after which an entry expires (None keeps entries until evicted)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._approx_bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            value = entry["value"]
+            expired = self.ttl is not None and time.time() - entry["created_at"] > self.ttl
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            value, expired = None, True
+
+        if expired:
+            if value is not None:
+                self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Mark as recently used for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under key."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        entry = {"created_at": time.time(), "value": value}
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self.writes += 1
+            if self._approx_bytes is None:
+                self._approx_bytes = self._scan()[1]
+            else:
+                self._approx_bytes += len(data)
+            needs_eviction = self._approx_bytes > self.max_bytes
+
+        if needs_eviction:
+            self.evict()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _entries(self):
+        """List (mtime, size, path) for every entry; other processes may delete files meanwhile."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan(self):
+        entries = self._entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def evict(self):
+        """Delete least recently used entries until the cache is below its size target."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICTION_TARGET
+
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if self._remove(path):
+                with self._lock:
+                    self.evictions += 1
+            total -= size
+
+        with self._lock:
+            self._approx_bytes = total
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current on-disk usage."""
+        entries, size = self._scan()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def cache_from_env(dir_variable, max_mb_variable, ttl_variable=None, default_max_bytes=DEFAULT_MAX_BYTES,
+                   default_ttl=None):
+    """Create a DiskCache from environment variables, or return None when the directory is not set."""
+    directory = os.environ.get(dir_variable)
+    if not directory:
+        return None
+    max_mb = os.environ.get(max_mb_variable)
+    max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else default_max_bytes
+    ttl = os.environ.get(ttl_variable) if ttl_variable else None
+    ttl = float(ttl) if ttl else default_ttl
+    return DiskCache(directory, max_bytes, ttl)
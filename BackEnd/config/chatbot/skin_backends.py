@@ -0,0 +1,144 @@
+"""
+Inference backends for the skin disease classifier.
+
+    keras   Full float32 Keras model (skin_disease_detect_model.keras), imports TensorFlow
+    tflite  TFLite model exported by export_skin_model.py (dynamic-range or int8),
+            runs on tflite-runtime / ai-edge-litert without importing TensorFlow
+    onnx    ONNX model exported by export_skin_model.py, runs on onnxruntime
+
+The backend is chosen with the SKIN_MODEL_BACKEND environment variable (default
+"keras"); SKIN_MODEL_PATH overrides the model file.
+"""
+import os
+
+import numpy as np
+
+import process_skin_image as skin
+
+DEFAULT_MODEL_PATHS = {
+    "keras": ["skin_disease_detect_model.keras"],
+    "tflite": ["skin_disease_detect_model_int8.tflite", "skin_disease_detect_model_dynamic.tflite"],
+    "onnx": ["skin_disease_detect_model_int8.onnx", "skin_disease_detect_model.onnx"],
+}
+
+
+class KerasBackend:
+    """Float32 Keras model."""
+
+    name = "keras"
+
+    def __init__(self, model_path=None, model=None):
+        if model is None:
+            tf = skin.import_tensorflow()
+            model = tf.keras.models.load_model(model_path) if model_path else skin.load_model()
+        self.model = model
+
+    def predict(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+def _load_tflite_interpreter(model_path):
+    """Prefer the standalone runtimes so TensorFlow itself is never imported."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            Interpreter = skin.import_tensorflow().lite.Interpreter
+    return Interpreter(model_path=model_path, num_threads=os.cpu_count())
+
+
+class TFLiteBackend:
+    """TFLite model, with (de)quantization for integer inputs and outputs."""
+
+    name = "tflite"
+
+    def __init__(self, model_path):
+        self.interpreter = _load_tflite_interpreter(model_path)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self.input["shape"][0])
+
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            shape = [batch_size] + [int(dim) for dim in self.input["shape"][1:]]
+            self.interpreter.resize_tensor_input(self.input["index"], shape)
+            self.interpreter.allocate_tensors()
+            self.input = self.interpreter.get_input_details()[0]
+            self.output = self.interpreter.get_output_details()[0]
+            self._batch_size = batch_size
+
+    def predict(self, batch):
+        self._resize(len(batch))
+
+        input_dtype = self.input["dtype"]
+        if np.issubdtype(input_dtype, np.integer):
+            scale, zero_point = self.input["quantization"]
+            info = np.iinfo(input_dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(input_dtype)
+
+        self.interpreter.set_tensor(self.input["index"], batch)
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self.output["index"])
+
+        if np.issubdtype(output.dtype, np.integer):
+            scale, zero_point = self.output["quantization"]
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+class OnnxBackend:
+    """ONNX model on onnxruntime's CPU provider."""
+
+    name = "onnx"
+
+    def __init__(self, model_path):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: batch.astype(np.float32, copy=False)})[0]
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend,
+}
+
+
+def default_model_path(backend_name):
+    """Return the first existing default model file for a backend."""
+    candidates = [os.path.join(skin.current_dir, name) for name in DEFAULT_MODEL_PATHS[backend_name]]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return candidates[0]
+
+
+def create_backend(name=None, model_path=None):
+    """
+    Create an inference backend
+
+    Args:
+        name: "keras", "tflite" or "onnx" (default: SKIN_MODEL_BACKEND or "keras")
+        model_path: Model file (default: SKIN_MODEL_PATH or the backend's default file)
+
+    Returns:
+        Backend instance exposing predict(batch) -> probabilities
+    """
+    name = (name or os.environ.get("SKIN_MODEL_BACKEND") or "keras").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown skin model backend '{name}', expected one of: {', '.join(BACKENDS)}")
+
+    model_path = model_path or os.environ.get("SKIN_MODEL_PATH") or default_model_path(name)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+
+    return BACKENDS[name](model_path)
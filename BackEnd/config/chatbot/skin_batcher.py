@@ -0,0 +1,132 @@
+"""
+Dynamic micro-batching for skin disease classification.
+
+Concurrent requests are queued and a single worker thread groups them into one
+model call: a batch is sent as soon as it reaches max_batch_size, or when
+max_wait_ms has passed since its first request arrived.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Collect single-image requests and run them through the model in batches."""
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=5.0):
+        """
+        Args:
+            predict_fn: Callable taking a (N, H, W, C) float32 array and returning (N, classes) probabilities
+            max_batch_size: Largest number of images sent to the model in one call
+            max_wait_ms: Longest time the first request of a batch waits for others to join
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._closed = False
+        # Makes the closed check and the enqueue in submit() atomic with respect to close()
+        self._lock = threading.Lock()
+        # Batch input buffer, allocated for max_batch_size on the first batch and reused
+        self._buffer = None
+        self._worker = threading.Thread(target=self._run, name="skin-batcher", daemon=True)
+        self._worker.start()
+
+        # Counters for monitoring how well requests are being batched
+        self.batches = 0
+        self.images = 0
+
+    def submit(self, img_array):
+        """
+        Queue one preprocessed image
+
+        Args:
+            img_array: Float32 array of shape (H, W, C)
+
+        Returns:
+            Future resolving to the class probabilities for this image
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((img_array, future))
+        return future
+
+    def predict(self, img_array, timeout=None):
+        """Queue one image and block until its probabilities are available."""
+        return self.submit(img_array).result(timeout)
+
+    def close(self):
+        """Stop accepting requests and wait for queued batches to finish."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+        self._worker.join()
+
+        # Nothing should be left behind the shutdown marker, but never leave a caller waiting
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("MicroBatcher is closed"))
+
+    def _collect(self, first):
+        """Gather up to max_batch_size requests, waiting at most max_wait after the first."""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Keep the shutdown marker for the main loop
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _stack(self, images):
+        """Copy images into the reused batch buffer and return the filled part."""
+        shape = images[0].shape
+        if self._buffer is None or self._buffer.shape[1:] != shape:
+            self._buffer = np.empty((self.max_batch_size,) + shape, dtype=np.float32)
+        return np.stack(images, out=self._buffer[:len(images)])
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect(first)
+            futures = [future for _, future in batch]
+
+            try:
+                stacked = self._stack([img for img, _ in batch])
+                predictions = np.asarray(self.predict_fn(stacked))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.images += len(batch)
+
+            # Split the results back out to each caller
+            for future, probabilities in zip(futures, predictions):
+                future.set_result(probabilities)
@@ -0,0 +1,150 @@
+"""
+Bulk/offline skin disease classification.
+
+Classifies every image from a directory, glob pattern or manifest file in one
+process: images are decoded and resized by a thread pool ahead of the model,
+predicted in batches, and written as one JSON line per image.
+
+Usage:
+    python process_skin_image.py --bulk uploads/ --output results.jsonl
+    python process_skin_image.py --bulk "archive/**/*.jpg" --output results.jsonl --resume
+    python process_skin_image.py --bulk manifest.lst --batch-size 64 --workers 8
+
+A manifest is a .lst file with one image path per line (relative paths are
+resolved against the manifest's directory), or a .jsonl file with a "path" field.
+With --resume, images already present in the output file are skipped, so an
+interrupted run can be continued.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import process_skin_image as skin
+from batchInput import collect_inputs, load_checkpoint
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def collect_image_paths(source):
+    """
+    Resolve a directory, glob pattern or manifest file into a list of image paths
+
+    Args:
+        source: Directory, glob pattern, or manifest (.lst/.jsonl) path
+
+    Returns:
+        List of absolute image paths in a stable order
+    """
+    return [path for path, _ in collect_inputs(source, IMAGE_EXTENSIONS)]
+
+
+def _decode(path):
+    try:
+        return path, skin.load_image_array(path), None
+    except Exception as e:
+        return path, None, f"Error loading image: {str(e)}"
+
+
+def iter_batches(paths, batch_size, workers, prefetch=2):
+    """
+    Decode images in a thread pool, keeping at most `prefetch` batches ahead of the model
+
+    Yields:
+        Lists of (path, img_array or None, error or None) tuples
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        path_iter = iter(paths)
+        max_pending = batch_size * (prefetch + 1)
+
+        def fill():
+            for path in path_iter:
+                pending.append(executor.submit(_decode, path))
+                if len(pending) >= max_pending:
+                    break
+
+        fill()
+        while pending:
+            batch = [pending.popleft().result() for _ in range(min(batch_size, len(pending)))]
+            fill()
+            yield batch
+
+
+def classify_bulk(paths, out, batch_size=32, workers=4):
+    """
+    Classify images in batches and write one JSON line per image to `out`
+
+    Args:
+        paths: Image paths to classify
+        out: Writable text stream for the JSONL results
+        batch_size: Images per model call
+        workers: Threads decoding images ahead of the model
+
+    Returns:
+        Dictionary with counts of processed and failed images
+    """
+    processed = failed = 0
+    start = time.perf_counter()
+
+    for batch in iter_batches(paths, batch_size, workers):
+        decoded = [(path, img) for path, img, error in batch if error is None]
+        results = {}
+
+        if decoded:
+            try:
+                predictions = skin.predict_batch(np.stack([img for _, img in decoded]))
+                for (path, _), probabilities in zip(decoded, predictions):
+                    results[path] = skin.format_predictions(probabilities)
+            except Exception as pred_error:
+                for path, _ in decoded:
+                    results[path] = {"success": False, "error": f"Error making prediction: {str(pred_error)}"}
+
+        for path, _, error in batch:
+            result = results.get(path) or {"success": False, "error": error}
+            out.write(json.dumps({"path": path, **result}, ensure_ascii=False) + "\n")
+            processed += 1
+            failed += 0 if result["success"] else 1
+
+        # Everything written so far is a valid checkpoint
+        out.flush()
+        elapsed = time.perf_counter() - start
+        print(f"Processed {processed}/{len(paths)} images ({processed / elapsed:.1f} img/s)", file=sys.stderr)
+
+    return {"processed": processed, "failed": failed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Classify many skin images in one run')
+    parser.add_argument('source', type=str, help='Directory, glob pattern or manifest (.lst/.jsonl)')
+    parser.add_argument('--output', '-o', type=str, help='JSONL output file (default: stdout)')
+    parser.add_argument('--batch-size', type=int, default=32, help='Images per model call (default: 32)')
+    parser.add_argument('--workers', type=int, default=4, help='Image decoding threads (default: 4)')
+    parser.add_argument('--resume', action='store_true', help='Skip images already in the output file')
+    args = parser.parse_args(argv)
+
+    paths = collect_image_paths(args.source)
+
+    if args.resume:
+        if not args.output:
+            parser.error('--resume requires --output')
+        done = load_checkpoint(args.output)
+        print(f"Resuming: {len(done)} images already classified", file=sys.stderr)
+        paths = [path for path in paths if path not in done]
+
+    if args.output:
+        with open(args.output, "a" if args.resume else "w", encoding="utf-8") as out:
+            summary = classify_bulk(paths, out, args.batch_size, args.workers)
+    else:
+        summary = classify_bulk(paths, sys.stdout, args.batch_size, args.workers)
+
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Long-running skin disease classification server.
+
+Loads the Keras model once and keeps it warm, so an upload only pays for image
+decoding and a single prediction instead of a full TensorFlow startup.
+
+Usage:
+    python process_skin_image.py --serve [--host 127.0.0.1] [--port 5055]
+    python process_skin_image.py --serve --socket /tmp/skin_classifier.sock
+    python process_skin_image.py --serve --max-batch-size 16 --max-wait-ms 10
+
+Endpoints:
+    GET  /health   200 {"ready": true, ...} once warmed up, 503 while the model is loading
+    GET  /metrics  Per-stage timing histograms in Prometheus text format
+    POST /predict  JSON body {"path": "<image path>"} or raw image bytes (Content-Type: image/*)
+                   Returns the same JSON as process_image(); /predict?timings=1 adds "timings"
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import socketserver
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import process_skin_image as skin
+from instrumentation import render_prometheus
+from skin_batcher import MicroBatcher
+
+# Reject request bodies larger than this (the Node upload limit is 5MB)
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+# Warm-up state reported by /health
+_state = {
+    "ready": False,
+    "error": None,
+    "backend": None,
+    "loadSeconds": None,
+    "startedAt": time.time(),
+}
+
+# Shared by all handler threads so concurrent uploads are predicted together
+_batcher = None
+
+
+def warm_up():
+    """Load the model and run one dummy prediction so the first request is fast."""
+    start = time.perf_counter()
+    try:
+        dummy = np.zeros((1, skin.IMG_SIZE[0], skin.IMG_SIZE[1], 3), dtype=np.float32)
+        skin.predict_batch(dummy)
+        _state["backend"] = skin.get_backend().name
+        _state["loadSeconds"] = time.perf_counter() - start
+        _state["ready"] = True
+        print(f"Model ready after {_state['loadSeconds']:.2f}s", file=sys.stderr)
+    except Exception as e:
+        _state["error"] = str(e)
+        print(f"Error loading model: {str(e)}", file=sys.stderr)
+
+
+class SkinRequestHandler(BaseHTTPRequestHandler):
+    """Handle /health and /predict requests."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if self.path != "/health":
+            self._send_json(404, {"success": False, "error": "Not found"})
+            return
+
+        payload = {
+            "ready": _state["ready"],
+            "error": _state["error"],
+            "backend": _state["backend"],
+            "loadSeconds": _state["loadSeconds"],
+            "uptimeSeconds": time.time() - _state["startedAt"],
+        }
+        if _batcher is not None:
+            payload["batching"] = {
+                "maxBatchSize": _batcher.max_batch_size,
+                "batches": _batcher.batches,
+                "images": _batcher.images,
+            }
+        self._send_json(200 if _state["ready"] else 503, payload)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/predict":
+            self._send_json(404, {"success": False, "error": "Not found"})
+            return
+
+        if not _state["ready"]:
+            self._send_json(503, {"success": False, "error": "Model is still loading"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            self._send_json(400, {"success": False, "error": "No image provided"})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"success": False, "error": "Image is too large"})
+            return
+
+        body = self.rfile.read(length)
+        content_type = self.headers.get("Content-Type", "")
+
+        # JSON requests reference an image already on disk, anything else is the image itself
+        if content_type.startswith("application/json"):
+            try:
+                image_source = json.loads(body)["path"]
+            except (ValueError, KeyError, TypeError):
+                self._send_json(400, {"success": False, "error": "Expected JSON body with a 'path' field"})
+                return
+        else:
+            image_source = body
+
+        # Every request is timed for /metrics, the timings are only returned on request
+        result = skin.process_image(image_source, batcher=_batcher, timings=True)
+        if parse_qs(url.query).get("timings", ["0"])[0] in ("0", "false", ""):
+            result.pop("timings", None)
+        self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        # Keep stdout/stderr quiet, errors are returned in the response body
+        pass
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded HTTP server listening on a Unix domain socket."""
+
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) style client address
+        return request, ("unix", 0)
+
+
+def create_server(host="127.0.0.1", port=5055, socket_path=None):
+    """
+    Create the HTTP server without starting it
+
+    Args:
+        host: Interface to bind for TCP mode
+        port: Port to bind for TCP mode
+        socket_path: Path of a Unix socket; takes precedence over host/port
+
+    Returns:
+        socketserver.BaseServer instance
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return UnixHTTPServer(socket_path, SkinRequestHandler)
+    return ThreadingHTTPServer((host, port), SkinRequestHandler)
+
+
+def serve(host="127.0.0.1", port=5055, socket_path=None, max_batch_size=8, max_wait_ms=5.0):
+    """Start the server and warm up the model in the background."""
+    global _batcher
+    _batcher = MicroBatcher(skin.predict_batch, max_batch_size, max_wait_ms)
+
+    server = create_server(host, port, socket_path)
+    threading.Thread(target=warm_up, daemon=True).start()
+
+    address = socket_path or f"http://{host}:{port}"
+    print(f"Skin classification server listening on {address}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        _batcher.close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve skin disease classification over HTTP')
+    parser.add_argument('--host', type=str, default=os.environ.get('SKIN_SERVER_HOST', '127.0.0.1'),
+                        help='Host to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SKIN_SERVER_PORT', 5055)),
+                        help='Port to bind (default: 5055)')
+    parser.add_argument('--socket', type=str, default=os.environ.get('SKIN_SERVER_SOCKET'),
+                        help='Listen on a Unix socket instead of TCP')
+    parser.add_argument('--max-batch-size', type=int, default=int(os.environ.get('SKIN_MAX_BATCH_SIZE', 8)),
+                        help='Largest number of concurrent images predicted together (default: 8)')
+    parser.add_argument('--max-wait-ms', type=float, default=float(os.environ.get('SKIN_MAX_WAIT_MS', 5)),
+                        help='How long a request waits for others to join its batch (default: 5)')
+    parser.add_argument('--backend', type=str, choices=['keras', 'tflite', 'onnx'],
+                        help='Inference backend (default: SKIN_MODEL_BACKEND or keras)')
+    args = parser.parse_args(argv)
+
+    if args.backend:
+        os.environ['SKIN_MODEL_BACKEND'] = args.backend
+
+    serve(args.host, args.port, args.socket, args.max_batch_size, args.max_wait_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,94 +1,321 @@
-import subprocess
+"""
+Provision the Ollama models used by the chatbot.
+
+Pulls the base model, creates the custom model from the Modelfile, then
+loads it with a warm-up request so the first real request does not pay the
+model load, and checks that it is resident:
+
+    python start.py                  # provision with flags / environment defaults
+    python start.py --check          # readiness check only
+    python start.py --interactive    # prompt for the settings
+
+Steps that are already done are skipped: the pull when the base model is
+present locally, the create when the Modelfile, the base model digest and
+the custom model digest all match the state file of the last successful
+run. --force redoes both.
+
+Environment (flags take precedence):
+    AI_BASE_MODEL        Base model to pull (default: llama3.2:3b)
+    AI_MODEL_NAME        Custom model name (default: AMH_chatbot)
+    AI_MODELFILE         Modelfile path (default: Modelfile.txt next to this script)
+    AI_KEEP_ALIVE        How long the model stays loaded after a request (default: 30m, -1 for ever)
+    AI_PROVISION_STATE   State file (default: .provision_state.json next to this script)
+    OLLAMA_HOST          Model server address
+
+Exits with status 1 when provisioning fails or the model is not ready.
+"""
 import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
 import ollama
 from typing import Optional
 
+# Same setting and parsing as the structuring requests, so the warm-up and the API agree
+from processMedicalRecord import KEEP_ALIVE as DEFAULT_KEEP_ALIVE, parse_keep_alive
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_BASE_MODEL = os.environ.get("AI_BASE_MODEL") or "llama3.2:3b"
+DEFAULT_MODEL_NAME = os.environ.get("AI_MODEL_NAME") or "AMH_chatbot"
+DEFAULT_MODELFILE = os.environ.get("AI_MODELFILE") or os.path.join(SCRIPT_DIR, "Modelfile.txt")
+DEFAULT_STATE_FILE = os.environ.get("AI_PROVISION_STATE") or os.path.join(SCRIPT_DIR, ".provision_state.json")
+
+NS_PER_MS = 1_000_000
 
-def pull_model(model_name: str = "llama3.2:3b") -> bool:
+
+def log(message: str) -> None:
+    """Progress goes to stderr so stdout only carries the report."""
+    print(message, file=sys.stderr, flush=True)
+
+
+def _model_names(model_name: str) -> set:
+    """Names Ollama may list a model under ("llama3.2" is listed as "llama3.2:latest")."""
+    return {model_name, f"{model_name}:latest"} if ":" not in model_name else {model_name}
+
+
+def local_digest(model_name: str) -> Optional[str]:
     """
-    Pull a model using ollama client.
-    
+    Digest of a model on the Ollama server.
+
+    Returns:
+        Digest string, or None when the model is not present
+    """
+    names = _model_names(model_name)
+    for model in ollama.list()["models"]:
+        if (model.get("model") or model.get("name")) in names:
+            return model["digest"]
+    return None
+
+
+def load_state(state_file: str) -> dict:
+    try:
+        with open(state_file, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state_file: str, state: dict) -> None:
+    tmp_path = f"{state_file}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_file)
+
+
+def file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def pull_model(model_name: str = DEFAULT_BASE_MODEL, force: bool = False) -> Optional[str]:
+    """
+    Pull a model using ollama client, unless it is already present.
+
     Args:
         model_name: Name of the model to pull
-        
+        force: Pull even when the model is present (picks up a newer upstream version)
+
     Returns:
-        bool: True if successful, False otherwise
+        Digest of the local model, or None if the pull failed
     """
-    print(f"Pulling {model_name} model...")
     try:
-        response = ollama.pull(model_name)
-        print(f"Successfully pulled {model_name} model")
-        print(f"Model details: {response}")
-        return True
+        digest = local_digest(model_name)
+        if digest and not force:
+            log(f"{model_name} is already present ({digest[:12]}), skipping pull")
+            return digest
+
+        log(f"Pulling {model_name} model...")
+        status = None
+        for progress in ollama.pull(model_name, stream=True):
+            if progress.get("status") != status:
+                status = progress.get("status")
+                log(f"  {status}")
+        digest = local_digest(model_name)
+        log(f"Successfully pulled {model_name} model")
+        return digest
     except Exception as e:
-        print(f"Error pulling {model_name} model: {str(e)}")
-        return False
+        log(f"Error pulling {model_name} model: {str(e)}")
+        return None
 
 
-def create_custom_model(modelfile_path: str, custom_name: Optional[str] = None) -> bool:
+def create_custom_model(modelfile_path: str, custom_name: str, base_digest: Optional[str],
+                        state: dict, force: bool = False) -> Optional[str]:
     """
-    Create a custom model using a Modelfile.
-    
+    Create a custom model using a Modelfile, unless the existing one was built from the same inputs.
+
     Args:
         modelfile_path: Path to the Modelfile
         custom_name: Name for the custom model
-        
+        base_digest: Digest of the base model the Modelfile builds on
+        state: Provisioning state; the entry for custom_name is updated on success
+        force: Recreate even when nothing changed
+
     Returns:
-        bool: True if successful, False otherwise
+        Digest of the custom model, or None if it could not be created
     """
     if not os.path.exists(modelfile_path):
-        print(f"Error: Modelfile not found at {modelfile_path}")
-        return False
-        
-    default_model_name = "AMH_chatbot"
-    if not custom_name:
-        custom_name = default_model_name
-        
-    print(f"Using model name: {custom_name}")
-        
+        log(f"Error: Modelfile not found at {modelfile_path}")
+        return None
+
+    modelfile_hash = file_sha256(modelfile_path)
+    previous = state.get(custom_name, {})
     try:
-        print(f"Creating custom model '{custom_name}' using Modelfile...")
-        result = subprocess.run(
+        digest = local_digest(custom_name)
+    except Exception as e:
+        log(f"Error listing models: {str(e)}")
+        return None
+
+    if (not force and digest and digest == previous.get("digest")
+            and previous.get("modelfile_sha256") == modelfile_hash
+            and previous.get("base_digest") == base_digest):
+        log(f"{custom_name} is up to date with {modelfile_path} ({digest[:12]}), skipping create")
+        return digest
+
+    try:
+        log(f"Creating custom model '{custom_name}' using Modelfile...")
+        subprocess.run(
             ["ollama", "create", custom_name, "-f", modelfile_path],
             check=True, capture_output=True, text=True
         )
-        print("Success! Output:", result.stdout)
-        return True
+        digest = local_digest(custom_name)
     except subprocess.CalledProcessError as e:
-        print(f"Error executing ollama command: {e}\nError output: {e.stderr}")
-        return False
+        log(f"Error executing ollama command: {e}\nError output: {e.stderr}")
+        return None
     except Exception as e:
-        print(f"An unexpected error occurred: {str(e)}")
-        return False
+        log(f"An unexpected error occurred: {str(e)}")
+        return None
 
+    state[custom_name] = dict(previous, modelfile_sha256=modelfile_hash, base_digest=base_digest, digest=digest)
+    log(f"Created {custom_name} ({(digest or '?')[:12]})")
+    return digest
+
+
+def warm_up(model_name: str, keep_alive) -> dict:
+    """
+    Load the model into memory and keep it there for keep_alive.
+
+    An empty prompt makes Ollama load the model without generating anything.
+
+    Returns:
+        Dict with the server-side load time and the total request time in milliseconds
+    """
+    start = time.perf_counter()
+    response = ollama.generate(model=model_name, prompt="", keep_alive=parse_keep_alive(keep_alive))
+    return {
+        "load_ms": (response.get("load_duration") or 0) / NS_PER_MS,
+        "total_ms": (time.perf_counter() - start) * 1000,
+        "keep_alive": keep_alive,
+        "at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def check_ready(model_name: str, state: dict) -> dict:
+    """
+    Readiness of the custom model: whether it is loaded, its digest and the last warm-up load time.
+
+    Returns:
+        Dict with "ready" plus whatever the server reports about the loaded model
+    """
+    names = _model_names(model_name)
+    report = {"model": model_name, "ready": False, "last_warmup": state.get(model_name, {}).get("warmup")}
+    for model in ollama.ps()["models"]:
+        if (model.get("model") or model.get("name")) in names:
+            expires_at = model.get("expires_at")
+            report.update({
+                "ready": True,
+                "digest": model.get("digest"),
+                "size_vram_mb": (model.get("size_vram") or 0) / (1024 * 1024),
+                "expires_at": expires_at.isoformat() if hasattr(expires_at, "isoformat") else expires_at,
+            })
+            break
+    return report
+
+
+def prompt_settings(args: argparse.Namespace) -> None:
+    """Ask for the settings on the terminal, with the flag / environment values as defaults."""
+    args.base_model = input(f"Enter base model name to pull (default: {args.base_model}): ").strip() or args.base_model
 
-def main():
-    """Main function to orchestrate model pulling and custom model creation."""
-
-    default_base_model = "llama3.2:3b"
-    user_model = input(f"Enter base model name to pull (default: {default_base_model}): ").strip()
-    base_model = user_model or default_base_model
-    
-    if not pull_model(base_model):
-        print("Failed to pull the base model. Exiting.")
-        return
-    
     create_custom = input("Would you like to create a custom model? (y/n, default: y): ").strip().lower()
     if create_custom and create_custom[0] == 'n':
-        print("Skipping custom model creation.")
+        args.skip_create = True
+        return
+
+    args.modelfile = input(f"Enter path to the Modelfile (default: {args.modelfile}): ").strip() or args.modelfile
+    args.model_name = input(f"Enter a name for your custom model (default: {args.model_name}): ").strip() or args.model_name
+
+
+def provision(args: argparse.Namespace, state: dict) -> dict:
+    """Pull, create and warm up; returns the report, with "error" set if a step failed."""
+    report = {"base_model": {"name": args.base_model}, "model": {"name": args.model_name}}
+
+    base_digest = pull_model(args.base_model, args.force)
+    if base_digest is None:
+        report["error"] = "Failed to pull the base model"
+        return report
+    report["base_model"]["digest"] = base_digest
+
+    if args.skip_create:
+        log("Skipping custom model creation.")
+        model_name = args.base_model
+    else:
+        digest = create_custom_model(args.modelfile, args.model_name, base_digest, state, args.force)
+        if digest is None:
+            report["error"] = "Failed to create custom model"
+            return report
+        report["model"]["digest"] = digest
+        model_name = args.model_name
+
+    if not args.no_warmup:
+        log(f"Warming up {model_name} (keep_alive={args.keep_alive})...")
+        try:
+            warmup = warm_up(model_name, args.keep_alive)
+        except Exception as e:
+            report["error"] = f"Warm-up failed: {str(e)}"
+            return report
+        state.setdefault(model_name, {})["warmup"] = warmup
+        report["warmup"] = warmup
+        log(f"Loaded in {warmup['load_ms']:.0f}ms")
+    return report
+
+
+def main():
+    """Provision the models, or only check readiness with --check."""
+    parser = argparse.ArgumentParser(description='Provision and warm up the chatbot Ollama models')
+    parser.add_argument('--base-model', type=str, default=DEFAULT_BASE_MODEL,
+                        help='Base model to pull (default: AI_BASE_MODEL or llama3.2:3b)')
+    parser.add_argument('--model-name', type=str, default=DEFAULT_MODEL_NAME,
+                        help='Custom model name (default: AI_MODEL_NAME or AMH_chatbot)')
+    parser.add_argument('--modelfile', type=str, default=DEFAULT_MODELFILE,
+                        help='Modelfile for the custom model (default: AI_MODELFILE or Modelfile.txt)')
+    parser.add_argument('--skip-create', action='store_true', help='Only pull (and warm up) the base model')
+    parser.add_argument('--keep-alive', type=str, default=DEFAULT_KEEP_ALIVE,
+                        help='How long the model stays loaded, e.g. 30m or -1 (default: AI_KEEP_ALIVE or 30m)')
+    parser.add_argument('--no-warmup', action='store_true', help='Do not load the model after provisioning')
+    parser.add_argument('--force', action='store_true', help='Pull and create even when up to date')
+    parser.add_argument('--state-file', type=str, default=DEFAULT_STATE_FILE,
+                        help='Where digests of the last run are kept (default: AI_PROVISION_STATE)')
+    parser.add_argument('--check', action='store_true', help='Only report whether the model is loaded')
+    parser.add_argument('--interactive', '-i', action='store_true', help='Prompt for the settings')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    if args.interactive:
+        prompt_settings(args)
+
+    try:
+        ollama.list()
+    except Exception as e:
+        log(f"Cannot reach Ollama at {os.environ.get('OLLAMA_HOST') or 'the default host'}: {str(e)}")
+        log("Start it with 'ollama serve' and run this again")
+        sys.exit(1)
+
+    state = load_state(args.state_file)
+    report = {} if args.check else provision(args, state)
+    if "error" not in report:
+        save_state(args.state_file, state)
+        report["readiness"] = check_ready(args.base_model if args.skip_create else args.model_name, state)
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    elif "error" in report:
+        print(report["error"])
     else:
-        default_modelfile_path = "./Modelfile.txt"
-        modelfile_path = input(f"Enter path to the Modelfile (default: {default_modelfile_path}): ").strip() or default_modelfile_path
-        
-        custom_name = input("Enter a name for your custom model (leave empty for default 'AMH_chatbot'): ").strip()
-        
-        if not create_custom_model(modelfile_path, custom_name if custom_name else None):
-            print("Failed to create custom model.")
-    
-    print("\n======================================")
-    print("Important: Please ensure Ollama is running!")
-    print("If Ollama is not running, start it with 'ollama serve' in another terminal")
-    print("======================================")
+        readiness = report["readiness"]
+        if readiness["ready"]:
+            print(f"{readiness['model']} is ready ({(readiness.get('digest') or '?')[:12]}), "
+                  f"loaded until {readiness.get('expires_at')}")
+        else:
+            print(f"{readiness['model']} is not loaded")
+        if readiness.get("last_warmup"):
+            print(f"Last warm-up load time: {readiness['last_warmup']['load_ms']:.0f}ms")
+
+    # Without a warm-up the model is only loaded by the first request
+    if "error" in report or (not report["readiness"]["ready"] and (args.check or not args.no_warmup)):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
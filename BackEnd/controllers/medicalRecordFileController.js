@@ -4,6 +4,7 @@ import fs from 'fs';
 import { spawn } from 'child_process';
 import { fileURLToPath } from 'url';
 import { dirname } from 'path';
+import { processWithWorker } from '../utils/recordWorkerClient.js';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = dirname(__filename);
@@ -31,7 +32,28 @@ export const processMedicalRecordFile = async (req, res) => {
         const filePath = req.file.path;
         
         // Get processing mode from request or use default
-        const processMode = req.body.processMode || 'processed';
+        const processMode = req.body.processMode || 'auto';
+        
+        // Use the long-lived Python worker when enabled instead of spawning per upload
+        if (process.env.MEDICAL_RECORD_WORKER === 'true') {
+            try {
+                const outputJson = await processWithWorker(filePath, processMode);
+                
+                fs.unlink(filePath, err => {
+                    if (err) console.error(`Error deleting input file: ${err}`);
+                });
+                
+                return res.json(outputJson);
+            } catch (workerError) {
+                console.error('Error processing file in worker:', workerError);
+                
+                return res.status(500).json({
+                    success: false,
+                    message: 'Error processing file',
+                    error: workerError.message
+                });
+            }
+        }
         
         // Create a temporary file for output
         const outputFilePath = `${filePath}_output.json`;
@@ -4,13 +4,10 @@ import { v4 as uuidv4 } from 'uuid';
 import { createConversationDB } from '../models/Chat.js';
 import { addUserMessage, addAssistantMessage, addUserMessageWithImage } from '../models/ChatMessage.js';
 import { checkConversationExistsQuery } from '../queries/chatQueries.js';
-import fs from 'fs';
 import path from 'path';
-import { promisify } from 'util';
-import { exec } from 'child_process';
+import { spawn } from 'child_process';
 import ImageKit from 'imagekit';
 
-const execPromise = promisify(exec);
 
 // Initialize ImageKit
 const imagekit = new ImageKit({
@@ -21,6 +18,50 @@ const imagekit = new ImageKit({
 
 dotenv.config();
 
+// Same default as start.py's warm-up, so chat requests do not cut it back to Ollama's 5 minutes
+const DEFAULT_KEEP_ALIVE = '30m';
+
+// Ollama reads a string keep_alive as a duration ("30m"); bare numbers (seconds, -1 for ever) must be sent as numbers
+const parseKeepAlive = (value) => (/^-?\d+$/.test(value) ? Number(value) : value);
+
+/**
+ * Classify an image with the long-running Python server
+ * (python config/chatbot/process_skin_image.py --serve).
+ * The image bytes are posted as-is, so nothing has to be written to disk.
+ * Returns null while the server is still warming up so the caller can fall back.
+ */
+const classifyWithServer = async (imageBuffer, mimeType) => {
+  const baseUrl = process.env.SKIN_CLASSIFIER_URL.replace(/\/$/, '');
+
+  const health = await fetch(`${baseUrl}/health`);
+  if (!health.ok) {
+    return null;
+  }
+
+  const response = await fetch(`${baseUrl}/predict`, {
+    method: 'POST',
+    headers: { 'Content-Type': mimeType },
+    body: imageBuffer
+  });
+  return response.json();
+};
+
+/**
+ * Classify an image with the one-shot Python script, passing the image bytes on stdin.
+ * Resolves with the script's stdout (stderr, mostly TensorFlow noise, is discarded).
+ */
+const classifyWithScript = (scriptPath, imageBuffer) => new Promise((resolve, reject) => {
+  const child = spawn('python', [scriptPath, '-'], { stdio: ['pipe', 'pipe', 'ignore'] });
+  let stdout = '';
+  child.stdout.setEncoding('utf8');
+  child.stdout.on('data', (chunk) => { stdout += chunk; });
+  child.on('error', reject);
+  child.on('close', () => resolve(stdout));
+  // The script may exit before reading everything (e.g. missing dependencies)
+  child.stdin.on('error', () => {});
+  child.stdin.end(imageBuffer);
+});
+
 export const handleStreamingChat = async (req, res) => {
   try {
     const { message, history, conversationId } = req.body;
@@ -85,7 +126,9 @@ export const handleStreamingChat = async (req, res) => {
     const stream = await ollama.chat({
       model: process.env.AI_MODEL_NAME || 'AMH_chatbot',
       messages: formattedHistory,
-      stream: true
+      stream: true,
+      // Keep the model loaded as long as start.py's warm-up asked for
+      keep_alive: parseKeepAlive(process.env.AI_KEEP_ALIVE || DEFAULT_KEEP_ALIVE)
     });
 
     let assistantResponse = '';
@@ -144,14 +187,11 @@ export const handleSkinDiseaseImageUpload = async (req, res) => {
       });
     }    // Build the path to the Python script and model
     const scriptPath = path.join(process.cwd(), 'config', 'chatbot', 'process_skin_image.py');
-    const imagePath = req.file.path;
+    const fileBuffer = req.file.buffer;
     
     // Upload image to ImageKit first
     let imageUrl = null;
     try {
-      // Read file buffer
-      const fileBuffer = fs.readFileSync(imagePath);
-      
       // Generate unique filename
       const fileName = `skin-analysis-${Date.now()}-${Math.round(Math.random() * 1E9)}`;
       
@@ -169,25 +209,31 @@ export const handleSkinDiseaseImageUpload = async (req, res) => {
       console.error('Error uploading image to ImageKit:', uploadError);
       // Continue with analysis even if upload fails
     }
-      // Execute Python script to process the image with stderr suppressed
-    const { stdout, stderr } = await execPromise(`python "${scriptPath}" "${imagePath}" 2>nul`);
-    
-    // Only log stderr if it contains actual errors (not TensorFlow warnings)
-    if (stderr && stderr.trim() && !stderr.includes('tensorflow') && !stderr.includes('XLA') && !stderr.includes('absl')) {
-      console.log('Python script error:', stderr);
+    // Prefer the warm classification server when configured, fall back to the one-shot script
+    let classificationResult = null;
+    if (process.env.SKIN_CLASSIFIER_URL) {
+      try {
+        classificationResult = await classifyWithServer(fileBuffer, req.file.mimetype);
+      } catch (serverError) {
+        console.error('Skin classifier server unavailable, falling back to script:', serverError.message);
+      }
     }
-    
-    // Parse results from the Python script
-    let classificationResult;
-    try {
-      classificationResult = JSON.parse(stdout);
-    } catch (parseError) {
-      console.error('Error parsing Python script output:', parseError);
-      console.error('Raw stdout:', stdout);
-      return res.status(500).json({
-        success: false,
-        error: 'Error parsing classification results'
-      });
+
+    if (!classificationResult) {
+      // Execute Python script to process the image with stderr suppressed
+      const stdout = await classifyWithScript(scriptPath, fileBuffer);
+      
+      // Parse results from the Python script
+      try {
+        classificationResult = JSON.parse(stdout);
+      } catch (parseError) {
+        console.error('Error parsing Python script output:', parseError);
+        console.error('Raw stdout:', stdout);
+        return res.status(500).json({
+          success: false,
+          error: 'Error parsing classification results'
+        });
+      }
     }
     
     if (!classificationResult.success) {
@@ -258,15 +304,6 @@ export const handleSkinDiseaseImageUpload = async (req, res) => {
     return res.status(500).json({
       success: false,
       error: 'Failed to process uploaded image'
-    });  } finally {
-    // Optionally clean up the uploaded image after processing
-    // If you want to keep it, comment this out
-    if (req.file && req.file.path) {
-      try {
-        fs.unlinkSync(req.file.path);
-      } catch (err) {
-        console.error('Error deleting temporary file:', err);
-      }
-    }
+    });
   }
 };
@@ -1,6 +1,5 @@
 import express from 'express';
 import multer from 'multer';
-import path from 'path';
 import { 
   handleStreamingChat,
   handleSkinDiseaseImageUpload
@@ -17,16 +16,8 @@ import {
 import { validateChatRequest, validateSaveChatRequest } from '../middleware/chatMiddleware.js';
 import { authenticateUser, decodeTokenIfExists } from '../security/authMiddleware.js';
 
-// Configure multer storage for image uploads
-const storage = multer.diskStorage({
-  destination: function (req, file, cb) {
-    cb(null, path.join(process.cwd(), 'temp'));
-  },
-  filename: function (req, file, cb) {
-    const uniqueSuffix = Date.now() + '-' + Math.round(Math.random() * 1E9);
-    cb(null, 'skin-image-' + uniqueSuffix + path.extname(file.originalname));
-  }
-});
+// Keep image uploads in memory: they are sent to the classifier and ImageKit as bytes
+const storage = multer.memoryStorage();
 
 // File filter for images
 const fileFilter = (req, file, cb) => {
@@ -0,0 +1,119 @@
+import path from 'path';
+import readline from 'readline';
+import { spawn } from 'child_process';
+import { fileURLToPath } from 'url';
+import { dirname } from 'path';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = dirname(__filename);
+
+const workerScript = path.join(__dirname, '../config/chatbot/processMedicalRecord.py');
+
+// Give up on a job after this long (OCR of a large scanned PDF can take minutes)
+const JOB_TIMEOUT_MS = Number(process.env.MEDICAL_RECORD_WORKER_TIMEOUT_MS) || 10 * 60 * 1000;
+
+let worker = null;
+let nextJobId = 1;
+const pendingJobs = new Map();
+
+const failPendingJobs = (error) => {
+    for (const [id, job] of pendingJobs) {
+        clearTimeout(job.timer);
+        job.reject(error);
+        pendingJobs.delete(id);
+    }
+};
+
+const handleMessage = (line) => {
+    let message;
+    try {
+        message = JSON.parse(line);
+    } catch (error) {
+        console.error(`Medical record worker sent invalid output: ${line}`);
+        return;
+    }
+
+    const job = message.id !== undefined ? pendingJobs.get(message.id) : undefined;
+    if (message.type === 'result' && job) {
+        clearTimeout(job.timer);
+        pendingJobs.delete(message.id);
+        job.resolve(message.result);
+    } else if (message.type === 'error') {
+        if (job) {
+            clearTimeout(job.timer);
+            pendingJobs.delete(message.id);
+            job.reject(new Error(message.error));
+        } else {
+            console.error(`Medical record worker error: ${message.error}`);
+        }
+    }
+    // ready / heartbeat / health / stopped messages need no action here
+};
+
+// Drop a dead worker so the next job starts a new one. Only the first of its
+// 'error' / stdin 'error' / 'close' events counts; a replacement's jobs are left alone.
+const retireWorker = (child, error) => {
+    if (worker !== child) return;
+    worker = null;
+    failPendingJobs(error);
+};
+
+// Start the long-lived Python worker (processMedicalRecord.py --worker) on first use
+const getWorker = () => {
+    if (!worker) {
+        const child = spawn('python', [workerScript, '--worker'], {
+            env: { ...process.env, PYTHONIOENCODING: 'utf-8' }
+        });
+        worker = child;
+        readline.createInterface({ input: child.stdout }).on('line', handleMessage);
+        child.stderr.on('data', (data) => {
+            console.error(`Medical record worker: ${data.toString('utf8')}`);
+        });
+        // A spawn failure emits 'error' and may never emit 'exit'
+        child.on('error', (error) => {
+            console.error('❌ Medical record worker failed:', error);
+            retireWorker(child, error);
+        });
+        // Writing to a worker that already exited fails with EPIPE here instead of crashing the server
+        child.stdin.on('error', (error) => {
+            console.error('❌ Medical record worker stdin error:', error);
+            retireWorker(child, error);
+        });
+        child.on('close', (code) => {
+            retireWorker(child, new Error(`Medical record worker exited with code ${code}`));
+        });
+    }
+    return worker;
+};
+
+/**
+ * Process a medical record file in the shared Python worker
+ * @param {string} filePath - Path to the uploaded file
+ * @param {string} processMode - OCR processing mode
+ * @returns {Promise<Object>} Result of process_medical_record
+ */
+export const processWithWorker = (filePath, processMode) => new Promise((resolve, reject) => {
+    const id = String(nextJobId++);
+    const timer = setTimeout(() => {
+        pendingJobs.delete(id);
+        reject(new Error('Medical record worker timed out'));
+    }, JOB_TIMEOUT_MS);
+    pendingJobs.set(id, { resolve, reject, timer });
+
+    const child = getWorker();
+    if (!child.stdin.writable) {
+        clearTimeout(timer);
+        pendingJobs.delete(id);
+        reject(new Error('Medical record worker is not running'));
+        retireWorker(child, new Error('Medical record worker is not running'));
+        return;
+    }
+    child.stdin.write(JSON.stringify({ id, file: filePath, mode: processMode }) + '\n');
+});
+
+/**
+ * Close the worker's stdin so it finishes the jobs in flight and exits
+ */
+export const stopWorker = () => {
+    if (worker) worker.stdin.end();
+};
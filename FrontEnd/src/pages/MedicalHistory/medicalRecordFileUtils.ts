@@ -20,7 +20,7 @@ export const processMedicalRecordFile = async (file: File): Promise<{
 }> => {
   try {    const formData = new FormData();
     formData.append('file', file);
-    formData.append('processMode', 'processed'); // Use enhanced OCR processing
+    formData.append('processMode', 'auto'); // Enhanced OCR only for pages the plain pass reads poorly
     
     const response = await fetch(`${apiUrl}/upload`, {
       method: 'POST',